@@ -67,6 +67,7 @@ class LevityConfig(ConfigParser):
 
 	def __init__(self, *args, **kwargs):
 		path = getattr(self, 'fileName', None) or kwargs.pop('fileName', None) or kwargs.pop('path', None) or None
+		self.__reloadCallbacks: list[Callable[[], None]] = []
 		super(LevityConfig, self).__init__(
 			allow_no_value=True,
 			interpolation=ExtendedInterpolation(),
@@ -218,6 +219,27 @@ class LevityConfig(ConfigParser):
 		with self.path.path.open('w') as f:
 			self.write(f)
 
+	def connectReload(self, callback: Callable[[], None]):
+		"""Registers a callback for when values are read into the config, e.g. to clear caches built from it"""
+		self.__reloadCallbacks.append(callback)
+
+	def __reloaded(self):
+		for callback in getattr(self, '_LevityConfig__reloadCallbacks', ()):
+			callback()
+
+	def read(self, *args, **kwargs):
+		result = super(LevityConfig, self).read(*args, **kwargs)
+		self.__reloaded()
+		return result
+
+	def read_file(self, *args, **kwargs):
+		super(LevityConfig, self).read_file(*args, **kwargs)
+		self.__reloaded()
+
+	def read_dict(self, *args, **kwargs):
+		super(LevityConfig, self).read_dict(*args, **kwargs)
+		self.__reloaded()
+
 	@property
 	def userPath(self):
 		return self.__userPath
@@ -321,6 +343,8 @@ class LevityConfig(ConfigParser):
 		unit = value[len(_val):].strip(' ')
 		_val = float(_val)
 		match unit:
+			case 'ms' | 'millisecond' | 'milliseconds':
+				return timedelta(milliseconds=_val)
 			case 's' | 'sec' | 'second' | 'seconds':
 				return timedelta(seconds=_val)
 			case 'm' | 'min' | 'minute' | 'minutes':
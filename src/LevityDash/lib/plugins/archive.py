@@ -0,0 +1,182 @@
+import sqlite3
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from threading import RLock
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from LevityDash import LevityDashboard
+from LevityDash.lib.log import LevityPluginLog
+
+log = LevityPluginLog.getChild('Archive')
+
+__all__ = ['ObservationArchive', 'ArchiveRow']
+
+# key, epoch seconds, numeric value, text value
+ArchiveRow = Tuple[str, int, Optional[float], Optional[str]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+	key TEXT NOT NULL,
+	timestamp INTEGER NOT NULL,
+	value REAL,
+	text TEXT,
+	PRIMARY KEY (key, timestamp)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS observations_timestamp ON observations (timestamp);
+"""
+
+
+def _toEpoch(value: datetime | int | float) -> int:
+	if isinstance(value, datetime):
+		return int(value.timestamp())
+	return int(value)
+
+
+class ObservationArchive:
+	"""
+	Persistent sqlite3 archive for an ObservationLog.
+
+	Rows are buffered and written in batches once `batchSize` rows are pending or `flushInterval`
+	has passed since the last write.  Rows older than `retention` are pruned while flushing.
+	"""
+
+	batchSize: int = 500
+	flushInterval: timedelta = timedelta(seconds=30)
+	pruneInterval: timedelta = timedelta(hours=1)
+
+	def __init__(self, name: str, path: Path | str = None, retention: timedelta = timedelta(days=30)):
+		if path is None:
+			path = Path(LevityDashboard.paths.data) / 'archive' / f'{name}.sqlite'
+		self.__path = Path(path)
+		self.__name = name
+		self.retention = retention
+		self.__pending: List[ArchiveRow] = []
+		self.__lock = RLock()
+		self.__connection: Optional[sqlite3.Connection] = None
+		self.__lastFlush = monotonic()
+		self.__lastPrune = 0.0
+
+	def __repr__(self):
+		return f'ObservationArchive({self.__name}, pending={len(self.__pending)})'
+
+	@property
+	def path(self) -> Path:
+		return self.__path
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		if self.__connection is None:
+			self.__path.parent.mkdir(parents=True, exist_ok=True)
+			connection = sqlite3.connect(self.__path, check_same_thread=False)
+			connection.execute('PRAGMA journal_mode=WAL')
+			connection.execute('PRAGMA synchronous=NORMAL')
+			connection.executescript(_SCHEMA)
+			self.__connection = connection
+			log.verbose(f'Opened archive {self.__path}', verbosity=2)
+		return self.__connection
+
+	@staticmethod
+	def toRow(key: Any, timestamp: datetime | int, value: Any) -> Optional[ArchiveRow]:
+		match value:
+			case None:
+				return None
+			case bool():
+				return repr(key), _toEpoch(timestamp), float(value), None
+			case str():
+				return repr(key), _toEpoch(timestamp), None, str(value)
+			case int() | float():
+				return repr(key), _toEpoch(timestamp), float(value), None
+			case _:
+				return None
+
+	def write(self, rows: Iterable[ArchiveRow]):
+		with self.__lock:
+			self.__pending.extend(row for row in rows if row is not None)
+			if len(self.__pending) >= self.batchSize or monotonic() - self.__lastFlush >= self.flushInterval.total_seconds():
+				self.flush()
+
+	def flush(self):
+		with self.__lock:
+			self.__lastFlush = monotonic()
+			if self.__pending:
+				rows, self.__pending = self.__pending, []
+				try:
+					with self.connection as connection:
+						connection.executemany('INSERT OR REPLACE INTO observations VALUES (?, ?, ?, ?)', rows)
+					log.verbose(f'{self.__name} archived {len(rows)} values', verbosity=4)
+				except sqlite3.Error as e:
+					log.error(f'Unable to write to archive {self.__path}')
+					log.exception(e)
+			if self.__lastFlush - self.__lastPrune >= self.pruneInterval.total_seconds():
+				self.prune()
+
+	def prune(self):
+		with self.__lock:
+			self.__lastPrune = monotonic()
+			cutoff = _toEpoch(datetime.now(tz=timezone.utc) - self.retention)
+			try:
+				with self.connection as connection:
+					removed = connection.execute('DELETE FROM observations WHERE timestamp < ?', (cutoff,)).rowcount
+				if removed:
+					log.verbose(f'{self.__name} pruned {removed} archived values', verbosity=3)
+			except sqlite3.Error as e:
+				log.exception(e)
+
+	def query(self, start: datetime | int = None, stop: datetime | int = None, keys: Iterable[Any] = None) -> List[ArchiveRow]:
+		"""Returns archived rows ordered by timestamp with start <= timestamp <= stop"""
+		clauses, params = [], []
+		if start is not None:
+			clauses.append('timestamp >= ?')
+			params.append(_toEpoch(start))
+		if stop is not None:
+			clauses.append('timestamp <= ?')
+			params.append(_toEpoch(stop))
+		if keys is not None:
+			keys = [repr(key) for key in keys]
+			clauses.append(f'key IN ({", ".join("?" * len(keys))})')
+			params.extend(keys)
+		where = f'WHERE {" AND ".join(clauses)}' if clauses else ''
+		with self.__lock:
+			self.flush()
+			try:
+				return self.connection.execute(f'SELECT key, timestamp, value, text FROM observations {where} ORDER BY timestamp', params).fetchall()
+			except sqlite3.Error as e:
+				log.exception(e)
+				return []
+
+	def aggregate(self, step: int, start: datetime | int = None, stop: datetime | int = None) -> List[Tuple[str, int, float, float, float, int]]:
+		"""Numeric values folded into buckets of step seconds as key, bucket, min, max, sum and count"""
+		clauses, params = ['value IS NOT NULL'], [step]
+		if start is not None:
+			clauses.append('timestamp >= ?')
+			params.append(_toEpoch(start))
+		if stop is not None:
+			clauses.append('timestamp <= ?')
+			params.append(_toEpoch(stop))
+		query = (
+			f'SELECT key, timestamp / ? AS bucket, MIN(value), MAX(value), SUM(value), COUNT(value) '
+			f'FROM observations WHERE {" AND ".join(clauses)} GROUP BY key, bucket'
+		)
+		with self.__lock:
+			self.flush()
+			try:
+				return self.connection.execute(query, params).fetchall()
+			except sqlite3.Error as e:
+				log.exception(e)
+				return []
+
+	def records(self, start: datetime | int = None, stop: datetime | int = None) -> Dict[int, Dict[str, Any]]:
+		"""Archived values grouped by timestamp"""
+		grouped: Dict[int, Dict[str, Any]] = defaultdict(dict)
+		for key, timestamp, value, text in self.query(start, stop):
+			grouped[timestamp][key] = text if value is None else value
+		return grouped
+
+	def close(self):
+		with self.__lock:
+			self.flush()
+			if self.__connection is not None:
+				self.__connection.close()
+				self.__connection = None
@@ -1,15 +1,20 @@
+import ast
 import asyncio
 import platform
 import re
+from dataclasses import dataclass
 from datetime import timedelta
-from types import FunctionType
-from typing import Callable, Dict, Optional, Type, Union
+from functools import lru_cache
+from math import inf
+from time import monotonic
+from typing import Callable, Dict, Optional, Tuple, Type, Union
 from uuid import UUID
 
 from bleak import BleakError, BleakScanner
 from bleak.backends.device import BLEDevice
 
 from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.categories import CategoryItem
 from LevityDash.lib.plugins.observation import ObservationRealtime
 from LevityDash.lib.plugins.plugin import Plugin
 from LevityDash.lib.plugins.schema import LevityDatagram, Schema, SchemaSpecialKeys as tsk
@@ -52,6 +57,85 @@ def parseMathString(mathString: str, functionName: str = 'mathExpression', **kwa
 	return locals()[functionName]
 
 
+BLEFieldSpec = Tuple[str, int, int, Optional[Union[str, Callable]], int]
+BLEPayloadDecoder = Callable[[bytes | memoryview], Dict[str, float | int]]
+
+
+class _RenameVariable(ast.NodeTransformer):
+
+	def __init__(self, name: str):
+		self.name = name
+
+	def visit_Name(self, node: ast.Name) -> ast.Name:
+		return ast.copy_location(ast.Name(id=self.name, ctx=node.ctx), node)
+
+
+def _fuseExpression(expression: str, variable: str) -> Optional[str]:
+	"""The expression with its only variable renamed, None when it can not be inlined"""
+	if badActors := getBadActors(expression):
+		raise RuntimeError(f"The following are not allowed in the math string: {badActors}")
+	try:
+		tree = ast.parse(expression.strip(), mode='eval')
+	except SyntaxError:
+		return None
+	if len({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}) > 1:
+		return None
+	return ast.unparse(_RenameVariable(variable).visit(tree))
+
+
+@lru_cache(maxsize=32)
+def compileDecoder(model: Optional[str], fields: Tuple[BLEFieldSpec, ...]) -> BLEPayloadDecoder:
+	"""
+	Compiles the field specs of a device model into a single decoder.
+
+	The slices are nibble offsets into the hex representation of the manufacturer data.  Every field
+	is extracted from one integer read of the bytes spanning all slices, so decoding a payload,
+	bytes or memoryview, never builds a string.  Expressions with a single variable are inlined,
+	other callables are called with the field's value.
+	"""
+	hexFields = [field for field in fields if field[4] == 16]
+	namespace = {'_fromBytes': int.from_bytes}
+	lines = []
+	if hexFields:
+		firstByte = min(start for _, start, _, _, _ in hexFields) // 2
+		lastByte = -(-max(end for _, _, end, _, _ in hexFields) // 2)
+		lines += [
+			f'if len(payload) < {lastByte}:',
+			f'\traise ValueError(f"Expected at least {lastByte} bytes, received {{len(payload)}}")',
+			f'_raw = _fromBytes(payload[{firstByte}:{lastByte}], "big")',
+		]
+	values = {}
+	slices = {}
+	for index, (field, start, end, expression, base) in enumerate(fields):
+		if base != 16:
+			namespace[f'_parse{index}'] = BLEPayloadParser.parseString
+			lines.append(f'_v{index} = _parse{index}(payload, {start}, {end}, {base})')
+			variable = f'_v{index}'
+		elif (start, end) in slices:
+			variable = slices[start, end]
+		else:
+			variable = slices[start, end] = f'_v{index}'
+			shift = (lastByte * 2 - end) * 4
+			mask = (1 << (end - start) * 4) - 1
+			lines.append(f'{variable} = _raw >> {shift} & {mask:#x}' if shift else f'{variable} = _raw & {mask:#x}')
+		match expression:
+			case None:
+				values[field] = variable
+			case str() if (fused := _fuseExpression(expression, variable)) is not None:
+				values[field] = f'({fused})'
+			case str():
+				namespace[f'_expression{index}'] = parseMathString(expression)
+				values[field] = f'_expression{index}({variable})'
+			case _:
+				namespace[f'_expression{index}'] = expression
+				values[field] = f'_expression{index}({variable})'
+	lines.append(f'return {{{", ".join(f"{field!r}: {value}" for field, value in values.items())}}}')
+	source = 'def decode(payload):\n' + '\n'.join(f'\t{line}' for line in lines)
+	pluginLog.verbose(f'Compiled payload decoder for {model or "unknown model"}:\n{source}', verbosity=5)
+	exec(compile(source, f'<GoveeDecoder {model}>', 'exec'), {'__builtins__': {'len': len, 'ValueError': ValueError}, **namespace}, namespace)
+	return namespace['decode']
+
+
 class BLEPayloadParser:
 
 	def __init__(self, field: str, startingByte: int, endingByte: int, expression: Optional[Union[str, Callable]] = None, base: int = 16):
@@ -60,19 +144,85 @@ class BLEPayloadParser:
 		self.__endingByte = endingByte
 		self.__expression = expression
 		self.__base = base
-		match expression:
-			case FunctionType():
-				self.__expression = expression
-			case str():
-				self.__expression = parseMathString(expression)
+		# Strings are validated up front, compiling the decoder fuses them into it
+		if isinstance(expression, str):
+			parseMathString(expression)
 
-	def __call__(self, payload: bytes) -> dict[str, float | int]:
-		payload = int(payload.hex().upper()[self.__startingByte: self.__endingByte], self.__base)
-		if self.__expression is not None:
-			value = self.__expression(payload)
-		else:
-			value = payload
-		return {self.__field: value}
+	@property
+	def spec(self) -> BLEFieldSpec:
+		return self.__field, self.__startingByte, self.__endingByte, self.__expression, self.__base
+
+	@staticmethod
+	def parseString(payload: bytes | memoryview, startingByte: int, endingByte: int, base: int) -> int:
+		"""Parses the slice of the payload's hex representation in a base other than 16"""
+		return int(bytes(payload).hex().upper()[startingByte: endingByte], base)
+
+	def __call__(self, payload: bytes | memoryview) -> dict[str, float | int]:
+		return compileDecoder(None, (self.spec,))(payload)
+
+
+@dataclass
+class AdvertIntake:
+	"""Advertisement counts and the last forwarded advertisement of a device"""
+	received: int = 0
+	forwarded: int = 0
+	duplicates: int = 0
+	rateLimited: int = 0
+	payload: bytes = b''
+	rssi: Optional[int] = None
+	lastForward: float = -inf
+	rssiKey: Optional[CategoryItem] = None
+
+	@property
+	def counts(self) -> Dict[str, int]:
+		return {'received': self.received, 'forwarded': self.forwarded, 'duplicates': self.duplicates, 'rateLimited': self.rateLimited}
+
+
+class AdvertFilter:
+	"""
+	Per-device intake filter for BLE advertisements.
+
+	Payloads identical to the last one forwarded from a device are dropped until `duplicateWindow`
+	has passed, unless the RSSI changed and its key has subscribers.  No device is forwarded more
+	than `maxRate` times per second.
+	"""
+
+	def __init__(self, duplicateWindow: timedelta, maxRate: float, rssiSubscribed: Callable[[CategoryItem], bool] = None):
+		self.duplicateWindow = duplicateWindow.total_seconds()
+		self.minInterval = 1 / maxRate if maxRate > 0 else 0.0
+		self.rssiSubscribed = rssiSubscribed
+		self.devices: Dict[str, AdvertIntake] = {}
+
+	def device(self, address: str) -> AdvertIntake:
+		if (intake := self.devices.get(address, None)) is None:
+			intake = self.devices[address] = AdvertIntake()
+		return intake
+
+	def accept(self, address: str, payload: bytes | memoryview, rssi: int) -> bool:
+		now = monotonic()
+		intake = self.device(address)
+		intake.received += 1
+		elapsed = now - intake.lastForward
+		if payload == intake.payload and elapsed < self.duplicateWindow and not self.__rssiChanged(intake, rssi):
+			intake.duplicates += 1
+			return False
+		if elapsed < self.minInterval:
+			intake.rateLimited += 1
+			return False
+		intake.payload = bytes(payload)
+		intake.rssi = rssi
+		intake.lastForward = now
+		intake.forwarded += 1
+		return True
+
+	def __rssiChanged(self, intake: AdvertIntake, rssi: int) -> bool:
+		if rssi == intake.rssi or intake.rssiKey is None or self.rssiSubscribed is None:
+			return False
+		return self.rssiSubscribed(intake.rssiKey)
+
+	@property
+	def counts(self) -> Dict[str, Dict[str, int]]:
+		return {address: intake.counts for address, intake in self.devices.items()}
 
 
 loop = asyncio.get_event_loop()
@@ -120,6 +270,11 @@ temperature.expression = val / 10000
 humidity.slice = [4:10]
 humidity.expression = payload % 1000 / 1000
 battery.slice = [10:12]
+
+; Advertisements identical to the last one forwarded are dropped within this window
+filter.duplicateWindow = 15 seconds
+; Maximum updates per second from each device
+filter.maxRate = 1
 """
 
 
@@ -237,6 +392,15 @@ class Govee(Plugin, realtime=True, logged=True):
 		self.__temperatureParse = BLEPayloadParser(**getValues('temperature'))
 		self.__humidityParse = BLEPayloadParser(**getValues('humidity'))
 		self.__batteryParse = BLEPayloadParser(**getValues('battery'))
+		model = self.__readDeviceConfig(pluginConfig).get('model', None)
+		self.__decode = compileDecoder(model, (self.__temperatureParse.spec, self.__humidityParse.spec, self.__batteryParse.spec))
+
+		section = pluginConfig.default_section
+		self.advertFilter = AdvertFilter(
+			duplicateWindow=pluginConfig.getOrSet(section, 'filter.duplicateWindow', '15 seconds', pluginConfig.configToTimeDelta),
+			maxRate=pluginConfig.getOrSet(section, 'filter.maxRate', 1.0, pluginConfig.getfloat),
+			rssiSubscribed=self.publisher.hasSubscribers,
+		)
 
 		return pluginConfig
 
@@ -272,6 +436,8 @@ class Govee(Plugin, realtime=True, logged=True):
 	async def asyncStart(self):
 		pluginLog.info(f'{self.name} starting...')
 
+		await self.log.asyncRestore()
+
 		if self.historicalTimer is None:
 			self.historicalTimer = ScheduledEvent(timedelta(seconds=15), self.logValues).schedule()
 		else:
@@ -319,6 +485,9 @@ class Govee(Plugin, realtime=True, logged=True):
 			pluginLog.error(f'Error stopping scanner: {e}')
 		if self.historicalTimer is not None and self.historicalTimer.running:
 			self.historicalTimer.stop()
+		for address, counts in self.advertFilter.counts.items():
+			self.pluginLog.info(f'{self.name}: {address} forwarded {counts["forwarded"]} of {counts["received"]} advertisements, {counts}')
+		self.log.close()
 		self.pluginLog.info(f'{self.name} stopped')
 
 
@@ -375,22 +544,31 @@ class Govee(Plugin, realtime=True, logged=True):
 
 	def __dataParse(self, device, data):
 		try:
-			dataBytes: bytes = data.manufacturer_data[1]
+			payload = memoryview(data.manufacturer_data[1])
 		except KeyError:
 			pluginLog.error(f'Invalid data: {data!r}')
 			return
+		address, rssi = str(device.address), int(device.rssi)
+		if not self.advertFilter.accept(address, payload, rssi):
+			return
+		try:
+			fields = self.__decode(payload)
+		except ValueError as e:
+			pluginLog.error(f'Unable to decode payload {data!r}: {e}')
+			return
 		results = {
 			'timestamp': now().timestamp(),
 			'type': f'BLE{str(type(data).__name__)}',
-			'rssi': int(device.rssi),
+			'rssi': rssi,
 			'deviceName': str(device.name),
-			'deviceAddress': str(device.address),
-			**self.__temperatureParse(dataBytes),
-			**self.__humidityParse(dataBytes),
-			**self.__batteryParse(dataBytes),
+			'deviceAddress': address,
+			**fields,
 		}
 		data = LevityDatagram(results, schema=self.schema, dataMaps=self.schema.dataMaps)
 		pluginLog.verbose(f'{self.__class__.__name__} received: {data["realtime"]}', verbosity=5)
+		intake = self.advertFilter.device(address)
+		if intake.rssiKey is None:
+			intake.rssiKey = next((key for key in data['realtime'] if str(key[-1]) == 'rssi'), None)
 		self.realtime.update(data)
 		self.lastDatagram = data
 
@@ -3,9 +3,8 @@ from datetime import timedelta
 
 from LevityDash.lib.config import userConfig
 from LevityDash.lib.plugins.schema import SchemaSpecialKeys as tsk
-from LevityDash.lib.plugins.utils import ScheduledEvent
-from LevityDash.lib.plugins.web import Endpoint, REST, URLs
-from LevityDash.lib.plugins.web.errors import APIError
+from LevityDash.lib.plugins.web import Endpoint, RefreshSchedule, REST, URLs
+from LevityDash.lib.plugins.web.errors import APIError, NotModified
 
 WMOCodes = {
 	0:  {'description': 'Clear', 'icon': 'wi:day-sunny'},
@@ -540,6 +539,7 @@ schema = {
 		tsk.metaData:  '@timestamp',
 	},
 	'dataMaps':                                     {'forecast': {'daily': 'daily', 'hourly': 'hourly'}},
+	'columnar':                                     ['forecast'],
 	'aliases':                                      {
 		'@conditionIcon': {k: v['icon'] for k, v in WMOCodes.items()},
 		'@condition':     {k: v['description'] for k, v in WMOCodes.items()},
@@ -639,7 +639,7 @@ class OpenMeteo(REST, realtime=False, hourly=True, daily=True, recorded=True):
 	urls = OpenMeteoURLs()
 	schema = schema
 	name = 'OpenMeteo'
-	requestTimer: ScheduledEvent
+	requestTimer: RefreshSchedule
 
 	__defaultConfig__ = f"""
 	[plugin]
@@ -658,12 +658,13 @@ class OpenMeteo(REST, realtime=False, hourly=True, daily=True, recorded=True):
 		loop = self.loop
 
 		async def async_bootstrap():
+			await self.replaySnapshots()
+			self.requestTimer = self.scheduleRefresh(self.urls.forecast, self.getForecast, timedelta(minutes=15)).start()
 			self.pluginLog.info('OpenMeteo: started')
 			await self.future
 			self.pluginLog.info('OpenMeteo: starting shutdown')
 
 		def bootstrap():
-			self.requestTimer = ScheduledEvent(timedelta(minutes=15), self.getForecast, loop=loop).start()
 			self._task = async_bootstrap()
 			self.loop.run_until_complete(self._task)
 			self.stop()
@@ -688,6 +689,7 @@ class OpenMeteo(REST, realtime=False, hourly=True, daily=True, recorded=True):
 		self.pluginLog.info('OpenMeteo: stopped')
 
 	async def asyncStop(self):
+		await super(OpenMeteo, self).asyncStop()
 		self.future.set_result(True)
 		self.future.cancel()
 		self.loop.stop()
@@ -695,6 +697,8 @@ class OpenMeteo(REST, realtime=False, hourly=True, daily=True, recorded=True):
 	async def getForecast(self):
 		try:
 			data = await self.getData(self.urls.forecast)
+		except NotModified:
+			return
 		except APIError as e:
 			self.pluginLog.warn('OpenMeteo: No data received')
 			return
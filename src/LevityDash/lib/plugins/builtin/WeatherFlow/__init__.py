@@ -2,16 +2,16 @@ import asyncio
 from datetime import datetime, timedelta, timezone
 from functools import partial
 from json import dumps, loads
-from typing import Callable
+from typing import Callable, Dict, List, Optional
 
-from aiohttp import ClientSession, ClientWebSocketResponse, WSMsgType
+from aiohttp import ClientError, ClientWebSocketResponse, WSMsgType
 
 from LevityDash.lib.plugins.errors import InvalidData
 from LevityDash.lib.plugins.schema import LevityDatagram, SchemaSpecialKeys as tsk
 from LevityDash.lib.plugins.utils import ScheduledEvent
-from LevityDash.lib.plugins.web import Auth, AuthType, Endpoint, REST, URLs
-from LevityDash.lib.plugins.web.errors import APIError
-from LevityDash.lib.plugins.web.socket_ import UDPSocket
+from LevityDash.lib.plugins.web import Auth, AuthType, Backoff, Endpoint, RefreshSchedule, REST, URLs
+from LevityDash.lib.plugins.web.errors import APIError, NotModified
+from LevityDash.lib.plugins.web.socket_ import MessageRoute, UDPSocket
 from LevityDash.lib.utils.shared import LOCAL_TIMEZONE, Now
 
 __all__ = ["WeatherFlow", '__plugin__']
@@ -244,13 +244,66 @@ schema = {
 ignore = {'rapid_wind'}
 
 
+def _socketRoute(dataMap: dict) -> Optional[MessageRoute]:
+	"""Drops observations and events that arrive without their data array"""
+	path = dataMap['realtime']
+	if not path:
+		return None
+	key = path[0] if isinstance(path, tuple) else path
+	return lambda message: message if message.get(key, None) else None
+
+
+def mergeSocketMessages(messages: List[dict]) -> List[dict]:
+	"""
+	Reduces a flush window to the latest message of each type from each device.  Every observation and
+	status message carries all of its fields so a newer one supersedes the older, events are distinct
+	occurrences and are all kept.
+	"""
+	merged = {}
+	for i, message in enumerate(messages):
+		messageType = message.get('type', None)
+		key = i if str(messageType).startswith('evt_') else (messageType, message.get('serial_number', None))
+		merged.pop(key, None)
+		merged[key] = message
+	return list(merged.values())
+
+
+# Dispatch table of the UDP message types the schema can parse
+socketRoutes: Dict[str, Optional[MessageRoute]] = {
+	messageType: _socketRoute(dataMap) for messageType, dataMap in schema['dataMaps'].items() if messageType in schema['keyMaps']
+}
+
+
 class WFWebsocket:
+	"""
+	Supervised websocket client for WeatherFlow's realtime feed.
+
+	The connection is reopened with exponential backoff whenever it drops, fails to connect or goes
+	quiet for longer than `idleTimeout`.  aiohttp pings the server every `heartbeat` to detect dead
+	connections sooner.  After a reconnect the gap since the last logged observation is backfilled from
+	the REST history endpoint.  State changes are logged, which surfaces them in the status bar.
+
+	The url defaults to the plugin's websocket endpoint and can be pointed at a local stand-in.
+	"""
+
 	socket: ClientWebSocketResponse | None
 
-	def __init__(self, plugin: 'WeatherFlow', *args, **kwargs):
+	heartbeat: timedelta = timedelta(seconds=30)
+	idleTimeout: timedelta = timedelta(minutes=2)
+	minimumGap: timedelta = timedelta(minutes=2)
+
+	def __init__(self, plugin: 'WeatherFlow', url: str = None, params: dict = None, backoff: Backoff = None, *args, **kwargs):
 		self.socket = None
 		self.plugin = plugin
 		self.loop = plugin.loop
+		self.state = 'disconnected'
+		self.connects = 0
+		self.disconnectedAt: Optional[datetime] = None
+		self.backoff = backoff or Backoff(base=timedelta(seconds=2), cap=timedelta(minutes=5))
+		self.__url = url
+		self.__params = params
+		self.__task: Optional[asyncio.Task] = None
+		self.__stopping = False
 		from secrets import token_urlsafe as genUUID
 		self.uuid = genUUID(8)
 
@@ -263,37 +316,100 @@ class WFWebsocket:
 			}
 		)
 
+	def __setState(self, state: str, detail: str = None):
+		if state == self.state and detail is None:
+			return
+		self.state = state
+		message = f'WeatherFlow: websocket {state}' + (f' {detail}' if detail else '')
+		if state == 'reconnecting':
+			self.plugin.pluginLog.warning(message)
+		else:
+			self.plugin.pluginLog.info(message)
+
 	def start(self):
-		self.loop.create_task(self.run())
+		self.__stopping = False
+		if self.__task is None or self.__task.done():
+			self.__task = self.loop.create_task(self.run())
 
 	def stop(self):
 		self.loop.create_task(self.astop())
 
 	async def astop(self):
-		if self.socket is None:
-			return
-		self.plugin.pluginLog.info('WeatherFlow: disconnecting Websocket')
-		await self.socket.send_str(self._genMessage('listen_stop'))
-		await self.socket.close()
+		self.__stopping = True
+		if (socket := self.socket) is not None and not socket.closed:
+			self.plugin.pluginLog.info('WeatherFlow: disconnecting Websocket')
+			try:
+				await socket.send_str(self._genMessage('listen_stop'))
+				await socket.close()
+			except (ClientError, ConnectionError, RuntimeError) as e:
+				self.plugin.pluginLog.verbose(f'WeatherFlow: websocket closed uncleanly: {e!r}', verbosity=2)
 		self.socket = None
-		self.plugin.pluginLog.info('WeatherFlow: socket disconnected')
+		if self.__task is not None and not self.__task.done():
+			self.__task.cancel()
+		self.__task = None
+		self.__setState('stopped')
 
 	async def run(self):
-		self.plugin.pluginLog.info('WeatherFlow: connecting Websocket')
-		async with ClientSession() as session:
-			async with session.ws_connect(self.url, params=self.endpoint.params) as ws:
-				self.socket = ws
-				await self._open(ws)
-				async for msg in ws:
+		"""Keeps the websocket connected until stopped"""
+		while not self.__stopping:
+			try:
+				await self.__connection()
+			except asyncio.CancelledError:
+				break
+			except (ClientError, ConnectionError, asyncio.TimeoutError) as e:
+				self.plugin.pluginLog.verbose(f'WeatherFlow: websocket connection failed: {e!r}', verbosity=1)
+			except Exception as e:
+				self.plugin.pluginLog.exception(e)
+			if self.__stopping:
+				break
+			if self.disconnectedAt is None:
+				self.disconnectedAt = datetime.now(tz=timezone.utc)
+			delay = self.backoff.next()
+			self.__setState('reconnecting', f'in {timedelta(seconds=round(delay))} (attempt {self.backoff.attempt})')
+			try:
+				await asyncio.sleep(delay)
+			except asyncio.CancelledError:
+				break
+
+	async def __connection(self):
+		self.__setState('connecting')
+		async with self.plugin.sessionPool.session.ws_connect(self.url, params=self.params, heartbeat=self.heartbeat.total_seconds()) as ws:
+			self.socket = ws
+			await self._open(ws)
+			self.connects += 1
+			self.backoff.reset()
+			self.__setState('connected', f'after {self.connects - 1} reconnects' if self.connects > 1 else None)
+			if self.disconnectedAt is not None:
+				self.loop.create_task(self.backfill(self.disconnectedAt))
+				self.disconnectedAt = None
+			try:
+				while True:
+					msg = await ws.receive(timeout=self.idleTimeout.total_seconds())
 					if msg.type == WSMsgType.TEXT:
 						try:
 							await self._handleMessage(msg.data)
 						except Exception as e:
 							self.plugin.pluginLog.exception(f'WeatherFlow: error handling message: {e}')
-					elif msg.type == WSMsgType.ERROR:
+					elif msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSING, WSMsgType.CLOSED, WSMsgType.ERROR):
+						self.plugin.pluginLog.info(f'WeatherFlow: socket closed ({msg.type.name.lower()})')
 						break
-				else:
-					self.plugin.pluginLog.info('WeatherFlow: socket closed')
+			except asyncio.TimeoutError:
+				self.plugin.pluginLog.warning(f'WeatherFlow: no websocket messages for {self.idleTimeout}')
+			finally:
+				self.socket = None
+				if not self.__stopping:
+					self.disconnectedAt = datetime.now(tz=timezone.utc)
+					self.__setState('disconnected')
+
+	async def backfill(self, disconnectedAt: datetime):
+		"""Requests the history missing from the log since the last observation before the disconnect"""
+		end = datetime.now(tz=timezone.utc)
+		latest = self.plugin.log.latest
+		start = min(latest, disconnectedAt) if latest is not None else disconnectedAt
+		if end - start < self.minimumGap:
+			return
+		self.plugin.pluginLog.info(f'WeatherFlow: backfilling {timedelta(seconds=round((end - start).total_seconds()))} of missed observations')
+		await self.plugin.backfill(start, end)
 
 	async def _handleMessage(self, data: str):
 		datagram = loads(data)
@@ -304,6 +420,8 @@ class WFWebsocket:
 			case {'type': 'ack', **rest}:
 				self.plugin.pluginLog.info("Websocket acknowledged connection")
 				return
+			case {'type': 'connection_closed'}:
+				self.plugin.pluginLog.info("Websocket disconnected from WeatherFlow")
 			case {'summary': dict(summary), **rest}:
 				summaryDatagram = LevityDatagram({'type': 'summary', **summary}, schema=self.plugin.schema, sourceData={'websocket': self})
 				message = LevityDatagram(rest, schema=self.plugin.schema, sourceData={'websocket': self})
@@ -312,20 +430,24 @@ class WFWebsocket:
 			case dict(datagram) if 'type' in datagram:
 				message = LevityDatagram(datagram, schema=self.plugin.schema, sourceData={'websocket': self})
 				asyncio.create_task(self.plugin.observations.realtime.asyncUpdate(message))
-			case {'type': 'connection_closed'}:
-				self.plugin.pluginLog.info("Websocket disconnected from WeatherFlow")
 			case _:
 				self.plugin.pluginLog.warning(f"Unknown message from WeatherFlow: {datagram}")
 
 	@property
 	def running(self) -> bool:
-		if self.socket is None:
-			return False
-		return self.socket.closed is False
+		return self.__task is not None and not self.__task.done()
+
+	@property
+	def connected(self) -> bool:
+		return self.socket is not None and self.socket.closed is False
 
 	@property
 	def url(self):
-		return self.plugin.urls.websocket.url
+		return self.__url or self.plugin.urls.websocket.url
+
+	@property
+	def params(self) -> dict:
+		return self.__params if self.__params is not None else self.endpoint.params
 
 	@property
 	def endpoint(self):
@@ -367,14 +489,20 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 	__defaultConfig__ = _defaultConfig
 	__configRequired = ['stationID', 'deviceID', 'token']
 
-	realtimeTimer: ScheduledEvent
-	forecastTimer: ScheduledEvent
+	realtimeTimer: RefreshSchedule
+	forecastTimer: RefreshSchedule
 	loggingTimer: ScheduledEvent
 
 	def __init__(self, *args, **kwargs):
 		super(WeatherFlow, self).__init__(*args, **kwargs)
-		self.udp = UDPSocket(self, port=50222)
-		self.udp.handler.connectSlot(self.socketUpdate)
+		config = self.config
+		batchWindow = config.getOrSet(config.default_section, 'socketBatchWindow', '250 ms', config.configToTimeDelta) if config is not None else None
+		if batchWindow:
+			self.udp = UDPSocket(self, port=50222, routes=socketRoutes, flushWindow=batchWindow)
+			self.udp.handler.connectBatchSlot(self.socketBatch)
+		else:
+			self.udp = UDPSocket(self, port=50222)
+			self.udp.handler.connectSlot(self.socketUpdate)
 		self.websocket = WFWebsocket(self)
 
 	@property
@@ -394,6 +522,37 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 		for observation in self.observations:
 			if observation.dataName in message:
 				observation.update(message)
+		if datagram.get('type', None) not in ignore:
+			self.markFresh('socket')
+			if (snapshots := self.snapshots) is not None:
+				snapshots.save('socket', datagram)
+
+	def socketBatch(self, messages: List[dict]):
+		"""Updates the observations once for each message type received by the UDP socket during a flush window"""
+		datagrams = []
+		for datagram in mergeSocketMessages(messages):
+			try:
+				message = LevityDatagram(datagram, schema=self.schema, sourceData={'socket': self.udp})
+			except Exception as e:
+				self.pluginLog.error(f'{self.name}: unable to parse {datagram.get("type", "unknown")} socket message')
+				self.pluginLog.exception(e)
+				continue
+			self.__logItem(message)
+			datagrams.append(message)
+		for observation in self.observations:
+			for message in datagrams:
+				if observation.dataName in message:
+					observation.update(message)
+		latest = next((datagram for datagram in reversed(messages) if datagram.get('type', None) not in ignore), None)
+		if latest is not None:
+			self.markFresh('socket')
+			if (snapshots := self.snapshots) is not None:
+				snapshots.save('socket', latest)
+
+	def replayDatagram(self, name: str, payload) -> LevityDatagram | None:
+		if name == 'socket':
+			return LevityDatagram(payload, schema=self.schema, sourceData={'socket': self.udp, 'replayed': True})
+		return super(WeatherFlow, self).replayDatagram(name, payload)
 
 	def __logItem(self, message: LevityDatagram):
 		messageType = message.metaData.get('@type', 'unknown')
@@ -411,6 +570,9 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 		async def async_bootstrap():
 			loop = self.loop
 
+			await self.log.asyncRestore()
+			await self.replaySnapshots()
+
 			if self.config['socketUpdates']:
 				section = self.config.default_section
 				if self.config.getOrSet(section, 'socketType', 'web') == 'web':
@@ -419,8 +581,8 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 					ScheduledEvent(Now(), self.udp.start, singleShot=True, loop=loop).start()
 
 			realtimeRefreshInterval = self.urls.realtime.refreshInterval
-			self.realtimeTimer = ScheduledEvent(realtimeRefreshInterval, self.getRealtime, loop=loop).start()
-			self.forecastTimer = ScheduledEvent(timedelta(minutes=15), self.getForecast, loop=loop).start()
+			self.realtimeTimer = self.scheduleRefresh(self.urls.realtime, self.getRealtime, realtimeRefreshInterval).start()
+			self.forecastTimer = self.scheduleRefresh(self.urls.forecast, self.getForecast, timedelta(minutes=15)).start()
 			self.loggingTimer = ScheduledEvent(timedelta(minutes=1), self.logValues, loop=loop).schedule()
 
 			if self.config['fetchHistory']:
@@ -447,14 +609,13 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 			self.future.cancel()
 			await self.loop.shutdown_asyncgens()
 			ScheduledEvent.cancelAll(self)
-			try:
-				await self.websocket.asyncStop()
-			except AttributeError:
-				pass
+			await self.websocket.astop()
 			try:
 				self.udp.stop()
 			except AttributeError:
 				pass
+			await super(WeatherFlow, self).asyncStop()
+			self.log.close()
 
 		asyncio.run_coroutine_threadsafe(continue_shutdown(), self.loop)
 		self.pluginLog.info('WeatherFlow: starting shutdown')
@@ -465,9 +626,10 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 		try:
 			data = await self.getData(endpoint)
 			asyncio.create_task(self.realtime.asyncUpdate(data, source=[self.name, self.urls.realtime]))
+		except NotModified:
+			pass
 		except TimeoutError as e:
 			self.pluginLog.warning(f'WeatherFlow: realtime request timed out: {e}')
-			self.realtimeTimer.retry(timedelta(minutes=1))
 		except InvalidData as e:
 			self.pluginLog.error(f'WeatherFlow: realtime request failed')
 			self.pluginLog.exception(e)
@@ -482,9 +644,10 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 			for obs in self.observations:
 				if obs.dataName in data:
 					obs.update(data)
+		except NotModified:
+			pass
 		except TimeoutError as e:
 			self.pluginLog.warning(f'WeatherFlow: forecast request timed out: {e}')
-			self.forecastTimer.retry(timedelta(minutes=1))
 		except InvalidData as e:
 			self.pluginLog.error(f'WeatherFlow: realtime request failed')
 			self.pluginLog.exception(e)
@@ -493,6 +656,11 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 		except Exception as e:
 			self.pluginLog.exception(e)
 
+	def __historicalParams(self, start: datetime, end: datetime) -> dict:
+		params = self.urls.historical.params.copy()
+		params.update({'time_start': int(start.timestamp()), 'time_end': int(end.timestamp())})
+		return params
+
 	async def getHistorical(self, start: datetime = None, end: datetime = None):
 		# TODO: Investigate possible crashing bug on first scheduled run after launch
 		#       run.  This has only been observed on some hardware
@@ -500,13 +668,12 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 			end = datetime.now(tz=LOCAL_TIMEZONE)
 		if start is None:
 			start = end - timedelta(days=2)
-		params = self.urls.historical.params.copy()
-		start = start.astimezone(tz=timezone.utc)
-		end = end.astimezone(tz=timezone.utc)
-		params.update({'time_start': int(start.timestamp()), 'time_end': int(end.timestamp())})
+		params = self.__historicalParams(start, end)
 		try:
 			data = await self.getData(self.urls.historical, params=params)
 			await self.log.asyncUpdate(data)
+		except NotModified:
+			pass
 		except TimeoutError as e:
 			self.pluginLog.warning(f'WeatherFlow: historical request timed out: {e}')
 			self.loggingTimer.retry(timedelta(minutes=1))
@@ -518,6 +685,23 @@ class WeatherFlow(REST, realtime=True, daily=True, hourly=True, logged=True):
 		except Exception as e:
 			self.pluginLog.exception(e)
 
+	async def backfill(self, start: datetime, end: datetime):
+		"""Fills the log between start and end from the device history without duplicating logged observations"""
+		try:
+			data = await self.getData(self.urls.historical, params=self.__historicalParams(start, end))
+			await self.log.asyncBackfill(data, start, end)
+		except NotModified:
+			pass
+		except TimeoutError as e:
+			self.pluginLog.warning(f'WeatherFlow: backfill request timed out: {e}')
+		except InvalidData as e:
+			self.pluginLog.error(f'WeatherFlow: backfill request failed')
+			self.pluginLog.exception(e)
+		except APIError as e:
+			self.pluginLog.exception(e)
+		except Exception as e:
+			self.pluginLog.exception(e)
+
 	@property
 	def messenger(self):
 		return self._udpSocket
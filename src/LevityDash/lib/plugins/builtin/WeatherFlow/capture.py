@@ -0,0 +1,381 @@
+"""
+Records WeatherFlow UDP broadcasts and replays them to reproduce a realistic socket load without a station.
+
+	python -m LevityDash.lib.plugins.builtin.WeatherFlow.capture record capture.udp [--duration 600]
+	python -m LevityDash.lib.plugins.builtin.WeatherFlow.capture synthesize capture.udp [--stations 3] [--minutes 10]
+	python -m LevityDash.lib.plugins.builtin.WeatherFlow.capture replay capture.udp [--speed 1] [--port 50222]
+	python -m LevityDash.lib.plugins.builtin.WeatherFlow.capture bench capture.udp [--speed 0] [--window 0.25]
+
+`replay` rebroadcasts a capture to a running dashboard and reports the send rate, `bench` replays it into a
+socket protocol and realtime observation in the same process and reports the latency from send to the realtime
+publish along with dropped packets.  A speed of 0 sends as fast as possible.
+"""
+
+import asyncio
+import struct
+from copy import deepcopy
+from dataclasses import dataclass, field
+from datetime import timedelta
+from functools import partial
+from json import dumps, loads
+from pathlib import Path
+from random import Random
+from statistics import median, quantiles
+from time import monotonic, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from LevityDash.lib.log import LevityPluginLog
+
+__all__ = ['CaptureWriter', 'readCapture', 'record', 'replay', 'synthesize', 'bench', 'ReplayReport']
+
+log = LevityPluginLog.getChild('WeatherFlow').getChild('Capture')
+
+_MAGIC = b'LDUDP1\n'
+# Seconds since the start of the capture and the length of the packet that follows
+_RECORD = struct.Struct('<dI')
+
+defaultPort = 50222
+
+
+class CaptureWriter:
+	"""Appends received packets with their time relative to the first packet"""
+
+	def __init__(self, path: Path | str):
+		self.path = Path(path)
+		self.__file = self.path.open('wb')
+		self.__file.write(_MAGIC)
+		self.__start: Optional[float] = None
+		self.count = 0
+
+	def write(self, data: bytes, received: float = None):
+		received = monotonic() if received is None else received
+		if self.__start is None:
+			self.__start = received
+		self.__file.write(_RECORD.pack(received - self.__start, len(data)))
+		self.__file.write(data)
+		self.count += 1
+
+	def close(self):
+		self.__file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+def readCapture(path: Path | str) -> Iterator[Tuple[float, bytes]]:
+	"""Offset in seconds and raw bytes of each recorded packet"""
+	with Path(path).open('rb') as file:
+		if file.read(len(_MAGIC)) != _MAGIC:
+			raise ValueError(f'{path} is not a UDP capture')
+		while header := file.read(_RECORD.size):
+			if len(header) < _RECORD.size:
+				log.warning(f'{path} ends with a truncated record')
+				return
+			offset, length = _RECORD.unpack(header)
+			data = file.read(length)
+			if len(data) < length:
+				log.warning(f'{path} ends with a truncated record')
+				return
+			yield offset, data
+
+
+class _Recorder(asyncio.DatagramProtocol):
+
+	def __init__(self, writer: CaptureWriter):
+		self.writer = writer
+
+	def datagram_received(self, data, addr):
+		self.writer.write(data)
+
+
+async def record(path: Path | str, port: int = defaultPort, duration: float = None) -> int:
+	"""Records broadcasts on port until duration passes or the task is cancelled, returns the packets recorded"""
+	loop = asyncio.get_running_loop()
+	with CaptureWriter(path) as writer:
+		try:
+			# Reusing the port lets the capture run beside a dashboard listening for the same broadcasts
+			transport, _ = await loop.create_datagram_endpoint(lambda: _Recorder(writer), local_addr=('0.0.0.0', port), reuse_port=True)
+		except (ValueError, OSError):
+			transport, _ = await loop.create_datagram_endpoint(lambda: _Recorder(writer), local_addr=('0.0.0.0', port))
+		log.info(f'Recording UDP port {port} to {writer.path}')
+		try:
+			if duration is not None:
+				await asyncio.sleep(duration)
+			else:
+				await asyncio.Event().wait()
+		except asyncio.CancelledError:
+			pass
+		finally:
+			transport.close()
+		log.info(f'Recorded {writer.count} packets')
+		return writer.count
+
+
+def synthesize(path: Path | str, stations: int = 1, minutes: float = 10, seed: int = 0) -> int:
+	"""
+	Writes a capture with the broadcast pattern of Tempest stations on one hub: rapid wind every 3 seconds,
+	an observation every minute and device and hub status every minute and 10 seconds respectively.
+	"""
+	random = Random(seed)
+	start = int(time())
+	packets: List[Tuple[float, dict]] = []
+	hub = 'HB-00000001'
+	for station in range(stations):
+		serial = f'ST-{station + 1:08d}'
+		phase = random.random() * 3
+		for offset in range(0, int(minutes * 60), 3):
+			packets.append((offset + phase, {
+				'serial_number': serial, 'type': 'rapid_wind', 'hub_sn': hub,
+				'ob': [start + offset, round(random.uniform(0, 8), 2), random.randrange(360)]
+			}))
+		for offset in range(0, int(minutes * 60), 60):
+			packets.append((offset + phase + 1, {
+				'serial_number': serial, 'type': 'obs_st', 'hub_sn': hub, 'firmware_revision': 171,
+				'obs': [[
+					start + offset, 0.18, round(random.uniform(0, 8), 2), 0.27, random.randrange(360), 3, 1017.57,
+					round(random.uniform(10, 30), 2), 50.26, 328, 0.03, 3, 0.0, 0, 0, 0, 2.41, 1
+				]]
+			}))
+			packets.append((offset + phase + 2, {
+				'serial_number': serial, 'type': 'device_status', 'hub_sn': hub, 'timestamp': start + offset,
+				'uptime': 2189 + offset, 'voltage': 2.41, 'firmware_revision': 171, 'rssi': -51, 'hub_rssi': -50,
+				'sensor_status': 0, 'debug': 0
+			}))
+	for offset in range(0, int(minutes * 60), 10):
+		packets.append((offset + 0.5, {
+			'serial_number': hub, 'type': 'hub_status', 'firmware_revision': '177', 'uptime': 1670133 + offset,
+			'rssi': -62, 'timestamp': start + offset, 'reset_flags': 'BOR,PIN,POR', 'seq': offset // 10
+		}))
+	packets.sort(key=lambda packet: packet[0])
+	with CaptureWriter(path) as writer:
+		for offset, packet in packets:
+			writer.write(dumps(packet, separators=(',', ':')).encode(), received=offset)
+	return len(packets)
+
+
+async def replay(path: Path | str, host: str = '127.0.0.1', port: int = defaultPort, speed: float = 1.0, sent: Dict[str, List[float]] = None, report: 'ReplayReport' = None) -> 'ReplayReport':
+	"""
+	Sends every packet of a capture to host and port.  Packets keep their recorded spacing divided by speed,
+	a speed of 0 sends them as fast as possible.  Send times are appended to sent by packet key when given.
+	"""
+	loop = asyncio.get_running_loop()
+	report = report or ReplayReport()
+	transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+	try:
+		start = monotonic()
+		for offset, data in readCapture(path):
+			if speed > 0:
+				if (delay := start + offset / speed - monotonic()) > 0:
+					await asyncio.sleep(delay)
+				else:
+					report.behind = max(report.behind, -delay)
+			elif report.sent % 64 == 0:
+				# Yield now and then so a receiver in the same loop keeps up with an unpaced replay
+				await asyncio.sleep(0)
+			if sent is not None:
+				sent.setdefault(_packetKey(loads(data)), []).append(monotonic())
+			transport.sendto(data)
+			report.sent += 1
+		report.seconds = monotonic() - start
+	finally:
+		transport.close()
+	return report
+
+
+def _packetKey(message: dict) -> str:
+	return dumps(message, sort_keys=True, separators=(',', ':'))
+
+
+@dataclass
+class ReplayReport:
+	sent: int = 0
+	received: int = 0
+	unmatched: int = 0
+	batches: int = 0
+	publishes: int = 0
+	seconds: float = 0.0
+	behind: float = 0.0
+	latencies: List[float] = field(default_factory=list)
+	protocol: Dict[str, int] = field(default_factory=dict)
+
+	@property
+	def measured(self) -> bool:
+		"""False for a replay to another process, which only knows what it sent"""
+		return bool(self.protocol)
+
+	@property
+	def dropped(self) -> int:
+		return max(self.sent - self.received, 0)
+
+	def percentile(self, percent: int) -> float:
+		if len(self.latencies) < 2:
+			return self.latencies[0] if self.latencies else 0.0
+		return quantiles(self.latencies, n=100, method='inclusive')[percent - 1]
+
+	def __str__(self):
+		lines = [f'sent {self.sent} packets in {self.seconds:.2f}s ({self.sent / self.seconds if self.seconds else 0:.0f}/s)']
+		if self.behind:
+			lines.append(f'fell behind the capture by up to {self.behind * 1000:.2f}ms')
+		if not self.measured:
+			return '\n'.join(lines)
+		latencies = self.latencies or [0.0]
+		lines += [
+			f'received {self.received}, dropped {self.dropped} ({self.dropped / self.sent if self.sent else 0:.2%}), unmatched {self.unmatched}',
+			f'updated the realtime observation in {self.batches} batches, published {self.publishes} times',
+			f'latency to publish p50 {median(latencies) * 1000:.2f}ms  p95 {self.percentile(95) * 1000:.2f}ms  '
+			f'p99 {self.percentile(99) * 1000:.2f}ms  max {max(latencies) * 1000:.2f}ms',
+			'protocol ' + ', '.join(f'{key} {value}' for key, value in self.protocol.items()),
+		]
+		return '\n'.join(lines)
+
+
+class _BenchPlugin:
+	"""
+	Stand-in for the plugin that owns the socket protocol.  Messages take the plugin's own path from the
+	protocol into its realtime observation, the send time of each is held until the observation publishes.
+	"""
+
+	name = 'WeatherFlowCapture'
+	pluginLog = log
+	snapshots = None
+	udp = None
+
+	def __init__(self, report: 'ReplayReport', sent: Dict[str, List[float]]):
+		from LevityDash.lib.plugins.builtin.WeatherFlow import schema, WeatherFlow
+		from LevityDash.lib.plugins.schema import Schema
+
+		self.report = report
+		self.sent = sent
+		self.pending: List[float] = []
+		self.schema = Schema(plugin=self, source=deepcopy(schema))
+		self.realtime = WeatherFlow.classes['Realtime'](self)
+		self.realtime.dataName = 'realtime'
+		self.realtime.accumulator.connectSlot(self.published)
+		self.observations = [self.realtime]
+		self.__socketBatch = partial(WeatherFlow.socketBatch, self)
+		self.__socketUpdate = partial(WeatherFlow.socketUpdate, self)
+
+	def __contains__(self, key):
+		return False
+
+	def markFresh(self, name: str):
+		pass
+
+	def _WeatherFlow__logItem(self, message):
+		# The plugin's private message logger
+		pass
+
+	def received(self, messages: List[dict]):
+		for message in messages:
+			times = self.sent.get(_packetKey(message), None)
+			if not times:
+				self.report.unmatched += 1
+				continue
+			self.pending.append(times.pop(0))
+
+	def socketBatch(self, messages: List[dict]):
+		self.received(messages)
+		self.report.batches += 1
+		self.__socketBatch(messages)
+
+	def socketUpdate(self, message: dict):
+		self.received([message])
+		self.report.batches += 1
+		self.__socketUpdate(message)
+
+	def published(self, data):
+		now = monotonic()
+		self.report.publishes += 1
+		self.report.received += len(self.pending)
+		self.report.latencies.extend(now - sentAt for sentAt in self.pending)
+		self.pending.clear()
+
+
+async def _processQtEvents():
+	"""Runs the Qt events the publish scheduler relies on while the asyncio loop owns the thread"""
+	from PySide2.QtWidgets import QApplication
+
+	while (app := QApplication.instance()) is not None:
+		app.processEvents()
+		await asyncio.sleep(0.001)
+
+
+async def bench(path: Path | str, speed: float = 0.0, window: float = 0.25, drain: float = 1.0) -> ReplayReport:
+	"""
+	Replays a capture into a BaseSocketProtocol bound to localhost that updates a WeatherFlow realtime
+	observation and measures the time from sending each packet until the observation publishes it.  A window
+	of 0 publishes each packet on its own.  Packets that have not been published `drain` seconds after the
+	last flush window are counted as dropped.
+	"""
+	from LevityDash.lib.plugins.builtin.WeatherFlow import socketRoutes
+	from LevityDash.lib.plugins.web.socket_ import BaseSocketProtocol
+
+	loop = asyncio.get_running_loop()
+	report = ReplayReport()
+	sent: Dict[str, List[float]] = {}
+	plugin = _BenchPlugin(report, sent)
+	if window:
+		protocol = BaseSocketProtocol(plugin, routes=socketRoutes, flushWindow=timedelta(seconds=window))
+		protocol.handler.connectBatchSlot(plugin.socketBatch)
+	else:
+		protocol = BaseSocketProtocol(plugin)
+		protocol.handler.connectSlot(plugin.socketUpdate)
+	qtEvents = loop.create_task(_processQtEvents())
+	transport, _ = await loop.create_datagram_endpoint(lambda: protocol, local_addr=('127.0.0.1', 0))
+	port = transport.get_extra_info('sockname')[1]
+	try:
+		await replay(path, port=port, speed=speed, sent=sent, report=report)
+		await asyncio.sleep(window + drain)
+	finally:
+		transport.close()
+		qtEvents.cancel()
+	# Messages the schema can not parse, or that arrive without data, never reach the observations and are not losses
+	report.sent -= protocol.stats['unrouted'] + protocol.stats['invalid'] + protocol.stats['filtered']
+	report.protocol = dict(protocol.stats)
+	return report
+
+
+if __name__ == '__main__':
+	from argparse import ArgumentParser
+
+	parser = ArgumentParser(prog='capture', description='Record and replay WeatherFlow UDP broadcasts')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	recordCommand = commands.add_parser('record', help='Record broadcasts to a capture file')
+	recordCommand.add_argument('path')
+	recordCommand.add_argument('--port', type=int, default=defaultPort)
+	recordCommand.add_argument('--duration', type=float, default=None, help='Seconds to record, until interrupted when omitted')
+
+	synthesizeCommand = commands.add_parser('synthesize', help='Write a capture of simulated stations')
+	synthesizeCommand.add_argument('path')
+	synthesizeCommand.add_argument('--stations', type=int, default=1)
+	synthesizeCommand.add_argument('--minutes', type=float, default=10)
+	synthesizeCommand.add_argument('--seed', type=int, default=0)
+
+	replayCommand = commands.add_parser('replay', help='Send a capture to a running dashboard')
+	replayCommand.add_argument('path')
+	replayCommand.add_argument('--host', default='127.0.0.1')
+	replayCommand.add_argument('--port', type=int, default=defaultPort)
+	replayCommand.add_argument('--speed', type=float, default=1.0, help='Playback speed, 0 sends as fast as possible')
+
+	benchCommand = commands.add_parser('bench', help='Replay a capture into the socket protocol and report latency and drops')
+	benchCommand.add_argument('path')
+	benchCommand.add_argument('--speed', type=float, default=0.0, help='Playback speed, 0 sends as fast as possible')
+	benchCommand.add_argument('--window', type=float, default=0.25, help='Flush window in seconds, 0 publishes every packet')
+
+	args = parser.parse_args()
+	try:
+		match args.command:
+			case 'record':
+				print(f'Recorded {asyncio.run(record(args.path, args.port, args.duration))} packets')
+			case 'synthesize':
+				print(f'Wrote {synthesize(args.path, args.stations, args.minutes, args.seed)} packets to {args.path}')
+			case 'replay':
+				print(asyncio.run(replay(args.path, args.host, args.port, args.speed)))
+			case 'bench':
+				print(asyncio.run(bench(args.path, args.speed, args.window)))
+	except KeyboardInterrupt:
+		pass
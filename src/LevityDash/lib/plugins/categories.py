@@ -1,14 +1,20 @@
 import re
-from collections import ChainMap, Counter
+from collections import ChainMap, Counter, OrderedDict
 from datetime import datetime
 from functools import cached_property, lru_cache
-from typing import Any, Callable, ClassVar, Dict, Hashable, Iterable, Mapping, Optional, TypeVar, Union, Type
+from typing import Any, Callable, ClassVar, Dict, Generic, Hashable, Iterable, Iterator, Mapping, Optional, Set, Tuple, TypeVar, Union, Type
 
+from math import isclose
+from sys import getrefcount
+from threading import Lock
+
+import numpy as np
 from rich import repr
 from rich.text import Text
 from pytz import timezone
 
 from LevityDash.lib.plugins.utils import SchemaProperty, unitDict
+from LevityDash.lib.config import userConfig
 from LevityDash.lib.log import LevityPluginLog
 from LevityDash.lib.utils.shared import (clearCacheAttr, ColorStr, get, getOrSet, LOCAL_TIMEZONE, matchWildCard, operatorDict,
                                          removeSimilar, subsequenceCheck, Unset)
@@ -16,10 +22,11 @@ from WeatherUnits import Measurement
 
 log = LevityPluginLog.getChild('Categories')
 
-__all__ = ['UnitMetaData', 'CategoryWildcard', 'CategoryAtom', 'CategoryItem', 'CategoryDict', 'CategoryEndpointDict', 'ValueNotFound']
+__all__ = ['ArrayConverter', 'UnitMetaData', 'CategoryWildcard', 'CategoryAtom', 'CategoryItem', 'CategoryTrie', 'VersionedDict', 'CategoryDict', 'CategoryEndpointDict', 'ValueNotFound']
 
 RHS = TypeVar('RHS')
 LHS = TypeVar('LHS')
+T = TypeVar('T')
 
 
 class Requirement:
@@ -69,6 +76,59 @@ class Requirement:
 
 
 @repr.auto
+class ArrayConverter:
+	"""
+	Converts whole arrays of raw values with a single affine operation, `values * scale + offset`.
+	The coefficients are measured once by passing probe values through the WeatherUnits classes.
+	"""
+
+	__slots__ = ('scale', 'offset', 'unit')
+
+	scale: float
+	offset: float
+	unit: Optional[type]
+
+	probes: ClassVar[Tuple[float, ...]] = (0.0, 1.0, 37.0, 100.0)
+
+	def __init__(self, scale: float = 1.0, offset: float = 0.0, unit: type = None):
+		self.scale = scale
+		self.offset = offset
+		self.unit = unit
+
+	def __repr__(self):
+		return f'ArrayConverter(x * {self.scale:g} + {self.offset:g} -> {getattr(self.unit, "__name__", self.unit)})'
+
+	def __call__(self, values: np.ndarray) -> np.ndarray:
+		values = np.asarray(values, dtype=np.float64)
+		if self.isIdentity:
+			return values
+		return values * self.scale + self.offset
+
+	@property
+	def isIdentity(self) -> bool:
+		return self.scale == 1.0 and self.offset == 0.0
+
+	@classmethod
+	def derive(cls, construct: Callable[[float], Any], target: Callable[[Any], Any]) -> Optional['ArrayConverter']:
+		"""
+		Measures the conversion of `target(construct(value))`, returns None when the result is not
+		numeric or the conversion is not affine.
+		"""
+		try:
+			converted = [target(construct(probe)) for probe in cls.probes]
+			results = [float(value) for value in converted]
+		except Exception:
+			return None
+		if isinstance(converted[0], (bool, str)):
+			return None
+		offset = results[0]
+		scale = results[1] - offset
+		for probe, result in zip(cls.probes[2:], results[2:]):
+			if not isclose(result, probe * scale + offset, rel_tol=1e-9, abs_tol=1e-9):
+				return None
+		return cls(scale, offset, type(converted[1]))
+
+
 class UnitMetaData(dict):
 
 	def __init__(self, **kwargs):
@@ -196,6 +256,20 @@ class UnitMetaData(dict):
 
 		return lambda value: value
 
+	@lru_cache(maxsize=128)
+	def getArrayConverter(self, source: Hashable = None, unit: str = None) -> Optional[ArrayConverter]:
+		"""
+		Converter for arrays of raw values of this key into unit, a unit attribute such as 'f' or 'kmh',
+		or into the localized unit when unit is None.  None when the values must be converted one at a time.
+		"""
+		if self.hasAliases or self.get('type', None) in ('datetime', 'date', 'icon'):
+			return None
+		if unit is None:
+			target = lambda value: getattr(value, 'localize', value)
+		else:
+			target = lambda value: getattr(value, unit)
+		return ArrayConverter.derive(self.getConvertFunc(source), target)
+
 	@lru_cache(maxsize=64)
 	def mapAlias(self, value: Any) -> Any:
 		typeString = self.get('type', None)
@@ -418,18 +492,22 @@ class UnitMetaData(dict):
 		return 'alias' in self
 
 
+# Localized targets follow the configured units, so converters are derived again after the config is read
+userConfig.connectReload(UnitMetaData.getArrayConverter.cache_clear)
+
+
 class CategoryWildcard(str):
 	__knownWildcards: ClassVar[Dict[str, 'CategoryWildcard']] = dict()
 
 	def __new__(cls, value: str):
 		if len(value) > 1:
 			value = f'*{value.strip("*")}*'
-		if (value := cls.__knownWildcards.get(value, None)) is None:
-			value = cls.__knownWildcards[value] = super().__new__(cls, value)
-		return value
+		if (wildcard := cls.__knownWildcards.get(value, None)) is None:
+			wildcard = cls.__knownWildcards[value] = super().__new__(cls, value)
+		return wildcard
 
 	def __str__(self):
-		return f'{ColorStr.italic(self)}'
+		return str.__str__(self)
 
 	def __repr__(self):
 		return f'{self}'
@@ -450,6 +528,11 @@ class CategoryWildcard(str):
 	def regexMatchPattern(cls) -> str:
 		return rf'{"|".join(cls.__knownWildcards)}'
 
+	@classmethod
+	@lru_cache(maxsize=4)
+	def atomPattern(cls, wildcards: str = None) -> re.Pattern:
+		return re.compile(rf"[\w|{wildcards or cls.regexMatchPattern()}|\-]+")
+
 	@classmethod
 	def contains(cls, item: str) -> bool:
 		return item in cls.__knownWildcards or item in cls.__knownWildcards.items()
@@ -459,6 +542,12 @@ CategoryWildcard.addWildcard('*')
 CategoryWildcard.addWildcard('@')
 
 
+@lru_cache(maxsize=4096)
+def _splitKey(value: str, wildcards: str) -> Tuple[str, ...]:
+	"""Memoized string to atoms parsing for CategoryItem"""
+	return tuple(CategoryWildcard.atomPattern(wildcards).findall(value))
+
+
 class CategoryAtom(str):
 
 	def __new__(cls, value: str):
@@ -480,29 +569,82 @@ class CategoryItem(tuple):
 	root: ClassVar['CategoryItem']
 	__separator: str = '.'
 	__source: Optional[Hashable]
-	__existing__ = {}
+
+	# Interned instances, least recently used first.  Tuple subclasses can not be weakly referenced so
+	# the table is bounded instead, only items nothing else refers to are evicted so identity holds for
+	# every item still in use, and evicted items are simply rebuilt the next time they are needed.
+	__existing__: ClassVar[OrderedDict[int, 'CategoryItem']] = OrderedDict()
+	internLimit: ClassVar[int] = 8192
+	internScan: ClassVar[int] = 64
+	__internLock: ClassVar[Lock] = Lock()
+	__internStats: ClassVar[Dict[str, int]] = {'hits': 0, 'misses': 0, 'evictions': 0}
 
 	def __new__(cls, *values: Union[tuple, list, str], separator: Optional[str] = None, source: Any = None, **kwargs):
 		if separator is not None:
 			cls.__separator = separator
+		# Fast path for keys that are already anonymous CategoryItems
+		if source is None and len(values) == 1 and type(value := values[0]) is cls and value.__source is None:
+			with cls.__internLock:
+				cls.__internStats['hits'] += 1
+			return value
 		valueArray = []
+		wildcards = None
 		for value in values:
 			if value is None:
 				continue
 			elif isinstance(value, str):
-				valueArray.extend(re.findall(rf"[\w|{CategoryWildcard.regexMatchPattern()}|\-]+", value))
+				wildcards = wildcards or CategoryWildcard.regexMatchPattern()
+				valueArray.extend(_splitKey(value, wildcards))
 			else:
 				valueArray.extend(value)
 		source = tuple(source) if isinstance(source, list) else (source,)
 		id = hash((*tuple(valueArray), *source))
-		if id in cls.__existing__:
-			return cls.__existing__[id]
+		existing = cls.__existing__
+		with cls.__internLock:
+			if (value := existing.get(id, None)) is not None:
+				existing.move_to_end(id)
+				cls.__internStats['hits'] += 1
+				return value
 		kwargs['id'] = id
 		valueArray = tuple(CategoryAtom(value) for value in valueArray)
 		value = super(CategoryItem, cls).__new__(cls, valueArray, **kwargs)
-		cls.__existing__[id] = value
+		with cls.__internLock:
+			cls.__internStats['misses'] += 1
+			existing[id] = value
+			if len(existing) > cls.internLimit:
+				cls.__evict(existing)
 		return value
 
+	@classmethod
+	def __evict(cls, existing: OrderedDict[int, 'CategoryItem']):
+		"""
+		Evicts the least recently used items that only the table refers to.  Items still referenced are moved
+		to the end, at most internScan items are checked so a table of items in use is allowed to grow.
+		"""
+		for _ in range(cls.internScan):
+			if len(existing) <= cls.internLimit:
+				return
+			item = existing[id := next(iter(existing))]
+			# The table, item and getrefcount's argument, plus the cached anonymous of an anonymous item
+			if getrefcount(item) > 3 + (item.__dict__.get('anonymous', None) is item):
+				existing.move_to_end(id)
+				continue
+			del existing[id]
+			cls.__internStats['evictions'] += 1
+
+	@classmethod
+	def internStats(cls) -> Dict[str, int]:
+		parsing = _splitKey.cache_info()
+		with cls.__internLock:
+			stats = {**cls.__internStats, 'size': len(cls.__existing__)}
+		return {
+			**stats,
+			'limit':         cls.internLimit,
+			'parseHits':     parsing.hits,
+			'parseMisses':   parsing.misses,
+			'parseCacheSize': parsing.currsize,
+		}
+
 	def __init__(self, *values: Union[tuple, list, str], separator: Optional[str] = None, source: Any = None, **kwargs):
 		self.source = source
 		self.__id = kwargs.pop('id', None)
@@ -778,6 +920,205 @@ root = CategoryItem(':')
 CategoryItem.root = root
 
 
+# Section CategoryTrie
+def _isWildcard(atom: str) -> bool:
+	return atom == '*' or atom.startswith('@')
+
+
+class _TrieNode:
+	__slots__ = ('children', 'wildcards', 'key', 'values')
+
+	def __init__(self):
+		self.children: Dict[str, '_TrieNode'] = {}
+		self.wildcards: Dict[str, '_TrieNode'] = {}
+		self.key: Optional[CategoryItem] = None
+		self.values: Dict[Any, None] = {}
+
+	def __bool__(self):
+		return self.key is not None or bool(self.children)
+
+	def descendants(self) -> Iterator['_TrieNode']:
+		stack = [self]
+		while stack:
+			node = stack.pop()
+			if node.key is not None:
+				yield node
+			stack.extend(node.children.values())
+
+
+class CategoryTrie(Generic[T]):
+	"""
+	Prefix trie over CategoryItem atoms mapping exact and wildcard keys to the values subscribed to them.
+
+	Both stored keys and lookup patterns may contain wildcard atoms ('*' or '@name') which match any
+	single atom.  A lookup walks one node per atom, only branching through wildcards, instead of
+	comparing against every stored key.
+	"""
+
+	__slots__ = ('__root', '__size')
+
+	def __init__(self, keys: Iterable[CategoryItem] = None):
+		self.__root = _TrieNode()
+		self.__size = 0
+		for key in keys or ():
+			self.insert(key)
+
+	def __repr__(self):
+		return f'CategoryTrie(keys={self.__size})'
+
+	def __len__(self) -> int:
+		return self.__size
+
+	def __contains__(self, key) -> bool:
+		return (node := self.__find(key)) is not None and node.key is not None
+
+	def __iter__(self) -> Iterator[CategoryItem]:
+		return (node.key for node in self.__root.descendants())
+
+	@staticmethod
+	def __atoms(key) -> Tuple[str, ...]:
+		if not isinstance(key, CategoryItem):
+			key = CategoryItem(key)
+		return tuple(str.__str__(atom) for atom in key)
+
+	def __find(self, key) -> Optional[_TrieNode]:
+		node = self.__root
+		for atom in self.__atoms(key):
+			if (node := node.children.get(atom, None)) is None:
+				return None
+		return node
+
+	def insert(self, key: CategoryItem, value: T = Unset):
+		if not isinstance(key, CategoryItem):
+			key = CategoryItem(key)
+		node = self.__root
+		for atom in self.__atoms(key):
+			if (child := node.children.get(atom, None)) is None:
+				child = node.children[atom] = _TrieNode()
+				if _isWildcard(atom):
+					node.wildcards[atom] = child
+			node = child
+		if node.key is None:
+			self.__size += 1
+		node.key = key
+		if value is not Unset:
+			node.values[value] = None
+
+	def remove(self, key: CategoryItem, value: T = Unset) -> bool:
+		"""Removes value from key, or the key and all of its values when no value is given.  A key is dropped with its last value"""
+		path = [self.__root]
+		atoms = self.__atoms(key)
+		for atom in atoms:
+			if (node := path[-1].children.get(atom, None)) is None:
+				return False
+			path.append(node)
+		node = path[-1]
+		if node.key is None:
+			return False
+		if value is not Unset:
+			if node.values.pop(value, Unset) is Unset:
+				return False
+			if node.values:
+				return True
+		node.key = None
+		node.values.clear()
+		self.__size -= 1
+		for atom, parent, child in zip(reversed(atoms), reversed(path[:-1]), reversed(path[1:])):
+			if child:
+				break
+			del parent.children[atom]
+			parent.wildcards.pop(atom, None)
+		return True
+
+	def get(self, key: CategoryItem, default: Any = None) -> Set[T] | Any:
+		"""Values stored under exactly key"""
+		if (node := self.__find(key)) is None or node.key is None:
+			return default
+		return set(node.values)
+
+	def clear(self):
+		self.__root = _TrieNode()
+		self.__size = 0
+
+	def __match(self, pattern, prefix: bool) -> Iterator[_TrieNode]:
+		atoms = self.__atoms(pattern)
+		depth = len(atoms)
+		stack = [(self.__root, 0)]
+		while stack:
+			node, i = stack.pop()
+			if i == depth:
+				if prefix:
+					yield from node.descendants()
+				elif node.key is not None:
+					yield node
+				continue
+			if prefix and node.key is not None:
+				yield node
+			atom = atoms[i]
+			if _isWildcard(atom):
+				stack.extend((child, i + 1) for child in node.children.values())
+			else:
+				if (child := node.children.get(atom, None)) is not None:
+					stack.append((child, i + 1))
+				stack.extend((child, i + 1) for child in node.wildcards.values())
+
+	def match(self, pattern: CategoryItem, prefix: bool = False) -> Iterator[CategoryItem]:
+		"""
+		Stored keys that match pattern atom for atom.  With prefix, keys that start with the pattern or
+		that the pattern starts with also match, the same as CategoryItem.__lt__.
+		"""
+		return (node.key for node in self.__match(pattern, prefix))
+
+	def subscriptions(self, key: CategoryItem) -> Iterator[Tuple[CategoryItem, Set[T]]]:
+		"""Stored keys or wildcard patterns that match key with their values"""
+		return ((node.key, set(node.values)) for node in self.__match(key, False))
+
+	def subscribers(self, key: CategoryItem) -> Set[T]:
+		"""Values of every stored key or wildcard pattern that matches key"""
+		return {value for node in self.__match(key, False) for value in node.values}
+
+
+class VersionedDict(dict):
+	"""Dict that counts its mutations so indexes built from its keys notice any change, not only a change in size"""
+
+	__slots__ = ('version',)
+
+	def __init__(self, *args, **kwargs):
+		super(VersionedDict, self).__init__(*args, **kwargs)
+		self.version = 0
+
+	def __setitem__(self, key, value):
+		super(VersionedDict, self).__setitem__(key, value)
+		self.version += 1
+
+	def __delitem__(self, key):
+		super(VersionedDict, self).__delitem__(key)
+		self.version += 1
+
+	def pop(self, *args):
+		value = super(VersionedDict, self).pop(*args)
+		self.version += 1
+		return value
+
+	def popitem(self):
+		item = super(VersionedDict, self).popitem()
+		self.version += 1
+		return item
+
+	def setdefault(self, key, default=None):
+		if key not in self:
+			self.version += 1
+		return super(VersionedDict, self).setdefault(key, default)
+
+	def update(self, *args, **kwargs):
+		super(VersionedDict, self).update(*args, **kwargs)
+		self.version += 1
+
+	def clear(self):
+		super(VersionedDict, self).clear()
+		self.version += 1
+
+
 class CategoryDict(dict):
 	_cache: dict
 
@@ -956,7 +1297,7 @@ class CategoryDict(dict):
 			# if there is a wildcard in the key
 			if item.hasWildcard:
 				# Check if the item matches any of the immediate subcategories
-				items = {key: value for key, value in self._source.items() if key < item}
+				items = self._matching(item)
 				if len(items) == 1:
 					# if there is only one item in items return it
 					return items.popitem()[1]
@@ -996,7 +1337,11 @@ class CategoryDict(dict):
 	def __setitem__(self, key, value):
 		if not isinstance(key, CategoryItem):
 			key = CategoryItem(key)
+		current = '_trie' in self.__dict__ and self.__trieVersion == self._sourceVersion
 		self._source.__setitem__(key, value)
+		if current:
+			self._trie.insert(key)
+			self.__trieVersion = self._sourceVersion
 		self.refresh()
 
 	def __contains__(self, item):
@@ -1014,20 +1359,19 @@ class CategoryDict(dict):
 	def _dict(self):
 		if self.category.hasWildcard:
 			cats2 = {}
-			for key, value in self._source.items():
-				if key < self.category:
-					k = CategoryItem(removeSimilar(key, self.category))
-					if k not in cats2:
-						cats2[k] = [value]
-					else:
-						cats2[k].append(value)
+			for key, value in self._matching(self.category).items():
+				k = CategoryItem(removeSimilar(key, self.category))
+				if k not in cats2:
+					cats2[k] = [value]
+				else:
+					cats2[k].append(value)
 			for key, value in cats2.items():
 				if len(value) == 1:
 					cats2[key] = value[0]
 				else:
 					cats2[key] = CategoryDict(self, self._source, key)
 			return cats2
-		keys = {key for key in self._source.keys() if self.category < key}
+		keys = set(self.keyIndex.match(self.category, prefix=True))
 		cats = {k[self.level]: [] for k in keys if len(k) >= self.level + 1 or self.category.hasWildcard}
 		for key in keys:
 			if len(key) >= self.level + 1 or self.category.hasWildcard:
@@ -1057,6 +1401,30 @@ class CategoryDict(dict):
 	def wildcardKeys(self):
 		return tuple({key for key in self._source.keys() if key.hasWildcard})
 
+	@property
+	def _sourceVersion(self) -> int:
+		"""Mutation count of a VersionedDict source, other sources only report a change in size"""
+		source = self._source
+		return source.version if isinstance(source, VersionedDict) else len(source)
+
+	@cached_property
+	def _trie(self) -> CategoryTrie:
+		self.__trieVersion = self._sourceVersion
+		return CategoryTrie(self._source.keys())
+
+	@property
+	def keyIndex(self) -> CategoryTrie:
+		"""Trie of the source keys, rebuilt if the source was changed without going through the CategoryDict"""
+		trie = self._trie
+		if self.__trieVersion != self._sourceVersion:
+			clearCacheAttr(self, '_trie')
+			trie = self._trie
+		return trie
+
+	def _matching(self, pattern: CategoryItem) -> Dict[CategoryItem, Any]:
+		source = self._source
+		return {key: dict.__getitem__(source, key) for key in self.keyIndex.match(pattern, prefix=True)}
+
 	@property
 	def parent(self):
 		return self._parent
@@ -1074,9 +1442,8 @@ class CategoryDict(dict):
 	def flatDict(self):
 		if self.category is not None:
 			if hasattr(self, '_source'):
-				items = dict.items(self._source)
-			else:
-				items = dict.items(self.parent.flatDict)
+				return self._matching(self.category)
+			items = dict.items(self.parent.flatDict)
 			return {k: v for k, v in items if self.category < k}
 		else:
 			return dict(self)
@@ -1206,4 +1573,4 @@ class ValueNotFound(Exception):
 	pass
 
 
-__all__ = ['CategoryDict', 'CategoryEndpointDict', 'SubCategory', 'ValueNotFound', 'UnitMetaData']
+__all__ = ['CategoryDict', 'CategoryEndpointDict', 'SubCategory', 'ValueNotFound', 'UnitMetaData', 'VersionedDict']
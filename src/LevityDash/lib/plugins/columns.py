@@ -0,0 +1,308 @@
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+__all__ = ['TimeSeriesColumns']
+
+ItemFactory = Callable[[int, Any], Any]
+
+_REDUCERS = ('mean', 'min', 'max', 'sum', 'first', 'last', 'count')
+
+
+def _toEpoch(value: datetime | int | float | None) -> Optional[int]:
+	match value:
+		case None:
+			return None
+		case datetime():
+			return round(value.timestamp())
+		case timedelta():
+			return round(datetime.now().timestamp() + value.total_seconds())
+		case _:
+			return round(value)
+
+
+class TimeSeriesColumns:
+	"""
+	Sorted, parallel columns of a timeseries.
+
+	Timestamps are stored as int64 epoch seconds and numeric values as float64 (NaN when the value
+	is not numeric).  String values are dictionary encoded into `labels` which index into `vocabulary`
+	with -1 marking a row without a string value.  Items are only materialized when they are accessed
+	individually and slicing returns views that share memory with the parent columns.
+	"""
+
+	__slots__ = ('timestamps', 'values', 'labels', 'vocabulary', '__items', '__factory')
+
+	timestamps: np.ndarray
+	values: np.ndarray
+	labels: np.ndarray
+	vocabulary: List[str]
+
+	def __init__(
+		self,
+		timestamps: np.ndarray,
+		values: np.ndarray,
+		labels: np.ndarray = None,
+		vocabulary: List[str] = None,
+		items: Sequence[Any] | np.ndarray = None,
+		factory: ItemFactory = None,
+	):
+		self.timestamps = timestamps
+		self.values = values
+		self.labels = np.full(len(timestamps), -1, dtype=np.int32) if labels is None else labels
+		self.vocabulary = vocabulary if vocabulary is not None else []
+		if items is None:
+			items = np.full(len(timestamps), None, dtype=object)
+		elif not isinstance(items, np.ndarray):
+			array = np.empty(len(items), dtype=object)
+			array[:] = items
+			items = array
+		self.__items = items
+		self.__factory = factory
+
+	@classmethod
+	def empty(cls, factory: ItemFactory = None) -> 'TimeSeriesColumns':
+		return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), factory=factory)
+
+	@classmethod
+	def fromItems(
+		cls,
+		items: Iterable[Any],
+		factory: ItemFactory = None,
+		attribute: str = 'value',
+		convert: Callable[[np.ndarray], np.ndarray] = None,
+	) -> 'TimeSeriesColumns':
+		"""
+		Builds the columns in a single pass over items with `timestamp` and `value` attributes.
+		Values can be read from another attribute, such as the unconverted `rawValue`, and the
+		numeric column converted as a whole afterwards with convert.
+		"""
+		items = items if isinstance(items, Sequence) else list(items)
+		length = len(items)
+		timestamps = np.empty(length, dtype=np.int64)
+		values = np.full(length, np.nan, dtype=np.float64)
+		labels = np.full(length, -1, dtype=np.int32)
+		vocabulary = {}
+
+		for i, item in enumerate(items):
+			timestamps[i] = round(item.timestamp.timestamp())
+			value = getattr(item, attribute)
+			if isinstance(value, str):
+				labels[i] = vocabulary.setdefault(value, len(vocabulary))
+			elif value is not None:
+				try:
+					values[i] = value
+				except (TypeError, ValueError):
+					pass
+
+		if convert is not None:
+			values = convert(values)
+		columns = cls(timestamps, values, labels, list(vocabulary), items, factory)
+		if length > 1 and (np.diff(timestamps) < 0).any():
+			return columns.take(np.argsort(timestamps, kind='stable'))
+		return columns
+
+	@classmethod
+	def fromColumn(cls, timestamps: np.ndarray, values: np.ndarray, factory: ItemFactory = None) -> 'TimeSeriesColumns':
+		"""Builds the columns from an already aligned value column, object columns are dictionary encoded"""
+		if values.dtype != object:
+			return cls(timestamps, values.astype(np.float64, copy=False), factory=factory)
+		present = values != None  # noqa: E711, elementwise for object arrays
+		vocabulary, inverse = np.unique(values[present].astype(str), return_inverse=True)
+		labels = np.full(len(values), -1, dtype=np.int32)
+		labels[present] = inverse
+		return cls(timestamps, np.full(len(values), np.nan, dtype=np.float64), labels, vocabulary.tolist(), factory=factory)
+
+	@classmethod
+	def concat(cls, *columns: 'TimeSeriesColumns') -> 'TimeSeriesColumns':
+		"""Joins columns into one sorted by timestamp, vocabularies are merged and materialized items are kept"""
+		columns = [c for c in columns if len(c)]
+		if not columns:
+			return cls.empty()
+		if len(columns) == 1:
+			return columns[0]
+		index = {}
+		labels = []
+		for c in columns:
+			remap = np.array([index.setdefault(word, len(index)) for word in c.vocabulary] + [-1], dtype=np.int32)
+			labels.append(remap[c.labels])
+		joined = cls(
+			np.concatenate([c.timestamps for c in columns]),
+			np.concatenate([c.values for c in columns]),
+			np.concatenate(labels),
+			list(index),
+			np.concatenate([c.__items for c in columns]),
+			columns[-1].__factory
+		)
+		if (np.diff(joined.timestamps) < 0).any():
+			return joined.take(np.argsort(joined.timestamps, kind='stable'))
+		return joined
+
+	def __len__(self) -> int:
+		return len(self.timestamps)
+
+	def __repr__(self):
+		if len(self):
+			return f'TimeSeriesColumns(length={len(self)}, start={self.timestamps[0]}, stop={self.timestamps[-1]})'
+		return 'TimeSeriesColumns(length=0)'
+
+	def __getitem__(self, key: int | slice) -> Any:
+		if isinstance(key, slice):
+			return TimeSeriesColumns(
+				self.timestamps[key],
+				self.values[key],
+				self.labels[key],
+				self.vocabulary,
+				self.__items[key],
+				self.__factory
+			)
+		return self.item(key)
+
+	def __iter__(self):
+		return (self.item(i) for i in range(len(self)))
+
+	def item(self, index: int) -> Any:
+		items = self.__items
+		item = items[index]
+		if item is None:
+			if self.__factory is None:
+				raise ValueError('Unable to materialize item without an item factory')
+			items[index] = item = self.__factory(int(self.timestamps[index]), self.valueAt(index))
+		return item
+
+	def valueAt(self, index: int) -> Any:
+		label = self.labels[index]
+		if label >= 0:
+			return self.vocabulary[label]
+		return float(self.values[index])
+
+	def take(self, indices: np.ndarray) -> 'TimeSeriesColumns':
+		return TimeSeriesColumns(
+			self.timestamps[indices],
+			self.values[indices],
+			self.labels[indices],
+			self.vocabulary,
+			self.__items[indices],
+			self.__factory
+		)
+
+	def floor(self, timestamp: datetime | int) -> int:
+		"""Index of the last row at or before timestamp, -1 if there is none"""
+		return int(np.searchsorted(self.timestamps, _toEpoch(timestamp), side='right')) - 1
+
+	def ceil(self, timestamp: datetime | int) -> int:
+		"""Index of the first row at or after timestamp, len(self) if there is none"""
+		return int(np.searchsorted(self.timestamps, _toEpoch(timestamp), side='left'))
+
+	def nearest(self, timestamp: datetime | int) -> int:
+		"""Index of the row closest to timestamp, ties resolve to the earlier row"""
+		length = len(self)
+		if not length:
+			raise IndexError('nearest lookup on empty columns')
+		timestamp = _toEpoch(timestamp)
+		i = self.ceil(timestamp)
+		if i == 0:
+			return 0
+		if i == length:
+			return length - 1
+		timestamps = self.timestamps
+		return i - 1 if timestamp - timestamps[i - 1] <= timestamps[i] - timestamp else i
+
+	def range(self, start: datetime | int | None = None, stop: datetime | int | None = None) -> slice:
+		"""Slice of the rows with start <= timestamp <= stop"""
+		start, stop = _toEpoch(start), _toEpoch(stop)
+		i = 0 if start is None else self.ceil(start)
+		j = len(self) if stop is None else self.floor(stop) + 1
+		return slice(i, max(i, j))
+
+	def span(self, start: datetime | int | None = None, stop: datetime | int | None = None) -> 'TimeSeriesColumns':
+		"""Returns a view of the rows with start <= timestamp <= stop"""
+		return self[self.range(start, stop)]
+
+	def resample(self, step: timedelta | int, how: str = 'mean') -> 'TimeSeriesColumns':
+		"""
+		Reduces the rows into buckets of `step` seconds centered on multiples of step.
+		`how` is one of mean, min, max, sum, first, last or count.
+		"""
+		if isinstance(step, timedelta):
+			step = step.total_seconds()
+		step = max(int(step), 1)
+		if not len(self):
+			return TimeSeriesColumns.empty(self.__factory)
+		buckets = np.floor_divide(self.timestamps + step // 2, step)
+		starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+		return self.__reduce(starts, how)
+
+	def aggregate(self, how: str = 'mean') -> Any:
+		"""Reduces all rows into a single item"""
+		if not len(self):
+			return None
+		return self.__reduce(np.zeros(1, dtype=np.intp), how).item(0)
+
+	def __reduce(self, starts: np.ndarray, how: str) -> 'TimeSeriesColumns':
+		if how not in _REDUCERS:
+			raise ValueError(f'Unknown resample method {how!r}, expected one of {", ".join(_REDUCERS)}')
+		values = self.values
+		counts = np.diff(np.r_[starts, len(values)])
+		ends = starts + counts - 1
+		valid = ~np.isnan(values)
+		validCounts = np.add.reduceat(valid.astype(np.int64), starts)
+		labels = np.full(len(starts), -1, dtype=np.int32)
+
+		match how:
+			case 'first':
+				timestamps, result, labels = self.timestamps[starts], values[starts], self.labels[starts]
+			case 'last':
+				timestamps, result, labels = self.timestamps[ends], values[ends], self.labels[ends]
+			case _:
+				timestamps = np.add.reduceat(self.timestamps, starts) // counts
+				with np.errstate(invalid='ignore', divide='ignore'):
+					match how:
+						case 'mean':
+							result = np.add.reduceat(np.where(valid, values, 0), starts) / validCounts
+						case 'sum':
+							result = np.add.reduceat(np.where(valid, values, 0), starts).astype(np.float64)
+						case 'min':
+							result = np.fmin.reduceat(values, starts)
+						case 'max':
+							result = np.fmax.reduceat(values, starts)
+						case 'count':
+							result = validCounts.astype(np.float64)
+				if how != 'count' and not self.isNumeric:
+					labels = np.where(validCounts > 0, -1, self.__modeLabels(starts, ends)).astype(np.int32)
+				result = np.where(validCounts > 0, result, np.nan) if how != 'count' else result
+
+		return TimeSeriesColumns(timestamps, result, labels, self.vocabulary, factory=self.__factory)
+
+	def __modeLabels(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+		labels = self.labels
+		result = np.full(len(starts), -1, dtype=np.int32)
+		for i, (start, end) in enumerate(zip(starts, ends)):
+			bucket = labels[start:end + 1]
+			bucket = bucket[bucket >= 0]
+			if len(bucket):
+				result[i] = np.bincount(bucket).argmax()
+		return result
+
+	@property
+	def items(self) -> List[Any]:
+		return [self.item(i) for i in range(len(self))]
+
+	@property
+	def text(self) -> np.ndarray:
+		"""Decoded string column, None where the row has no string value"""
+		lookup = np.array([*self.vocabulary, None], dtype=object)
+		return lookup[self.labels]
+
+	@property
+	def nbytes(self) -> int:
+		return self.timestamps.nbytes + self.values.nbytes + self.labels.nbytes + self.__items.nbytes
+
+	@property
+	def bytesPerRow(self) -> float:
+		return self.nbytes / len(self) if len(self) else 0.0
+
+	@property
+	def isNumeric(self) -> bool:
+		return not (self.labels >= 0).any()
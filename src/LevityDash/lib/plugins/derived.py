@@ -0,0 +1,381 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+import WeatherUnits as wu
+from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.categories import ArrayConverter, CategoryItem, UnitMetaData
+
+if TYPE_CHECKING:
+	from LevityDash.lib.plugins.observation import Observation, ObservationTimeSeries
+
+log = LevityPluginLog.getChild('Derived')
+
+__all__ = ['DerivedInput', 'DerivedMetric', 'DerivedMetrics', 'DerivedMetricEngine', 'derivedMetrics']
+
+
+@dataclass(frozen=True)
+class DerivedInput:
+	"""An input column of a derived metric, `unit` is the attribute used to convert the value before it is passed to the kernel"""
+	key: CategoryItem
+	unit: Optional[str] = None
+
+	def extract(self, value: Any) -> float:
+		if self.unit is None:
+			# Without a unit the value is passed in its source unit, like a column of the source
+			value = getattr(value, 'rawValue', value)
+		else:
+			value = getattr(getattr(value, 'sourceUnitValue', value), self.unit)
+		try:
+			return float(value)
+		except (TypeError, ValueError):
+			return np.nan
+
+
+@dataclass(frozen=True)
+class DerivedMetric:
+	"""
+	A value that is calculated from other columns of a timeseries.
+
+	The kernel receives the timestamps followed by one float64 array per input and returns an
+	array of the same length.  Cumulative metrics depend on every row before them and are offset by
+	the value of the row before the first changed row, windowed metrics depend on the rows within
+	`window` before them.  Both are recomputed from the first changed row.
+	"""
+	key: CategoryItem
+	inputs: Tuple[DerivedInput, ...]
+	kernel: Callable[..., np.ndarray]
+	output: Optional[Callable[[float], Any]] = None
+	cumulative: bool = False
+	window: Optional[timedelta] = None
+
+	@property
+	def dependsOnHistory(self) -> bool:
+		return self.cumulative or self.window is not None
+
+	def wrap(self, value: float, reference: Any) -> Any:
+		if self.output is not None:
+			return self.output(value)
+		reference = getattr(reference, 'sourceUnitValue', reference)
+		try:
+			return type(reference)(value)
+		except Exception:
+			return value
+
+
+class DerivedMetrics:
+	"""Ordered registry of derived metrics, a metric may use any metric registered before it as an input"""
+
+	def __init__(self):
+		self.__metrics: Dict[CategoryItem, DerivedMetric] = {}
+
+	def __iter__(self):
+		return iter(self.__metrics.values())
+
+	def __len__(self):
+		return len(self.__metrics)
+
+	def __contains__(self, key) -> bool:
+		return CategoryItem(key) in self.__metrics
+
+	def register(
+		self,
+		key: str,
+		inputs: Iterable[Tuple[str, Optional[str]] | str],
+		output: Callable[[float], Any] = None,
+		cumulative: bool = False,
+		window: timedelta = None,
+	):
+		"""Decorator registering a kernel as the derivation of key"""
+		inputs = tuple(
+			DerivedInput(CategoryItem(i), None) if isinstance(i, str) else DerivedInput(CategoryItem(i[0]), i[1])
+			for i in inputs
+		)
+
+		def decorator(kernel: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+			metric = DerivedMetric(CategoryItem(key), inputs, kernel, output, cumulative, window)
+			self.__metrics[metric.key] = metric
+			return kernel
+
+		return decorator
+
+
+derivedMetrics = DerivedMetrics()
+
+
+def _celsius(value: float):
+	return wu.Temperature.Celsius(value)
+
+
+@lru_cache(maxsize=64)
+def _outputConverter(output: Callable[[float], Any], sourceUnit: str) -> Optional[ArrayConverter]:
+	"""Converter from the unit a metric's output wraps its values in to the unit the schema stores them in"""
+	return ArrayConverter.derive(output, lambda value: value[sourceUnit])
+
+
+def _rawFloat(value: Any) -> float:
+	try:
+		return float(getattr(value, 'rawValue', value))
+	except (TypeError, ValueError):
+		return np.nan
+
+
+# Section Kernels
+
+for _prefix in ('environment', 'indoor'):
+	_temperature = (f'{_prefix}.temperature.temperature', 'c')
+	_humidity = f'{_prefix}.humidity.humidity'
+
+	@derivedMetrics.register(f'{_prefix}.temperature.dewpoint', (_temperature, _humidity), output=_celsius)
+	def dewpoint(timestamps: np.ndarray, temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+		A, B = 243.04, 17.625
+		logRH = np.log(np.clip(humidity, 1, 100) / 100)
+		gamma = logRH + (B * temperature) / (A + temperature)
+		return np.minimum(A * gamma / (B - gamma), temperature)
+
+	@derivedMetrics.register(f'{_prefix}.temperature.heatIndex', (_temperature, _humidity), output=_celsius)
+	def heatIndex(timestamps: np.ndarray, temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+		c = (-8.78469475556, 1.61139411, 2.33854883889, -0.14611605, -0.012308094, -0.0164248277778, 0.002211732, 0.00072546, -0.000003582)
+		T, R = temperature, np.clip(humidity, 0, 100)
+		T2, R2 = T * T, R * R
+		index = c[0] + c[1] * T + c[2] * R + c[3] * T * R + c[4] * T2 + c[5] * R2 + c[6] * T2 * R + c[7] * T * R2 + c[8] * T2 * R2
+		return np.where((T < 26.85) | (R < 13), T, index)
+
+
+@derivedMetrics.register(
+	'environment.temperature.windChill',
+	(('environment.temperature.temperature', 'c'), ('environment.wind.speed.speed', 'kmh')),
+	output=_celsius
+)
+def windChill(timestamps: np.ndarray, temperature: np.ndarray, wind: np.ndarray) -> np.ndarray:
+	w = np.power(np.maximum(wind, 0), 0.16)
+	chill = 13.12 + 0.6215 * temperature - 11.37 * w + 0.3965 * temperature * w
+	# Wind chill is undefined below 3 mph
+	return np.where(wind < 4.828, temperature, np.round(chill, 1))
+
+
+@derivedMetrics.register(
+	'environment.temperature.feelsLike',
+	(
+		('environment.temperature.temperature', 'c'),
+		'environment.humidity.humidity',
+		('environment.temperature.heatIndex', 'c'),
+		('environment.temperature.windChill', 'c'),
+	),
+	output=_celsius
+)
+def feelsLike(timestamps: np.ndarray, temperature: np.ndarray, humidity: np.ndarray, heatIndex: np.ndarray, windChill: np.ndarray) -> np.ndarray:
+	# 80°F and 50°F
+	return np.where((temperature > 26.667) & (humidity > 40), heatIndex, np.where(temperature < 10, windChill, temperature))
+
+
+@derivedMetrics.register('environment.precipitation.accumulation', ('environment.precipitation.precipitation',), cumulative=True)
+def precipitationAccumulation(timestamps: np.ndarray, precipitation: np.ndarray) -> np.ndarray:
+	return np.cumsum(np.nan_to_num(precipitation))
+
+
+@derivedMetrics.register('environment.precipitation.rolling24h', ('environment.precipitation.precipitation',), window=timedelta(hours=24))
+def precipitationRolling(timestamps: np.ndarray, precipitation: np.ndarray) -> np.ndarray:
+	return rollingSum(timestamps, precipitation, timedelta(hours=24))
+
+
+def rollingSum(timestamps: np.ndarray, values: np.ndarray, window: timedelta) -> np.ndarray:
+	"""Sum of the values within window before and including each row"""
+	totals = np.r_[0.0, np.cumsum(np.nan_to_num(values))]
+	starts = np.searchsorted(timestamps, timestamps - int(window.total_seconds()), side='right')
+	return totals[1:] - totals[starts]
+
+
+# Section Engine
+
+class DerivedMetricEngine:
+	"""
+	Computes the registered derived metrics of an ObservationTimeSeries as columns.
+
+	Input columns are cached between updates, only rows of changed observations are re-read and
+	only rows whose inputs changed, or that depend on a changed row, are written back.
+	"""
+
+	def __init__(self, timeseries: 'ObservationTimeSeries', metrics: DerivedMetrics = None):
+		self.timeseries = timeseries
+		self.metrics = metrics or derivedMetrics
+		self.__timestamps = np.empty(0, dtype=np.int64)
+		self.__columns: Dict[Tuple[CategoryItem, Optional[str]], np.ndarray] = {}
+		self.__derived: Set[CategoryItem] = set()
+		self.__results: Dict[CategoryItem, np.ndarray] = {}
+
+	@property
+	def derivedKeys(self) -> Set[CategoryItem]:
+		return set(self.__derived)
+
+	def __available(self, knownKeys: Set[CategoryItem]) -> List[DerivedMetric]:
+		schema = self.timeseries.schema
+		available = set(knownKeys)
+		metrics = []
+		for metric in self.metrics:
+			# Values provided by the source are never replaced
+			if metric.key in knownKeys and metric.key not in self.__derived:
+				continue
+			if not schema.get(metric.key, None):
+				continue
+			if all(i.key in available for i in metric.inputs):
+				metrics.append(metric)
+				available.add(metric.key)
+		return metrics
+
+	def compute(
+		self,
+		rows: Dict[Any, 'Observation'],
+		changed: Iterable['Observation'] = None,
+		write: Callable[['Observation', CategoryItem, Any], None] = None,
+	) -> Set[CategoryItem]:
+		"""
+		Writes the derived values into rows and returns the keys that were written.
+		When changed is None every row is recomputed.  Values are assigned with write when given.
+		"""
+		order = sorted(rows)
+		if not order:
+			return set()
+		observations = [rows[key] for key in order]
+		timestamps = np.fromiter((round(getattr(key, 'value', key).timestamp()) for key in order), dtype=np.int64, count=len(order))
+		changed = list(changed) if changed is not None else None
+		knownKeys = set(self.timeseries.knownKeys) | self.__derived
+		knownKeys.update(key for obs in (changed or observations) for key in obs.keys())
+		if not (metrics := self.__available(knownKeys)):
+			return set()
+
+		previous = self.__timestamps
+		if changed is not None and len(previous) and len(previous) <= len(timestamps) and np.array_equal(previous, timestamps[:len(previous)]):
+			changedIds = {id(obs) for obs in changed}
+			dirty = np.fromiter((id(obs) in changedIds for obs in observations), dtype=bool, count=len(observations))
+			dirty[len(previous):] = True
+		else:
+			dirty = np.ones(len(observations), dtype=bool)
+			self.__columns.clear()
+			self.__results.clear()
+		self.__timestamps = timestamps
+
+		if not dirty.any():
+			return set()
+
+		written = set()
+		for metric in metrics:
+			columns = [self.__column(i, observations, dirty) for i in metric.inputs]
+			if metric.dependsOnHistory:
+				first = int(np.argmax(dirty))
+				if metric.window is not None:
+					first = int(np.searchsorted(timestamps, timestamps[first] - int(metric.window.total_seconds()), side='left'))
+				span = slice(first, len(observations))
+				result = metric.kernel(timestamps[span], *(c[span] for c in columns))
+				if metric.cumulative and first and (previous := self.__results.get(metric.key)) is not None and not np.isnan(previous[first - 1]):
+					result = result + previous[first - 1]
+				rows_ = np.arange(first, len(observations))
+				if metric.window is not None:
+					# rows before the first dirty row only provided history for the window
+					keep = rows_ >= int(np.argmax(dirty))
+					rows_, result = rows_[keep], result[keep]
+			else:
+				rows_ = np.flatnonzero(dirty)
+				result = metric.kernel(timestamps[rows_], *(c[rows_] for c in columns))
+
+			results = self.__resize(self.__results.get(metric.key), len(observations))
+			results[rows_] = result
+			self.__results[metric.key] = results
+			reference = next((obs.get(metric.inputs[0].key, None) for obs in observations if obs.get(metric.inputs[0].key, None) is not None), None)
+			for row, value in zip(rows_, result):
+				if np.isnan(value):
+					continue
+				value = metric.wrap(float(value), reference)
+				if write is None:
+					observations[row][metric.key] = value
+				else:
+					write(observations[row], metric.key, value)
+			self.__derived.add(metric.key)
+			written.add(metric.key)
+			if metric.dependsOnHistory:
+				dirty = dirty.copy()
+				dirty[rows_] = True
+
+		log.verbose(f'{self.timeseries.__class__.__name__} derived {len(written)} metrics for {int(dirty.sum())} rows', verbosity=4)
+		return written
+
+	def computeColumns(self, timestamps: np.ndarray, columns: Dict[CategoryItem, np.ndarray]) -> Dict[CategoryItem, np.ndarray]:
+		"""
+		Derives the metrics of a columnar update, every column shares timestamps and each metric is
+		computed over the whole update with a single kernel call.  Returns the derived columns.
+		"""
+		knownKeys = set(self.timeseries.knownKeys) | set(columns) | self.__derived
+		results: Dict[CategoryItem, np.ndarray] = {}
+		for metric in self.__available(knownKeys):
+			inputs = [self.__columnInput(i, results.get(i.key, columns.get(i.key, None))) for i in metric.inputs]
+			if any(i is None for i in inputs):
+				continue
+			if (result := self.__columnOutput(metric, np.asarray(metric.kernel(timestamps, *inputs), dtype=np.float64))) is None:
+				continue
+			results[metric.key] = result
+			self.__derived.add(metric.key)
+		if results:
+			log.verbose(f'{self.timeseries.__class__.__name__} derived {len(results)} metric columns for {len(timestamps)} rows', verbosity=4)
+		return results
+
+	def __columnInput(self, input_: DerivedInput, column: Optional[np.ndarray]) -> Optional[np.ndarray]:
+		if column is None or column.dtype != np.float64:
+			return None
+		if input_.unit is None:
+			return column
+		if (converter := self.__converter(input_.key, input_.unit)) is None:
+			return None
+		return converter(column)
+
+	def __columnOutput(self, metric: DerivedMetric, column: np.ndarray) -> Optional[np.ndarray]:
+		"""Converts a kernel result into the source unit of the metric so it is stored like a provided column"""
+		if metric.output is None:
+			return column
+		if (metadata := self.__metadata(metric.key)) is None or not isinstance(sourceUnit := metadata.get('sourceUnit', None), str):
+			return None
+		if (converter := _outputConverter(metric.output, sourceUnit)) is None:
+			return None
+		return converter(column)
+
+	def __metadata(self, key: CategoryItem) -> Optional[UnitMetaData]:
+		schema = self.timeseries.schema
+		if key not in schema:
+			return None
+		metadata = schema.getUnitMetaData(key, self.timeseries)
+		return metadata if isinstance(metadata, UnitMetaData) else None
+
+	def __converter(self, key: CategoryItem, unit: Optional[str]) -> Optional[ArrayConverter]:
+		if unit is None or (metadata := self.__metadata(key)) is None:
+			return None
+		return metadata.getArrayConverter(self.timeseries, unit)
+
+	@staticmethod
+	def __resize(column: Optional[np.ndarray], length: int) -> np.ndarray:
+		resized = np.full(length, np.nan, dtype=np.float64)
+		if column is not None:
+			resized[:min(len(column), length)] = column[:length]
+		return resized
+
+	def __column(self, input_: DerivedInput, observations: List['Observation'], dirty: np.ndarray) -> np.ndarray:
+		column = self.__columns.get((input_.key, input_.unit))
+		if column is None or len(column) != len(observations):
+			column = self.__resize(column, len(observations))
+			missing = np.isnan(column) | dirty
+		else:
+			missing = dirty
+		rows = np.flatnonzero(missing)
+		# Raw values are gathered first and converted together when the conversion is affine
+		if (converter := self.__converter(input_.key, input_.unit)) is not None:
+			for row in rows:
+				value = observations[row].get(input_.key, None)
+				column[row] = np.nan if value is None else _rawFloat(value)
+			column[rows] = converter(column[rows])
+		else:
+			for row in rows:
+				value = observations[row].get(input_.key, None)
+				column[row] = np.nan if value is None else input_.extract(value)
+		self.__columns[(input_.key, input_.unit)] = column
+		return column
@@ -1,3 +1,4 @@
+import asyncio
 from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import timedelta
@@ -10,7 +11,7 @@ from rich.repr import auto as auto_rich_repr
 
 from LevityDash import LevityDashboard
 from LevityDash.lib.log import LevityPluginLog
-from LevityDash.lib.plugins.categories import CategoryEndpointDict, CategoryItem
+from LevityDash.lib.plugins.categories import CategoryEndpointDict, CategoryItem, CategoryTrie, VersionedDict
 from LevityDash.lib.plugins.observation import MeasurementTimeSeries, Observation, Container
 from LevityDash.lib.plugins.plugin import AnySource, Plugin, SomePlugin
 from LevityDash.lib.plugins.utils import Request, GuardedRequest, ChannelSignal, MutableSignal
@@ -420,7 +421,7 @@ class MultiSourceChannel(ChannelSignal):
 		for container, observations in containers.items():
 			self._pending[container].update(observations)
 		if not self.muted and self._pending:
-			self._emit()
+			self._schedule()
 
 	def __repr__(self):
 		return f'Signal for MultiSourceContainer {self._key}'
@@ -460,10 +461,11 @@ class PluginValueDirectory(MutableSignal):
 	__singleton = None
 	__signal = Signal(set)
 	categories = None
-	_values = {}
+	_values = VersionedDict()
 	_pending: Dict[CategoryItem, Set['Container']]
 	__channels: Dict['CategoryItem', MultiSourceChannel] = {}
-	__awaitingKey: Dict['CategoryItem', Set[Coroutine]] = defaultdict(set)
+	__awaitingKey: CategoryTrie[Callable | Coroutine] = CategoryTrie()
+	__index: CategoryTrie[MultiSourceContainer] = CategoryTrie()
 	name: str = 'PluginValueDirectory'
 
 	def __new__(cls, *args, **kwargs):
@@ -537,8 +539,22 @@ class PluginValueDirectory(MutableSignal):
 			keys = set(*data.keys.values())
 		values = {key: data.sender[key] for key in keys}
 		self.update(values)
-		for key in keys & set(self.__awaitingKey.keys()):
-			raise NotImplementedError('Awaiting keys not implemented')
+		if len(self.__awaitingKey):
+			for key in keys:
+				for pattern, callbacks in list(self.__awaitingKey.subscriptions(key)):
+					self.__awaitingKey.remove(pattern)
+					for callback in callbacks:
+						self.__notify(callback)
+
+	@staticmethod
+	def __notify(callback: Callable | Coroutine):
+		try:
+			if asyncio.iscoroutine(callback):
+				asyncio.ensure_future(callback)
+			else:
+				callback()
+		except Exception as e:
+			log.exception(e)
 
 	def __getitem__(self, item):
 		if item in self.__plugins:
@@ -548,8 +564,15 @@ class PluginValueDirectory(MutableSignal):
 	def __getContainer(self, key) -> MultiSourceContainer:
 		if (container := self._values.get(key, None)) is None:
 			container = self._values[key] = MultiSourceContainer(key)
+			self.__index.insert(key, container)
 		return container
 
+	def containersMatching(self, pattern: CategoryItem) -> Dict[CategoryItem, MultiSourceContainer]:
+		"""Containers for every known key matching a key that may contain wildcards"""
+		if not isinstance(pattern, CategoryItem):
+			pattern = CategoryItem(pattern)
+		return {key: self._values[key] for key in self.__index.match(pattern)}
+
 	def getContainer(self, key, default=None) -> MultiSourceContainer:
 		return self._values.get(key, default) or self.__getContainer(key)
 
@@ -572,16 +595,18 @@ class PluginValueDirectory(MutableSignal):
 			self.__channels[key] = channel
 		return self.__channels[key]
 
-	def notifyWhenKeyAdded(self, key: CategoryItem, callback: Coroutine):
-		self.__awaitingKey[key].add(callback)
+	def notifyWhenKeyAdded(self, key: CategoryItem, callback: Callable | Coroutine):
+		"""Calls, or schedules, callback once a key matching key is published.  Key may contain wildcards"""
+		self.__awaitingKey.insert(key, callback)
 
 	@property
 	def hasAwaiting(self) -> bool:
-		return bool(sum(len(x) for x in self.__awaitingKeys.values()))
+		return bool(len(self.__awaitingKey))
 
 	def fromState(self, state: dict):
 		for key in state:
 			self._values[key] = state[key]
+			self.__index.insert(key, state[key])
 
 	@property
 	def plugins(self) -> 'Plugins':
@@ -1,4 +1,6 @@
 import asyncio
+import heapq
+from bisect import bisect_left
 from abc import ABC, ABCMeta, abstractmethod
 from collections import deque
 from collections.abc import Generator
@@ -9,14 +11,16 @@ from functools import cached_property, lru_cache, partial
 from inspect import Parameter, Signature
 from multiprocessing import Lock
 from numbers import Number
-from operator import add
+from operator import add, itemgetter
 from os import environ
+from sys import getsizeof
+from threading import get_ident, Lock as ThreadLock
 from weakref import WeakValueDictionary
 
-from time import process_time
+from time import monotonic, process_time
 from types import coroutine
 from typing import (
-	Any, Callable, ClassVar, Coroutine, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, OrderedDict, Set,
+	Any, Callable, ClassVar, Coroutine, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, OrderedDict, Sequence, Set,
 	SupportsAbs, SupportsFloat, Tuple, Type, TYPE_CHECKING, TypeAlias, TypeVar, Union
 )
 from uuid import uuid4
@@ -24,7 +28,6 @@ from uuid import uuid4
 import numpy as np
 from builtins import isinstance
 from dateutil.parser import parse
-from itertools import groupby
 from math import inf, isinf
 from PySide2.QtCore import QThread, Signal, Slot
 from PySide2.QtWidgets import QApplication
@@ -32,11 +35,15 @@ from rich.progress import Progress
 
 import WeatherUnits as wu
 from LevityDash.lib.log import LevityPluginLog as log
-from LevityDash.lib.plugins.categories import CategoryDict, CategoryItem
-from LevityDash.lib.plugins.schema import LevityDatagram
+from LevityDash.lib.plugins.archive import ObservationArchive
+from LevityDash.lib.plugins.categories import ArrayConverter, CategoryDict, CategoryItem
+from LevityDash.lib.plugins.columns import TimeSeriesColumns
+from LevityDash.lib.plugins.derived import DerivedMetricEngine
+from LevityDash.lib.plugins.rollups import ObservationRollups
+from LevityDash.lib.plugins.schema import DatagramColumns, LevityDatagram
 from LevityDash.lib.plugins.utils import ChannelSignal, Request, GuardedRequest, Accumulator, SchemaProperty, unitDict
 from LevityDash.lib.utils import (
-	clearCacheAttr, closest, connectSignal, DateKey, isa, LOCAL_TIMEZONE, mostCommonClass, mostFrequentValue,
+	clearCacheAttr, connectSignal, DateKey, isa, LOCAL_TIMEZONE, mostCommonClass, mostFrequentValue,
 	NoValue, now,
 	Now, NowOffset, Period, Pool, roundToPeriod, thread_safe, toLiteral, UTC, Worker
 )
@@ -48,6 +55,7 @@ if TYPE_CHECKING:
 REALTIME_THRESHOLD = timedelta(hours=1.5)
 TIMESERIES_CUTOFF = timedelta(seconds=59)
 DAILY_CUTOFF = timedelta(days=1, minutes=-15)
+MERGE_POLICIES = ('prefer', 'average', 'latest')
 
 
 __all__ = [
@@ -58,6 +66,7 @@ __all__ = [
 	"ObservationLog",
 	"ObservationTimeSeriesItem",
 	"MeasurementTimeSeries",
+	"TimeSeriesDelta",
 	"TimeSeriesItem",
 	"TimeAwareValue",
 	"ObservationValue",
@@ -73,6 +82,28 @@ __all__ = [
 
 log = log.getChild('Observation')
 
+_SAMPLE_OWNED_TYPES = (int, float, str, bytes, datetime, timedelta)
+
+
+def sampleSize(item: Any) -> int:
+	"""Approximate bytes owned by a single sample, excluding the metadata and sources shared by each key"""
+	size = getsizeof(item)
+	owned = []
+	for cls in type(item).__mro__:
+		for name in getattr(cls, '__slots__', ()):
+			if name == '__weakref__':
+				continue
+			if name.startswith('__') and not name.endswith('__'):
+				name = f'_{cls.__name__.lstrip("_")}{name}'
+			try:
+				owned.append(object.__getattribute__(item, name))
+			except AttributeError:
+				pass
+	if (attrs := getattr(item, '__dict__', None)) is not None:
+		size += getsizeof(attrs)
+		owned.extend(attrs.values())
+	return size + sum(getsizeof(value) for value in owned if isinstance(value, _SAMPLE_OWNED_TYPES))
+
 def convertToCategoryItem(key, source: Hashable = None):
 	if not isinstance(key, CategoryItem):
 		key = CategoryItem(key, source=source)
@@ -119,6 +150,37 @@ class HashSlice:
 		return HashSlice(self.start, self.stop)
 
 
+@dataclass(frozen=True)
+class TimeSeriesDelta:
+	"""Time ranges of a MeasurementTimeSeries that were added, removed or replaced by an update"""
+	added: Optional[Tuple[datetime, datetime]] = None
+	removed: Optional[Tuple[datetime, datetime]] = None
+	replaced: Optional[Tuple[datetime, datetime]] = None
+	count: int = 0
+
+	def __bool__(self):
+		return self.count > 0
+
+	@classmethod
+	def fromKeys(cls, added: Iterable[datetime] = (), removed: Iterable[datetime] = (), replaced: Iterable[datetime] = ()) -> 'TimeSeriesDelta':
+		added, removed, replaced = list(added), list(removed), list(replaced)
+		span = lambda keys: (min(keys), max(keys)) if keys else None
+		return cls(span(added), span(removed), span(replaced), len(added) + len(removed) + len(replaced))
+
+	def merge(self, other: 'TimeSeriesDelta') -> 'TimeSeriesDelta':
+		def span(a, b):
+			if a is None or b is None:
+				return a or b
+			return min(a[0], b[0]), max(a[1], b[1])
+
+		return TimeSeriesDelta(
+			span(self.added, other.added),
+			span(self.removed, other.removed),
+			span(self.replaced, other.replaced),
+			self.count + other.count
+		)
+
+
 @dataclass
 class PublishingInfo:
 	observation: 'ObservationDict'
@@ -128,6 +190,7 @@ class PublishingInfo:
 
 # TODO: Change this to a Protocol
 class TimeAwareValue(ABC):
+	__slots__ = ()
 	timestamp: datetime
 	value: Any
 
@@ -142,6 +205,8 @@ class Archived(ABC):
 
 @ArchivableValue.register
 class ObservationValue(TimeAwareValue):
+	# Metadata and source are shared by every value of a key, only the raw value and timestamp are per sample
+	__slots__ = ('__rawValue', '__timestamp', '__metadata', '__source', '__container', '__value', '__convertFunc')
 	__metadata: 'UnitMetaData'
 	__source: 'ObservationDict'
 	__timestamp: Optional[datetime]
@@ -198,7 +263,7 @@ class ObservationValue(TimeAwareValue):
 		self.__source = source
 		self.__container = container
 		self.__value = None
-		self.__convertFunc__: Callable = None
+		self.__convertFunc = None
 		self.value = timeAware or value
 
 	def __getitem__(self, item):
@@ -251,6 +316,8 @@ class ObservationValue(TimeAwareValue):
 			timestamp = value
 		if timestamp is None and 'time' not in str(self.__metadata["key"]):
 			log.warning(f'{self.__metadata["key"]} does not have a timestamp')
+		if isinstance(value, wu.Measurement) and value.unit == self.__metadata.get('sourceUnit', None):
+			value = value.real
 		self.__timestamp = timestamp
 		self.__rawValue = value
 		self.__value = None
@@ -271,13 +338,19 @@ class ObservationValue(TimeAwareValue):
 	def rawValue(self):
 		return self.__rawValue
 
-	@cached_property
+	@property
 	def convertFunc(self) -> Callable:
+		if (convertFunc := self.__convertFunc) is not None:
+			return convertFunc
 		if getattr(self.metadata, 'hasAliases', False):
 			if self['type'] == 'icon':
-				return self.metadata.mapIcon
-			return self.metadata.mapAlias
-		return self.metadata.getConvertFunc(self.source)
+				convertFunc = self.metadata.mapIcon
+			else:
+				convertFunc = self.metadata.mapAlias
+		else:
+			convertFunc = self.metadata.getConvertFunc(self.source)
+		self.__convertFunc = convertFunc
+		return convertFunc
 
 	def __str__(self):
 		return f'{self:human}'
@@ -336,7 +409,7 @@ class ObservationValue(TimeAwareValue):
 	def metadata(self) -> 'UnitMetaData':
 		return self.__metadata
 
-	@cached_property
+	@property
 	def source(self) -> 'ObservationDict':
 		return self.__source
 
@@ -429,38 +502,38 @@ class ArchivedObservationValue(ObservationValue):
 
 @ArchivableValue.register
 class ObservationValueResult(ObservationValue):
+	__slots__ = ('__values', '__result', 'operation')
 	__values: list
-	__value: TimeAwareValue
+	__result: Optional[TimeAwareValue]
 
 	def __init__(self, *values: tuple[TimeAwareValue], operation: Callable = add):
-		self.__values = set()
+		self.__values = []
+		self.__result = None
 		key = values[0].key
 		source = values[0].source
 		metadata = values[0].metadata
 		self.operation = operation
-		super().__init__(None, key, source, metadata)
+		super().__init__(None, key, source, values[0].container, metadata)
 		self.value = values
 
-	@cached_property
-	def __value(self) -> TimeAwareValue:
-		try:
-			value = self.convertFunc(self.__rawValue)
-		except TypeError:
-			value = self.__rawValue
-		if hasattr(value, 'localize'):
-			value = value.localize
-		return value
-
 	@property
 	def value(self):
-		return self.__value
+		if self.__result is None:
+			try:
+				value = self.convertFunc(self.__rawValue)
+			except TypeError:
+				value = self.__rawValue
+			if hasattr(value, 'localize'):
+				value = value.localize
+			self.__result = value
+		return self.__result
 
 	@value.setter
 	def value(self, values):
 		if values is None:
 			return
 
-		clearCacheAttr(self, '__value', '__rawValue')
+		self.__result = None
 
 		if not isinstance(values, Iterable):
 			values = [values]
@@ -476,7 +549,7 @@ class ObservationValueResult(ObservationValue):
 				t = self.value.timestamp
 				self.__values.append(TimeSeriesItem(v, t))
 
-	@cached_property
+	@property
 	def __rawValue(self):
 		return TimeSeriesItem.average(*self.__values)
 
@@ -494,7 +567,7 @@ class ObservationValueResult(ObservationValue):
 
 
 class TimeSeriesItem(TimeAwareValue):
-	__slots__ = ('value', 'timestamp')
+	__slots__ = ('value', 'timestamp', '__weakref__')
 	value: Hashable
 	timestamp: datetime
 
@@ -709,10 +782,19 @@ class TimeSeriesItem(TimeAwareValue):
 		else:
 			value = float(sum(values)) / len(values)
 		timestamp = datetime.fromtimestamp(time / len(items), tz=_timezones.utc).astimezone(LOCAL_TIMEZONE)
+		return cls.build(value, timestamp, values[0], valueCls)
+
+	@classmethod
+	def build(cls, value: Any, timestamp: datetime | int | float, reference: Any = None, valueCls: Type = None) -> 'TimeSeriesItem':
+		"""Creates an item from a raw value, casting it to the type of the reference value"""
+		if not isinstance(timestamp, datetime):
+			timestamp = datetime.fromtimestamp(timestamp, tz=_timezones.utc).astimezone(LOCAL_TIMEZONE)
+		valueCls = valueCls or type(reference)
+		if isinstance(value, str) or value is None or reference is None:
+			return TimeSeriesItem(value, timestamp)
 		if issubclass(valueCls, wu.Measurement) and {'denominator', 'numerator'}.intersection(valueCls.__init__.__annotations__.keys()):
-			ref = values[0]
-			n = type(ref.n)
-			d = type(ref.d)(1)
+			n = type(reference.n)
+			d = type(reference.d)(1)
 			value = valueCls(numerator=n(value), denominator=d)
 			return TimeSeriesItem(value, timestamp)
 		return TimeSeriesItem(valueCls(value), timestamp)
@@ -966,9 +1048,16 @@ class MiniTimeSeries(deque):
 			start, end = window
 		values = self[start:end:1]
 		if values:
+			columns = TimeSeriesColumns.fromItems(values, factory=partial(self.__materialize, values[0].value))
+			if columns.isNumeric:
+				return columns.aggregate('mean')
 			return TimeSeriesItem.average(*values)
 		return None
 
+	@staticmethod
+	def __materialize(reference: Any, timestamp: int, value: Any) -> TimeSeriesItem:
+		return TimeSeriesItem.build(value, timestamp, reference)
+
 	@property
 	def resolution(self) -> timedelta:
 		if isinstance(self.__resolution, timedelta):
@@ -985,14 +1074,15 @@ class MiniTimeSeries(deque):
 
 @ArchivableValue.register
 class RecordedObservationValue(ObservationValue):
-	__history: MiniTimeSeries
-	__resolution: timedelta
-
 	"""
 	Keeps a record of all the values that are reported to it in a deque. For this class, there
 	is a fixed start and stop time for which the values are recorded.
 	"""
 
+	__slots__ = ('__history', '__lastCollection', '__resolution', '__value')
+	__history: MiniTimeSeries
+	__resolution: timedelta
+
 	def __init__(
 		self, value, key, source: Any,
 		container: 'ObservationDict',
@@ -1131,7 +1221,7 @@ class RecordedObservationValue(ObservationValue):
 
 
 class ObservationTimestamp(ObservationValue):
-
+	__slots__ = ('__roundedTo', '__value')
 
 	# TODO: Convert to class generated for each PublishedDict with a set 'source' therefore 'source' is not need for initialization.
 	#       Especially since the source is not the proper term here
@@ -1234,7 +1324,7 @@ class ObservationTimestamp(ObservationValue):
 
 @ArchivedObservationValue.register
 class MultiSourceValue(ObservationValue):
-
+	__slots__ = ('__key', '__source', '__rawValue')
 
 	def __init__(self, anonymousKey: CategoryItem, source: 'ObservationDict', metadata: dict = None):
 		self.__key = anonymousKey.anonymous
@@ -1314,12 +1404,12 @@ class ObservationDict(PublishedDict):
 		else:
 			if recorded:
 				RecordedObservation.register(cls)
-				cls.itemClass = type(cls.__name__ + 'Value', (RecordedObservationValue,), {})
+				cls.itemClass = type(cls.__name__ + 'Value', (RecordedObservationValue,), {'__slots__': ()})
 				RecordedObservation.register(cls.itemClass)
 				if 'Realtime' in cls.__name__ or issubclass(cls, RealtimeSource):
 					RealtimeSource.register(cls.itemClass)
 			else:
-				cls.itemClass = type(cls.__name__ + 'Value', (ObservationValue,), {})
+				cls.itemClass = type(cls.__name__ + 'Value', (ObservationValue,), {'__slots__': ()})
 
 		cls.log = log.getChild(cls.__name__)
 		return super(ObservationDict, cls).__init_subclass__()
@@ -1719,6 +1809,10 @@ class ObservationTimeSeriesItem(Observation, published=False):
 	def source(self):
 		return self.__timeseries.source
 
+	def calculateMissing(self, keys: set = None):
+		# The timeseries derives the registered metrics for all of its rows at once
+		return
+
 	def archive(self):
 		for key, value in self.items():
 			if isinstance(value, ArchivableValue):
@@ -1739,12 +1833,23 @@ class ObservationTimeSeries(ObservationDict, published=True):
 	period: timedelta
 	timeframe: timedelta
 	__timeseries__: dict[DateKey, Observation]
+	__columns__: dict[CategoryItem, TimeSeriesColumns]
 	thread_pool: Pool = cached_property(lambda self: self.source.thread_pool)
 	plugin: 'Plugin'
 	_subscribed_items: Set[CategoryItem]
 
 	itemClass: Type[ObservationTimeSeriesItem]
 
+	ingestQueueSize: ClassVar[Optional[int]] = 1
+	__ingestQueue: deque
+	__ingestLock: ThreadLock
+	__ingesting: bool
+	__staged: Optional[Dict[DateKey, Observation]]
+	__stagedColumns: Optional[Dict[CategoryItem, TimeSeriesColumns]]
+	__stagedUpdates: Optional[List[Tuple[Observation, Callable[[Observation], Any]]]]
+	__stagingThread: Optional[int]
+	__stagingOptions: dict
+
 	def __init_subclass__(cls, **kwargs):
 		recorded = kwargs.get('recorded', None)
 		sourceKeyMap = kwargs.get('sourceKeyMap', {})
@@ -1760,18 +1865,38 @@ class ObservationTimeSeries(ObservationDict, published=True):
 		super(ObservationTimeSeries, self).__init__(*args, **kwargs)
 		self.__knownKeys = set()
 		self.__timeseries__ = {}
+		self.__columns__ = {}
+		self.__ingestQueue = deque(maxlen=self.ingestQueueSize)
+		self.__ingestLock = ThreadLock()
+		self.__ingesting = False
+		self.__staged = None
+		self.__stagedColumns = None
+		self.__stagedUpdates = None
+		self.__stagingThread = None
+		self.__stagingOptions = {}
+		self.ingestStats = {'submitted': 0, 'superseded': 0, 'committed': 0, 'failed': 0}
 
 	def __len__(self) -> int:
-		return len(self.__timeseries__)
+		return max(len(self.__timeseries__), max((len(columns) for columns in self.__columns__.values()), default=0))
 
-	def calculateMissing(self):
+	@cached_property
+	def derived(self) -> DerivedMetricEngine:
+		return DerivedMetricEngine(self)
+
+	def calculateMissing(self, changed: Iterable[Observation] = None) -> Set[CategoryItem]:
+		"""Derives the registered metrics, e.g. dewpoint or precipitation accumulation, for the rows that changed"""
 		# TODO: Add support for calculating high and lows from hourly and supplying them to daily observations
-		if 'precipitationAccumulation' not in self.knownKeys and (key := self.keySelector('precipitation', 'precipitationRate')):
-			accumulation = self[key][0].__class__(self[key][0].__class__.Millimeter(0)).localize
-			for obs in self['time'].values():
-				accumulation += obs[key]
-				obs['precipitationAccumulation'] = accumulation
-		self['datetime'] = [time.datetime for time in self['time'].keys()]
+		if not self.__staging:
+			return self.derived.compute(self.__timeseries__, changed)
+		staged = {id(row) for row in self.__staged.values()}
+		return self.derived.compute({**self.__timeseries__, **self.__staged}, changed, write=partial(self.__writeDerived, staged))
+
+	def __writeDerived(self, staged: Set[int], row: Observation, key: CategoryItem, value: Any):
+		"""Derived values of rows that are already visible are deferred to the commit like any other update to them"""
+		if id(row) in staged:
+			row[key] = value
+		else:
+			self.__stagedUpdates.append((row, lambda row_: row_.__setitem__(key, value)))
 
 	@property
 	def subscribed_items(self) -> Set[CategoryItem]:
@@ -1807,29 +1932,152 @@ class ObservationTimeSeries(ObservationDict, published=True):
 
 			key = ObservationTimestamp(timestamp, item_source, False, roundedTo=self.period)
 			if isinstance(self.source, RealtimeSource):
-				obs = self.__timeseries__.get(key, None) or self.buildObservation(key)
-				for k, v in item.items():
-					obs[k] = v
+				def assign(row: Observation):
+					for k, v in item.items():
+						row[k] = v
+
+				obs = self.__updateRow(key, assign)
 			else:
-				self.__timeseries__[key] = obs = item
+				self.__target[key] = obs = item
 
 		else:
 			key = ObservationTimestamp(item, self, False, roundedTo=self.period)
-			obs = self.__timeseries__.get(key, None) or self.buildObservation(key)
-			obs.update(item, source=source)
+			obs = self.__updateRow(key, lambda row: row.update(item, source=source))
+		if obs is None:
+			return None
 		keys.update(obs.keys())
+		return obs
 
 	def update(self, data: dict, **kwargs):
-		# pre_worker = Worker.create_worker(self.__pre_update, data, func_kwargs=kwargs)
-		# pre_worker.pool = self.thread_pool
-		# pre_worker.link_worker_result(self.update_worker)
-		# self.thread_pool.start(pre_worker, priority=3)
+		keys, rows = self.__update(*self.__pre_update(data, **kwargs))
+		self.__post_update(keys)
+		self.afterUpdate(rows, **kwargs)
+
+	def afterUpdate(self, rows: List[Observation], **options):
+		"""
+		Called with the new and updated rows once they are visible, either after a synchronous update or an
+		ingestion swap.  Options are the keyword arguments the update was submitted with.
+		"""
+		pass
 
-		self.__post_update(self.__update(*self.__pre_update(data, **kwargs)))
+	async def asyncUpdate(self, data, **kwargs):
+		self.submit(data, **kwargs)
 
-	@cached_property
-	def update_worker(self) -> Worker:
-		return Worker.create_worker(self.__update, on_result=self.__post_update, immortal=True)
+	@property
+	def __staging(self) -> bool:
+		return self.__staged is not None and self.__stagingThread == get_ident()
+
+	@property
+	def ingestOptions(self) -> dict:
+		"""Keyword arguments the update being parsed on the calling thread was submitted with"""
+		return self.__stagingOptions if self.__staging else {}
+
+	@property
+	def __target(self) -> Dict[DateKey, Observation]:
+		return self.__staged if self.__staging else self.__timeseries__
+
+	def __updateRow(self, key: DateKey, update: Callable[[Observation], Any]) -> Optional[Observation]:
+		"""
+		Applies update to the row at key, building the row when it does not exist yet.  While staging, rows
+		that are already visible are left untouched and None is returned, the update is applied on the GUI
+		thread when the ingestion is committed.
+		"""
+		if self.__staging:
+			if (row := self.__staged.get(key, None)) is None and (existing := self.__timeseries__.get(key, None)) is not None:
+				self.__stagedUpdates.append((existing, update))
+				return None
+		else:
+			row = self.__timeseries__.get(key, None)
+		if row is None:
+			row = self.buildObservation(key)
+		update(row)
+		return row
+
+	def submit(self, data: dict, **kwargs):
+		"""
+		Queues data to be parsed in the thread pool.  Observations are built into a private buffer
+		that is swapped in from the GUI thread, and data that is still waiting in the queue is
+		superseded by newer data.
+		"""
+		with self.__ingestLock:
+			self.ingestStats['submitted'] += 1
+			if len(self.__ingestQueue) == self.__ingestQueue.maxlen:
+				self.ingestStats['superseded'] += 1
+				log.verbose(f'{self.source.name}.{self.__class__.__name__} superseding queued update', verbosity=3)
+			self.__ingestQueue.append((data, kwargs))
+			if self.__ingesting:
+				return
+			self.__ingesting = True
+		self.__scheduleIngest()
+
+	def __scheduleIngest(self):
+		self.thread_pool.run_threaded_process(self.__ingest, on_result=self.__commit, on_error=self.__ingestFailed, priority=3)
+
+	def __ingestNext(self):
+		"""Parses the next queued update, or marks the ingestion idle when the queue is empty"""
+		with self.__ingestLock:
+			if not self.__ingestQueue:
+				self.__ingesting = False
+				return
+		self.__scheduleIngest()
+
+	def __ingestFailed(self, error: Exception):
+		with self.__ingestLock:
+			self.ingestStats['failed'] += 1
+		log.error(f'{self.source.name}.{self.__class__.__name__} failed to ingest update: {error!r}', exc_info=error)
+		self.__ingestNext()
+
+	def __ingest(self) -> Optional[Tuple[Dict[DateKey, Observation], Dict[CategoryItem, TimeSeriesColumns], list, set, dict]]:
+		with self.__ingestLock:
+			if not self.__ingestQueue:
+				return None
+			data, kwargs = self.__ingestQueue.popleft()
+		staged = self.__staged = {}
+		stagedColumns = self.__stagedColumns = {}
+		updates = self.__stagedUpdates = []
+		self.__stagingOptions = kwargs
+		self.__stagingThread = get_ident()
+		try:
+			keys, _ = self.__update(*self.__pre_update(data, **kwargs))
+		finally:
+			self.__staged = None
+			self.__stagedColumns = None
+			self.__stagedUpdates = None
+			self.__stagingThread = None
+			self.__stagingOptions = {}
+		return staged, stagedColumns, updates, keys, kwargs
+
+	def __commit(self, result: Optional[Tuple[Dict[DateKey, Observation], Dict[CategoryItem, TimeSeriesColumns], list, set, dict]]):
+		try:
+			self.__apply(result)
+		except Exception as e:
+			self.__ingestFailed(e)
+		else:
+			self.__ingestNext()
+
+	def __apply(self, result: Optional[Tuple[Dict[DateKey, Observation], Dict[CategoryItem, TimeSeriesColumns], list, set, dict]]):
+		if result is not None:
+			staged, stagedColumns, updates, keys, options = result
+			# Rebinding the mapping keeps readers from ever seeing a partially built update
+			self.__timeseries__ = {**self.__timeseries__, **staged}
+			if stagedColumns:
+				self.__columns__ = {**self.__columns__, **stagedColumns}
+			self.__knownKeys.update(staged.keys())
+			rows = list(staged.values())
+			# Rows that were already visible are only updated here, on the GUI thread
+			if updates:
+				updated = {}
+				for row, update in updates:
+					update(row)
+					updated[id(row)] = row
+				updated = list(updated.values())
+				keys.update(key for row in updated for key in row.keys())
+				keys.update(self.calculateMissing(updated))
+				rows.extend(updated)
+			self.ingestStats['committed'] += 1
+			# Only rows that did not exist before the update can be appended to the end of a series
+			self.__post_update(keys, since=min(staged).value if staged and not updates else None)
+			self.afterUpdate(rows, **options)
 
 	def __pre_update(self, data: dict, **kwargs) -> tuple[list, set[Any], dict[Any, Any] | Any, list[str | Any]]:
 		keyMap = data.get('keyMap', {})
@@ -1840,6 +2088,8 @@ class ObservationTimeSeries(ObservationDict, published=True):
 			source.append(data['source'])
 		if self.dataName in data:
 			data = data[self.dataName]
+		if isinstance(data, DatagramColumns):
+			return data, set(), keyMap, source
 		if 'data' in data:
 			raw = data.pop('data')
 		else:
@@ -1860,14 +2110,67 @@ class ObservationTimeSeries(ObservationDict, published=True):
 
 		return raw, keys, keyMap, source
 
-	def __update(self, raw, keys, keyMap, source) -> set:
-
-		for item in raw:
-			self.process_item(item, keys, keyMap, source)
-
-		return keys
-
-	def __post_update(self, keys):
+	def __update(self, raw, keys, keyMap, source) -> Tuple[set, List[Observation]]:
+		if isinstance(raw, DatagramColumns):
+			return self.__updateColumns(raw), []
+		changed = [obs for item in raw if (obs := self.process_item(item, keys, keyMap, source)) is not None]
+		if changed:
+			keys.update(self.calculateMissing(changed))
+		return keys, changed
+
+	def __updateColumns(self, data: DatagramColumns) -> set:
+		"""
+		Merges the typed columns of an array shaped update into the columnar storage.  No observation
+		is built for the rows, values are only materialized when a MeasurementTimeSeries collects them.
+		"""
+		timestamps = data.timestamps
+		if not len(timestamps):
+			return set()
+		if self._period is None and len(timestamps) > 1:
+			self._period = timedelta(seconds=int(np.median(np.diff(np.sort(timestamps)))))
+		if self._period is not None and (seconds := int(self._period.total_seconds())):
+			timestamps = np.round(timestamps / seconds).astype(np.int64) * seconds
+
+		# Later rows replace earlier rows that round to the same timestamp
+		_, lastIndex = np.unique(timestamps[::-1], return_index=True)
+		rows = len(timestamps) - 1 - lastIndex
+		timestamps = timestamps[rows]
+		columns = {key: values[rows] for key, values in data.items()}
+		columns.update(self.derived.computeColumns(timestamps, columns))
+
+		target = self.__stagedColumns if self.__staging else self.__columns__
+		for key, values in columns.items():
+			update = TimeSeriesColumns.fromColumn(timestamps, values, factory=partial(self.__columnValue, key))
+			if (existing := self.columnsFor(key)) is not None and len(existing):
+				existing = existing.take(np.flatnonzero(~np.isin(existing.timestamps, timestamps)))
+				update = TimeSeriesColumns.concat(existing, update)
+			target[key] = update
+		log.verbose(f'{self.source.name}.{self.__class__.__name__} ingested {len(columns)} columns of {len(timestamps)} rows', verbosity=4)
+		return set(columns)
+
+	def __columnValue(self, key: CategoryItem, timestamp: int, value: Any) -> ObservationValue:
+		timestamp = datetime.fromtimestamp(timestamp, tz=_timezones.utc).astimezone(LOCAL_TIMEZONE)
+		return self.itemClass.itemClass(TimeSeriesItem(value, timestamp), key=key, source=self, container=self)
+
+	def columnsFor(self, key: CategoryItem) -> Optional[TimeSeriesColumns]:
+		"""Columnar values of key from array shaped updates, None when key has only been received as rows"""
+		if self.__staging and (columns := self.__stagedColumns.get(key, None)) is not None:
+			return columns
+		return self.__columns__.get(key, None)
+
+	def columnItems(self, key: CategoryItem) -> Dict[datetime, ObservationValue]:
+		"""Materializes the values of key stored in columns, rows without a value are skipped"""
+		if (columns := self.columnsFor(key)) is None or not len(columns):
+			return {}
+		present = np.flatnonzero(~np.isnan(columns.values) | (columns.labels >= 0))
+		return {(item := columns.item(i)).timestamp: item for i in present}
+
+	def __post_update(self, keys, since: Optional[datetime] = None):
+		"""
+		Publishes the updated keys and merges the changes into the subscribed timeseries.  Since is the
+		oldest timestamp of the changed rows when all of them are new, it allows a series to only consider
+		its tail.
+		"""
 		self.__knownKeys.update(keys)
 
 		keys = {key for key in keys if key.category not in self._ignoredFields and key.category ^ 'time'}
@@ -1879,7 +2182,12 @@ class ObservationTimeSeries(ObservationDict, published=True):
 			keys_to_publish = keys & self._subscribed_items
 		if keys_to_publish:
 			for key in keys_to_publish:
-				self[key].refresh()
+				series = self[key]
+				if not series.hasSubscribers:
+					series.refresh()
+					continue
+				last = next(reversed(series.keys()), None)
+				series.update({self}, tailOnly=since is not None and (last is None or since > last))
 			self.accumulator.publish(*keys_to_publish)
 
 	def __missing__(self, key):
@@ -1905,6 +2213,10 @@ class ObservationTimeSeries(ObservationDict, published=True):
 		now_ = roundToPeriod(datetime.now(tz=LOCAL_TIMEZONE), self.period, method=int)
 		outdated_keys = [i for i in self.__timeseries__ if i < now_]
 		toPass = [self.destroyObservation(key) for key in outdated_keys]
+		cutoff = int(now_.timestamp())
+		for key, columns in list(self.__columns__.items()):
+			if len(columns) and columns.timestamps[0] < cutoff:
+				self.__columns__[key] = columns.span(cutoff, None)
 		if toPass:
 			if (log_ := getattr(self.source, 'log', None)) is not None:
 				log_: ObservationLog
@@ -2011,6 +2323,9 @@ class ObservationTimeSeries(ObservationDict, published=True):
 			if self._period is None:
 				self.calculatePeriod(value)
 
+			if self.__staging:
+				self.__staged[key] = value
+				return
 			self.__timeseries__[key] = value
 			self.__knownKeys.add(key)
 		else:
@@ -2032,6 +2347,16 @@ class ObservationTimeSeries(ObservationDict, published=True):
 @TimeseriesSource.register
 class ObservationLog(ObservationTimeSeries, published=False, recorded=True):
 	archiveAfter: timedelta = timedelta(minutes=15)  # TODO: Make this a configurable option
+	rollupInterval: timedelta = timedelta(minutes=1)
+	ingestQueueSize: ClassVar[Optional[int]] = None  # every update is part of the history, none are superseded
+	__unarchived: Dict[int, Observation]
+	__lastRollup: float
+
+	def __init__(self, *args, **kwargs):
+		super(ObservationLog, self).__init__(*args, **kwargs)
+		self.__unarchived = {}
+		self.__lastRollup = 0.0
+		self.backfillStats = {'merged': 0, 'skipped': 0}
 
 	@ObservationTimeSeries.period.getter
 	def period(self) -> timedelta:
@@ -2040,12 +2365,155 @@ class ObservationLog(ObservationTimeSeries, published=False, recorded=True):
 			p *= -1
 		return p
 
+	@cached_property
+	def archive(self) -> Optional[ObservationArchive]:
+		config = getattr(self.source, 'config', None)
+		if config is None:
+			return None
+		section = config.default_section
+		if not config.getOrSet(section, 'archive.enabled', True, config.getboolean):
+			return None
+		retention = config.getOrSet(section, 'archive.retention', '30 days', config.configToTimeDelta)
+		return ObservationArchive(self.source.name, retention=retention)
+
+	@cached_property
+	def keepFor(self) -> timedelta:
+		"""How long observations are kept at full resolution before being folded into the rollups"""
+		if (config := getattr(self.source, 'config', None)) is None:
+			return timedelta(hours=6)
+		return config.getOrSet(config.default_section, 'rollups.raw', '6 hours', config.configToTimeDelta)
+
+	@cached_property
+	def rollups(self) -> ObservationRollups:
+		return ObservationRollups()
+
+	def afterUpdate(self, rows: List[Observation], restored: bool = False, backfill: Tuple[datetime, datetime, List[datetime]] = None, **options):
+		if backfill is not None:
+			start, end, _ = backfill
+			log.verbose(f'{self.source.name} backfilled {start:%X} to {end:%X} with {len(rows)} rows', verbosity=1)
+		# Restored rows are already archived, rolling up is left to the next live update
+		if not restored:
+			self.__unarchived.update((id(row), row) for row in rows)
+		self.archiveObservations()
+		if not restored and monotonic() - self.__lastRollup >= self.rollupInterval.total_seconds():
+			self.removeOldObservations()
+
+	def process_item(self, item, keys, keyMap, source):
+		if (backfill := self.ingestOptions.get('backfill', None)) is not None:
+			if not isinstance(item, Mapping):
+				item = {k: v for k, v in zip(keyMap, item)}
+			if not self.__inGap(item, *backfill):
+				self.backfillStats['skipped'] += 1
+				return None
+			self.backfillStats['merged'] += 1
+		return super(ObservationLog, self).process_item(item, keys, keyMap, source)
+
+	def archiveObservations(self):
+		if not self.__unarchived:
+			return
+		observations, self.__unarchived = list(self.__unarchived.values()), {}
+		if (archive := self.archive) is None:
+			return
+		archive.write(
+			ObservationArchive.toRow(key, value.timestamp, value.rawValue)
+			for obs in observations
+			for key, value in list(obs.items())
+			if isinstance(value, ObservationValue) and not isinstance(value, ObservationTimestamp) and value.timestamp is not None
+		)
+
+	def restore(self):
+		"""Replays archived observations that are still within the in-memory window"""
+		self.__replay(self.__readArchive())
+
+	async def asyncRestore(self):
+		self.thread_pool.run_threaded_process(self.__readArchive, on_result=self.__replay)
+
+	def __readArchive(self) -> Optional[Tuple[ObservationRollups, List[dict]]]:
+		"""Rebuilds the rollups and collects the raw rows to replay, only reads so it can run in the thread pool"""
+		if (archive := self.archive) is None:
+			return None
+		now_ = datetime.now(tz=_timezones.utc)
+		rawStart = round((now_ - self.keepFor).timestamp())
+		# Each tier is aggregated by sqlite over its own window, only the raw window is loaded row by row
+		rollups = ObservationRollups()
+		for tier in rollups.tiers:
+			# Start on a bucket boundary so the oldest kept bucket is complete
+			start = (int(now_.timestamp()) - int(tier.keepFor.total_seconds())) // tier.step * tier.step
+			for key, bucket, minimum, maximum, total, count in archive.aggregate(tier.step, start=start, stop=rawStart - 1):
+				tier.merge(CategoryItem(key), bucket, minimum, maximum, total, count)
+		rollups.trim(now_)
+		data = [
+			{'timestamp': datetime.fromtimestamp(timestamp, tz=_timezones.utc), **values}
+			for timestamp, values in archive.records(start=rawStart).items()
+		]
+		return rollups, data
+
+	def __replay(self, restored: Optional[Tuple[ObservationRollups, List[dict]]]):
+		"""Swaps in the rebuilt rollups and submits the raw rows so they are committed like any other update"""
+		if restored is None:
+			return
+		self.rollups, data = restored
+		if data:
+			log.verbose(f'{self.source.name} restoring {len(data)} archived observations', verbosity=1)
+			self.submit({'data': data}, restored=True)
+
+	@property
+	def latest(self) -> Optional[datetime]:
+		"""Time of the most recent logged observation"""
+		timeseries = self.timeseries
+		if not timeseries:
+			return None
+		return max(timeseries).value
+
+	def __inGap(self, item: Mapping, start: datetime, end: datetime, existing: List[datetime]) -> bool:
+		timestamp = ObservationTimestamp(item, self, extract=False).value
+		if not start < timestamp < end:
+			return False
+		tolerance = abs(self.period)
+		index = bisect_left(existing, timestamp)
+		return all(abs(timestamp - existing[i]) >= tolerance for i in (index - 1, index) if 0 <= i < len(existing))
+
+	def backfill(self, data: dict, start: datetime, end: datetime):
+		"""
+		Merges history between start and end into the log.  Rows outside the window, or within one period
+		of an observation that is already logged, are skipped so filling a gap never duplicates a timestamp.
+		"""
+		tolerance = abs(self.period)
+		existing = sorted(key.value for key in self.timeseries if start - tolerance <= key <= end + tolerance)
+		self.submit(data, backfill=(start, end, existing))
+
+	async def asyncBackfill(self, data: dict, start: datetime, end: datetime):
+		self.backfill(data, start, end)
+
+	def close(self):
+		self.archiveObservations()
+		if (archive := self.__dict__.get('archive', None)) is not None:
+			archive.close()
+
 	def removeOldObservations(self):
-		keepFor = timedelta(days=2)
-		cutoff = roundToPeriod(datetime.now(tz=LOCAL_TIMEZONE), self.period) - keepFor
-		items = (k for k in list(self.__timeseries__.keys()) if k < cutoff)
-		for key in items:
-			del self.__timeseries__[key]
+		"""Folds observations older than keepFor into the rollups and evicts them from memory"""
+		self.__lastRollup = monotonic()
+		now_ = datetime.now(tz=LOCAL_TIMEZONE)
+		cutoff = now_ - self.keepFor
+		expired = [k for k in list(self.__timeseries__.keys()) if k < cutoff]
+		if not expired:
+			return
+		self.archiveObservations()
+		rollups = self.rollups
+		keys = set()
+		for timestamp in expired:
+			obs = self.__timeseries__.pop(timestamp)
+			for key, value in list(obs.items()):
+				if isinstance(value, ObservationTimestamp) or not isinstance(value, ObservationValue) or value.timestamp is None:
+					continue
+				if isinstance(raw := value.rawValue, (int, float)) and not isinstance(raw, bool):
+					rollups.add(key, value.timestamp, float(raw))
+					keys.add(key)
+		rollups.trim(now_)
+		log.verbose(f'{self.source.name} rolled up {len(expired)} observations older than {self.keepFor}', verbosity=3)
+		for key in keys & self._subscribed_items:
+			if (timeseries := dict.get(self, key, None)) is not None:
+				timeseries.update({self})
 
 	# TODO: Reimplement this
 
@@ -2069,6 +2537,8 @@ class TimeSeriesSignal(ChannelSignal):
 	__lastHash: int
 	_signal = Signal()
 	_bubble_up = Signal(Observation)
+	_delta = Signal(TimeSeriesDelta)
+	_pendingDelta: Optional[TimeSeriesDelta]
 	_references: dict['MeasurementTimeSeries': Callable]
 	_source: 'MeasurementTimeSeries'
 	_singleShots: Dict[Hashable, coroutine]
@@ -2078,6 +2548,7 @@ class TimeSeriesSignal(ChannelSignal):
 		self._singleShots = {}
 		self._references = {}
 		self._conditionalSingleShots = {}
+		self._pendingDelta = None
 		self.__lashHash = 0
 		super(TimeSeriesSignal, self).__init__(parent, parent.key)
 
@@ -2106,9 +2577,26 @@ class TimeSeriesSignal(ChannelSignal):
 
 		ChannelSignal.muted.fset(self, value)
 
+	@property
+	def _hasPending(self) -> bool:
+		return bool(self._pending) or self._pendingDelta is not None
+
+	def publishDelta(self, delta: TimeSeriesDelta):
+		if not delta:
+			return
+		if self._pendingDelta is not None:
+			delta = self._pendingDelta.merge(delta)
+		self._pendingDelta = delta
+
+	def connectDeltaSlot(self, slot: Callable[[TimeSeriesDelta], None]) -> bool:
+		return connectSignal(self._delta, slot)
+
 	def _emit(self):
 		if self._references and self._pending:
 			self._bubble_up.emit(self._pending)
+		if (delta := self._pendingDelta) is not None:
+			self._pendingDelta = None
+			self._delta.emit(delta)
 		self._signal.emit()
 		self._pending.clear()
 		if self._singleShots and self._source.hasTimeseries:
@@ -2202,6 +2690,10 @@ class MeasurementTimeSeries(OrderedDict):
 	__lastHash: int
 	__references: Set[Hashable]
 	__nullValue: Optional[TimeAwareValue]
+	__sourceItems: Dict[Hashable, Dict[datetime, ObservationValue]]
+	conflictPolicy: ClassVar[str] = 'latest'
+	preferredSources: ClassVar[Tuple[str, ...]] = ('realtime', 'log', 'minutely', 'hourly', 'daily')
+	mergeTolerance: ClassVar[Optional[timedelta]] = None
 
 	def __init__(
 		self,
@@ -2215,6 +2707,7 @@ class MeasurementTimeSeries(OrderedDict):
 		self.__lastHash = 0
 		self.__references = set()
 		self.__nullValue = None
+		self.__sourceItems = {}
 		self._source = source
 		self.key = key
 		self.signals = TimeSeriesSignal(self)
@@ -2282,9 +2775,14 @@ class MeasurementTimeSeries(OrderedDict):
 		if isinstance(reference, MeasurementTimeSeries):
 			self.signals.connectReference(reference.signals)
 
+	@property
+	def hasSubscribers(self) -> bool:
+		return self.signals.hasConnections or len(self.__references) > 0
+
 	def refresh(self, callback: Callable = None) -> None:
+		"""Rebuilds the timeseries from all of its sources when it has subscribers"""
 		self.__clearCache()
-		if self.signals.hasConnections or len(self.__references) > 0:
+		if self.hasSubscribers:
 			log.verbose(f'Refreshing {self!s}', verbosity=3)
 			self.update()
 		else:
@@ -2299,7 +2797,6 @@ class MeasurementTimeSeries(OrderedDict):
 
 		if self.signals.hasConnections or len(self.__references) > 0:
 			lenBefore = len(self)
-			self.__clearCache()
 			with self.signals as signal:
 				self.update(sources)
 			self.log.debug(f'{repr(self)} refreshed: {lenBefore} -> {len(self)}')
@@ -2359,8 +2856,13 @@ class MeasurementTimeSeries(OrderedDict):
 	def parent_reference_updating(self) -> bool:
 		return any(len(i) == 0 for i in self.__references if isinstance(i, MeasurementTimeSeries) and i.isMultiSource)
 
-	def update(self, changed: Set[Observation] = None) -> None:
+	def update(self, changed: Set[Observation] = None, tailOnly: bool = False) -> None:
+		"""
+		Updates the timeseries from its sources.  When changed is provided, only the values of those
+		sources are merged, and with tailOnly only values newer than the current last value are considered.
+		"""
 		# TODO: Add a lock to this operation
+		incremental = changed is not None and len(self) > 0 and bool(self.__sourceItems)
 		changed = changed or self.observations
 		with self.signals:
 			currentLength = len(self)
@@ -2368,48 +2870,234 @@ class MeasurementTimeSeries(OrderedDict):
 				_logger = lambda msg, verbosity=4: log.verbose(msg, verbosity=verbosity)
 			else:
 				_logger = lambda msg, verbosity=0: log.debug(msg)
-			_logger(f'Updating {type(self).__name__}({self.sourceName}:{self.key.name})')
-			self.clear()
-			log.verbose(f'{self} cleared with length {len(self)}', verbosity=5)
-			key = self._key
-			if isinstance(self._source, ObservationTimeSeries):
-				_logger(f'{self} updating from single source of length {len(self._source.timeseries)}')
-				itemCount = 0
-				for item in [v[key] for v in tuple(self._source.timeseries.values()) if key in v]:
-					itemCount += 1
-					self[item.timestamp] = item
-				log.verbose(
-					f'{self} updated from single source with '
-					f'{itemCount} expected items and a change of '
-					f'{len(self) - currentLength} [{currentLength}'
-					f' -> {len(self)}]',
-					verbosity=5
-				)
-			else:
-				values = self.__sourcePull()
 
+			if incremental:
+				_logger(f'Incrementally updating {type(self).__name__}({self.sourceName}:{self.key.name})')
+				delta = self.__applyChanges(changed, tailOnly)
+			else:
+				_logger(f'Updating {type(self).__name__}({self.sourceName}:{self.key.name})')
+				delta = self.__rebuild()
 
-				for item in values:
-					self[item.timestamp] = item
-				log.verbose(
-					f'{self} updated from multiple sources with'
-					f' {len(self) - currentLength} [{currentLength}'
-					f' -> {len(self)}]',
-					verbosity=5
-				)
-			# self.removeOldValues()
+			log.verbose(
+				f'{self} updated from {"multiple sources" if self.isMultiSource else "single source"} with '
+				f'a change of {len(self) - currentLength} [{currentLength} -> {len(self)}]',
+				verbosity=5
+			)
 
-			thisHash = self.__valuesHash()
-			if thisHash != self.__lastHash:
-				_logger(f'{self} has changed, clearing cache and publishing changes', verbosity=3)
-				self.__clearCache()
+			if delta:
+				thisHash = self.__valuesHash()
+				if thisHash != self.__lastHash or delta.replaced is not None:
+					_logger(f'{self} has changed, clearing cache and publishing changes', verbosity=3)
+					self.__clearCache()
+				self.__lastHash = thisHash
+				self.signals.publishDelta(delta)
 			else:
 				log.verbose(f'{self} has not changed', verbosity=4)
 			self.signals.publish(changed)
-			self.__lastHash = thisHash
 
-	def __sourcePull(self) -> list[ObservationValue]:
-		values: list[ObservationValue] = []
+	def __rebuild(self) -> TimeSeriesDelta:
+		previous = set(super(MeasurementTimeSeries, self).keys())
+		self.clear()
+		self.__sourceItems.clear()
+		if self.isMultiSource:
+			sources = self.__sourcePull()
+			self.__sourceItems.update(sources)
+			super(MeasurementTimeSeries, self).update(self.__merge(sources))
+		else:
+			items = self.__sourceItems[self._source] = self.__collect(self._source)
+			super(MeasurementTimeSeries, self).update(items)
+		current = set(super(MeasurementTimeSeries, self).keys())
+		return TimeSeriesDelta.fromKeys(current - previous, previous - current, previous & current)
+
+	def __applyChanges(self, changed: Set[Observation], tailOnly: bool = False) -> TimeSeriesDelta:
+		"""Applies only the values that were added, replaced or evicted in the changed sources"""
+		added, removed, replaced = [], [], []
+
+		current = self.sources
+		if self.isMultiSource:
+			changedSources = {obs[self._key] for obs in changed if self._key in obs} & current
+		else:
+			changedSources = current & changed
+
+		sources = {}
+		for source in changedSources:
+			if isinstance(source, MeasurementTimeSeries):
+				source.update({source.source})
+			sources[source] = self.__collect(source)
+		for source in self.__sourceItems.keys() - current:
+			sources[source] = {}
+
+		affected = set()
+		for source, items in sources.items():
+			previous = self.__sourceItems.pop(source, {})
+			if items:
+				self.__sourceItems[source] = items
+			affected.update(previous.keys() - items.keys())
+			affected.update(timestamp for timestamp, item in items.items() if previous.get(timestamp) is not item)
+
+		if tailOnly and len(self):
+			last = next(reversed(super(MeasurementTimeSeries, self).keys()))
+			affected = {timestamp for timestamp in affected if timestamp > last}
+
+		if (tolerance := self.__mergeTolerance(self.__sourceItems)) and len(self.__sourceItems) > 1:
+			delta = self.__remergeWindows(affected, tolerance)
+			if delta.added is not None:
+				self.__resort()
+			return delta
+
+		ranks = self.__rankSources(self.__sourceItems)
+		for timestamp in affected:
+			candidates = [(ranks[source], items[timestamp]) for source, items in self.__sourceItems.items() if timestamp in items]
+			existing = super(MeasurementTimeSeries, self).get(timestamp)
+			if not candidates:
+				if existing is not None:
+					super(MeasurementTimeSeries, self).__delitem__(timestamp)
+					removed.append(timestamp)
+				continue
+			item = self.__resolve(candidates)
+			if existing is None:
+				super(MeasurementTimeSeries, self).__setitem__(timestamp, item)
+				added.append(timestamp)
+			elif existing is not item:
+				# Replaced objects are part of the delta even when the value is equal, the cached columns hold the previous object
+				super(MeasurementTimeSeries, self).__setitem__(timestamp, item)
+				replaced.append(timestamp)
+
+		if added:
+			self.__resort()
+		return TimeSeriesDelta.fromKeys(added, removed, replaced)
+
+	def __resort(self):
+		keys = list(super(MeasurementTimeSeries, self).keys())
+		if any(a > b for a, b in zip(keys, keys[1:])):
+			for key in sorted(keys):
+				self.move_to_end(key)
+
+	@cached_property
+	def mergePolicy(self) -> Tuple[str, Tuple[str, ...], Optional[timedelta]]:
+		"""Conflict policy, preferred sources and merge tolerance, a tolerance of None is derived from the source periods"""
+		policy, preferred, tolerance = self.conflictPolicy, self.preferredSources, self.mergeTolerance
+		if self.isMultiSource and (config := getattr(self._source, 'config', None)) is not None:
+			section = config.default_section
+			policy = config.getOrSet(section, 'timeseries.conflictPolicy', policy).strip().lower()
+			preferred = config.getOrSet(section, 'timeseries.preferredSources', ', '.join(preferred))
+			preferred = tuple(i.strip() for i in preferred.split(',') if i.strip())
+			tolerance = config.getOrSet(section, 'timeseries.mergeTolerance', 'auto' if tolerance is None else f'{int(tolerance.total_seconds())} seconds').strip().lower()
+			try:
+				tolerance = None if tolerance == 'auto' else config.configToTimeDelta(tolerance)
+			except AttributeError:
+				log.warning(f'{self} has an invalid merge tolerance {tolerance!r}, expected a duration or auto')
+				tolerance = None
+		if policy not in MERGE_POLICIES:
+			log.warning(f'{self} has an unknown conflict policy {policy!r}, expected one of {", ".join(MERGE_POLICIES)}')
+			policy = 'latest'
+		return policy, preferred, tolerance
+
+	@staticmethod
+	def __sourcePeriod(source) -> float:
+		value = getattr(source, 'period', None) or 0
+		return abs(value.total_seconds() if isinstance(value, timedelta) else float(value))
+
+	def __mergeTolerance(self, sources: Dict[Hashable, Dict[datetime, ObservationValue]]) -> timedelta:
+		"""
+		Values of different sources closer than this are one sample.  Unless configured, it is half the period of
+		the finest source, so a value is only grouped with the nearest sample of another source.
+		"""
+		if (tolerance := self.mergePolicy[2]) is not None:
+			return tolerance
+		return timedelta(seconds=min((period for source in sources if (period := self.__sourcePeriod(source)) > 0), default=0) / 2)
+
+	def __rankSources(self, sources: Dict[Hashable, Dict[datetime, ObservationValue]]) -> Dict[Hashable, int]:
+		policy, preferred, _ = self.mergePolicy
+		period = self.__sourcePeriod
+
+		if policy == 'latest':
+			newest = {source: max(items).timestamp() if items else -inf for source, items in sources.items()}
+			key = lambda source: (-newest[source], period(source))
+		else:
+			def key(source):
+				name = getattr(getattr(source, 'source', None), 'dataName', None)
+				return preferred.index(name) if name in preferred else len(preferred), period(source)
+
+		return {source: rank for rank, source in enumerate(sorted(sources, key=key))}
+
+	def __resolve(self, candidates: List[Tuple[int, ObservationValue]]) -> ObservationValue | TimeSeriesItem:
+		if len(candidates) == 1:
+			return candidates[0][1]
+		candidates.sort(key=itemgetter(0))
+		if self.mergePolicy[0] == 'average':
+			values = [item for _, item in candidates]
+			if all(isinstance(item.value, (int, float)) and not isinstance(item.value, bool) for item in values):
+				return TimeSeriesItem.average(*values)
+		return candidates[0][1]
+
+	def __merge(self, sources: Dict[Hashable, Dict[datetime, ObservationValue]], ranks: Dict[Hashable, int] = None) -> Iterator[Tuple[datetime, ObservationValue]]:
+		"""
+		k-way merge of the sorted source values.  Values of different sources within the merge tolerance of the
+		first value of a group are one sample, resolved with the conflict policy and keyed by the timestamp of
+		the highest ranked source.
+		"""
+		ranks = ranks or self.__rankSources(sources)
+		tolerance = self.__mergeTolerance(sources)
+
+		def stream(rank: int, items: Dict[datetime, ObservationValue]):
+			return ((timestamp, rank, item) for timestamp, item in sorted(items.items(), key=itemgetter(0)))
+
+		def resolve(group: List[Tuple[datetime, int, ObservationValue]]) -> Tuple[datetime, ObservationValue]:
+			timestamp = min(group, key=itemgetter(1))[0]
+			return timestamp, self.__resolve([(rank, item) for _, rank, item in group])
+
+		merged = heapq.merge(*(stream(ranks[source], items) for source, items in sources.items()), key=itemgetter(0, 1))
+		group, grouped = [], set()
+		for entry in merged:
+			timestamp, rank, _ = entry
+			if group and (timestamp - group[0][0] > tolerance or rank in grouped):
+				yield resolve(group)
+				group, grouped = [], set()
+			group.append(entry)
+			grouped.add(rank)
+		if group:
+			yield resolve(group)
+
+	def __remergeWindows(self, affected: Iterable[datetime], tolerance: timedelta) -> TimeSeriesDelta:
+		"""Merges the sources again around the affected timestamps, used when values within the tolerance are grouped"""
+		added, removed, replaced = [], [], []
+		ranks = self.__rankSources(self.__sourceItems)
+		windows = []
+		for timestamp in sorted(affected):
+			if windows and timestamp - windows[-1][1] <= tolerance * 2:
+				windows[-1][1] = timestamp
+			else:
+				windows.append([timestamp, timestamp])
+		for start, stop in windows:
+			start, stop = start - tolerance, stop + tolerance
+			sources = {source: {t: item for t, item in items.items() if start <= t <= stop} for source, items in self.__sourceItems.items()}
+			merged = dict(self.__merge(sources, ranks))
+			for timestamp in [t for t in super(MeasurementTimeSeries, self).keys() if start <= t <= stop and t not in merged]:
+				super(MeasurementTimeSeries, self).__delitem__(timestamp)
+				removed.append(timestamp)
+			for timestamp, item in merged.items():
+				existing = super(MeasurementTimeSeries, self).get(timestamp)
+				if existing is item:
+					continue
+				super(MeasurementTimeSeries, self).__setitem__(timestamp, item)
+				(added if existing is None else replaced).append(timestamp)
+		return TimeSeriesDelta.fromKeys(added, removed, replaced)
+
+	def __collect(self, source: Union[ObservationTimeSeries, 'MeasurementTimeSeries', ObservationValue]) -> Dict[datetime, ObservationValue]:
+		key = self._key
+		match source:
+			case ObservationTimeSeries():
+				items = {(item := v[key]).timestamp: item for v in tuple(source.timeseries.values()) if key in v}
+				items.update(source.columnItems(key))
+				return items
+			case MeasurementTimeSeries():
+				return {item.timestamp: item for item in source}
+			case _:
+				return {source.timestamp: source}
+
+	def __sourcePull(self) -> Dict[Hashable, Dict[datetime, ObservationValue]]:
+		values: Dict[Hashable, Dict[datetime, ObservationValue]] = {}
 		sources: List[MeasurementTimeSeries, ObservationValue] = self.sources
 
 		log.verbose(f'{self} refreshing sources', verbosity=3)
@@ -2421,29 +3109,28 @@ class MeasurementTimeSeries(OrderedDict):
 		expectedLength = sum(len(s) for s in sources)
 		for item in sources:
 			log.verbose(f'Pulling from {item}', verbosity=3)
+			values[item] = self.__collect(item)
 			if isinstance(item, MeasurementTimeSeries):
-				values.extend(item)
 				log.verbose(
 					f'Collected {len(item)} item{"s" if len(item) > 1 else ""}'
 					f'from {item.source.dataName}',
 					verbosity=3
 				)
 			else:
-				values.append(item)
 				log.verbose(f'Collected value from {item.source.dataName}', verbosity=3)
-		if len(values) == expectedLength:
+		collected = sum(len(i) for i in values.values())
+		if collected == expectedLength:
 			log.verbose(
-				f'︎︎ ✔ {self} successfully collected {len(values)} from '
+				f'︎︎ ✔ {self} successfully collected {collected} from '
 				f'source{"s" if self.sourceCount > 1 else ""} {self.sourcesString}',
 				verbosity=3
 			)
 		else:
 			log.verbose(
 				f'︎︎ ✘ {self} pulled from source{"s" if self.sourceCount > 1 else ""} {self.sourcesString}, but failed. '
-				f'Expected {expectedLength} items but collected only {len(values)}',
+				f'Expected {expectedLength} items but collected only {collected}',
 				verbosity=0
 			)
-		values.sort(key=lambda x: x.timestamp)
 		return values
 
 	@property
@@ -2512,20 +3199,21 @@ class MeasurementTimeSeries(OrderedDict):
 
 	@lru_cache(16)
 	def __now(self, timeHashInvalidator: TimeHash, valueHash: Optional[int] = 0) -> ObservationValue:
-		key = closest(list(self.keys()), now())
-		return super(MeasurementTimeSeries, self).__getitem__(key)
+		columns = self.columns
+		return columns.item(columns.nearest(now()))
 
 	@lru_cache(16)
 	def __value(self, key, timeHashInvalidator: TimeHash, valueHash: Optional[int] = 0) -> ObservationValue:
-		key = closest(list(self.keys()), key)
-		return super(MeasurementTimeSeries, self).__getitem__(key)
+		columns = self.columns
+		return columns.item(columns.nearest(key))
 
 	def __missing__(self, key):
-		source = sorted(list(self._source.timeseriesKeys()), key=lambda x: x.timestamp or x.value)
-		start = source[0].value
+		if not len(columns := self.columns):
+			raise KeyError(key)
+		start = columns.item(0).timestamp
 		if key < start and abs(key - start) >= self.period:
 			key = start
-		stop = source[-1].value
+		stop = columns.item(-1).timestamp
 		if key > stop and abs(key - stop) >= self.period:
 			key = stop
 		if start <= key <= stop:
@@ -2568,20 +3256,68 @@ class MeasurementTimeSeries(OrderedDict):
 
 	@lru_cache(maxsize=16)
 	def __getSlice(self, start: int, stop: int = 0, lastHash: int = 0) -> List[TimeSeriesItem]:
-		if stop:
-			values = [k for k in self if start <= k.timestamp.timestamp() <= stop]
-		else:
-			values = [k for k in self if start <= k.timestamp.timestamp()]
-		return values
+		return self.columns.span(start, stop or None).items
 
 	@lru_cache(maxsize=16)
-	def __reshaped(self, step: timedelta, start: int, stop: int = None, lastHash: int = 0) -> List[TimeSeriesItem]:
-		values = self.__getSlice(start, stop, lastHash)
-		values = groupby(values, key=lambda x: round(x.timestamp.timestamp() / step.total_seconds()))
-		values = [TimeSeriesItem.average(group) for _, group in values]
-		return values
+	def __reshaped(self, step: timedelta, start: int, stop: int = None, lastHash: int = 0, how: str = 'mean') -> List[TimeSeriesItem]:
+		return self.columns.span(start, stop or None).resample(step, how).items
+
+	def __reshape(self, values: List[TimeSeriesItem], step: timedelta, how: str = 'mean') -> List[TimeSeriesItem]:
+		if not values:
+			return []
+		return TimeSeriesColumns.fromItems(values, factory=partial(self.__materialize, values[0].value)).resample(step, how).items
+
+	def resample(self, step: timedelta, how: str = 'mean', start: datetime = None, stop: datetime = None) -> List[TimeSeriesItem]:
+		"""Values reduced into buckets of step using mean, min, max, sum, first, last or count"""
+		start = round(start.timestamp()) if start is not None else None
+		stop = round(stop.timestamp()) if stop is not None else None
+		return self.__reshaped(step, start, stop, lastHash=self.__lastHash, how=how)
+
+	def __materialize(self, reference: Any, timestamp: int, value: Any) -> TimeSeriesItem:
+		return TimeSeriesItem.build(value, timestamp, reference)
 
-	def getSlice(self, key: HashSlice, truncate_at: int = 0) -> List[TimeSeriesItem]:
+	@lru_cache(maxsize=8)
+	def __archived(self, start: int, stop: int, lastHash: int = 0, secondsPerPixel: float = None) -> List[TimeSeriesItem]:
+		# Values that have already been evicted from memory, rolled up values are preferred over the raw archive
+		if not isinstance(self._source, ObservationLog) or not len(self):
+			return []
+		first = self.first
+		firstTimestamp = round(first.timestamp.timestamp())
+		if start >= firstTimestamp:
+			return []
+		convert = getattr(first, 'convertFunc', None) or (lambda x: x)
+		tz = first.timestamp.tzinfo
+		stop = min(stop, firstTimestamp - 1)
+
+		def load(timestamp: int, value: Any) -> TimeSeriesItem:
+			try:
+				value = convert(value)
+			except Exception:
+				pass
+			# Match the units of the in-memory values
+			if localized := getattr(value, 'localize', None):
+				value = localized
+			return TimeSeriesItem.load_raw(value, datetime.fromtimestamp(timestamp, tz))
+
+		rolledUp = self._source.rollups.query(self._key, start, stop, secondsPerPixel=secondsPerPixel)
+		values = [load(int(timestamp), float(value)) for timestamp, value in zip(rolledUp.timestamps, rolledUp.values)]
+		if values:
+			stop = min(stop, int(rolledUp.timestamps[0]) - 1)
+		if start > stop or (archive := self._source.archive) is None:
+			return values
+		archived = [
+			load(timestamp, text if value is None else value)
+			for _, timestamp, value, text in archive.query(start, stop, keys=(self._key,))
+		]
+		if archived and secondsPerPixel:
+			archived = self.__reshape(archived, timedelta(seconds=secondsPerPixel))
+		return archived + values
+
+	def getSlice(self, key: HashSlice, truncate_at: int = 0, secondsPerPixel: float = None) -> List[TimeSeriesItem]:
+		"""
+		Values between key.start and key.stop.  Values that have aged out of memory are taken from the
+		coarsest rollup tier that still provides a value per secondsPerPixel.
+		"""
 		start = round((key.start or self.first.timestamp).timestamp())
 		stop = key.stop or self.last.timestamp
 
@@ -2599,6 +3335,11 @@ class MeasurementTimeSeries(OrderedDict):
 		else:
 			sliced = self.__getSlice(start, stop, lastHash=self.__lastHash)
 
+		if archived := self.__archived(start, stop, lastHash=self.__lastHash, secondsPerPixel=secondsPerPixel):
+			if isinstance(step, timedelta):
+				archived = self.__reshape(archived, step)
+			sliced = archived + sliced
+
 		if isinstance(step, int):
 			sliced = sliced[::step]
 
@@ -2619,7 +3360,7 @@ class MeasurementTimeSeries(OrderedDict):
 	def __clearCache(self):
 		if len(self) != 0:
 			log.verbose(f'Clearing cache for {self}', verbosity=3)
-		clearCacheAttr(self, 'array', 'period', 'periodAverage', '_timeHashInvalidator', 'timeseries', 'timeseriesInts', 'start', 'list')
+		clearCacheAttr(self, 'columns', 'array', 'period', 'periodAverage', '_timeHashInvalidator', 'timeseries', 'timeseriesInts', 'start', 'list')
 
 	def updateItem(self, value):
 		key = DateKey(value.timestamp)
@@ -2647,23 +3388,61 @@ class MeasurementTimeSeries(OrderedDict):
 		return self.list[0].timestamp
 
 	@cached_property
-	def array(self) -> np.array:
-		return np.array([i.value for i in self.list])
+	def columns(self) -> TimeSeriesColumns:
+		if len(self) == 0:
+			self.update()
+		items = tuple(self.values())
+		reference = getattr(items[0], 'value', None) if items else None
+		factory = partial(self.__materialize, reference)
+		if (converter := self.__arrayConverter(items)) is not None:
+			return TimeSeriesColumns.fromItems(items, factory=factory, attribute='rawValue', convert=converter)
+		return TimeSeriesColumns.fromItems(items, factory=factory)
+
+	@staticmethod
+	def __arrayConverter(items: Sequence[ObservationValue]) -> Optional[ArrayConverter]:
+		"""
+		Converter for the raw values of items into their localized unit, None when the items do not share
+		metadata or a raw value is not a plain number and the values have to be converted one at a time.
+		"""
+		if not items or not isinstance(first := items[0], ObservationValue):
+			return None
+		metadata = first.metadata
+		for item in items:
+			if not isinstance(item, ObservationValue) or item.metadata is not metadata:
+				return None
+			raw = item.rawValue
+			if raw is not None and (isinstance(raw, (bool, wu.Measurement)) or not isinstance(raw, (int, float))):
+				return None
+		return metadata.getArrayConverter(first.source)
+
+	@cached_property
+	def array(self) -> np.ndarray:
+		return self.columns.values
+
+	@property
+	def bytesPerSample(self) -> float:
+		"""Average memory held by each value object of the timeseries"""
+		values = tuple(self.values())
+		if not values:
+			return 0.0
+		return sum(sampleSize(value) for value in values) / len(values)
+
+	@property
+	def columnBytesPerSample(self) -> float:
+		"""Memory per row of the columnar view, including the reference to the value object"""
+		return self.columns.bytesPerRow
 
 	@cached_property
 	def list(self):
-		if len(self) == 0:
-			self.update()
-		l = list(self.values())
-		return sorted(l, key=lambda x: x.timestamp)
+		return self.columns.items
 
 	@cached_property
 	def timeseries(self) -> np.array:
 		return [i.timestamp for i in self.list]
 
 	@cached_property
-	def timeseriesInts(self) -> np.array:
-		return np.array([x.timestamp.timestamp() for x in self.list])
+	def timeseriesInts(self) -> np.ndarray:
+		return self.columns.timestamps
 
 	@property
 	def last(self):
@@ -13,7 +13,7 @@ from typing import Any, Dict, Iterable, Optional, Set, Text, Tuple, Type, TYPE_C
 from LevityDash.lib.EasyPath import EasyPath, EasyPathFile
 from LevityDash.lib.config import pluginConfig, PluginConfig
 from LevityDash.lib.log import LevityPluginLog as pluginLog
-from LevityDash.lib.plugins.categories import CategoryDict, CategoryItem
+from LevityDash.lib.plugins.categories import CategoryDict, CategoryItem, VersionedDict
 from LevityDash.lib.plugins.observation import (
 	ArchivedObservationValue, Container, Observation, ObservationDict, ObservationLog, ObservationRealtime,
 	ObservationTimeSeries, ObservationValue, PublishedDict, RealtimeSource, RecordedObservationValue
@@ -192,9 +192,9 @@ class PluginMeta(type):
 			ObservationClass = type(f'{name}Observation', (ObservationDict,), {})
 			classes = {
 				'Container':          type(f'{name}Container', (Container,), {}),
-				'FrozenValueClass':   type(f'{name}FrozenValue', (ArchivedObservationValue,), {}),
-				'ValueClass':         type(f'{name}Value', (ObservationValue,), {}),
-				'RecordedValueClass': type(f'{name}RecordedValue', (RecordedObservationValue,), {}),
+				'FrozenValueClass':   type(f'{name}FrozenValue', (ArchivedObservationValue,), {'__slots__': ()}),
+				'ValueClass':         type(f'{name}Value', (ObservationValue,), {'__slots__': ()}),
+				'RecordedValueClass': type(f'{name}RecordedValue', (RecordedObservationValue,), {'__slots__': ()}),
 			}
 
 			if rt := kwargs.get('realtime', False):
@@ -330,7 +330,7 @@ class Plugin(metaclass=PluginMeta):
 
 	def __init__(self):
 		self.__running = False
-		self.containers = {}
+		self.containers = VersionedDict()
 		self.containerCategories = CategoryDict(self, self.containers, None)
 
 		self.pluginLog = pluginLog.getChild(f'{self.name}')
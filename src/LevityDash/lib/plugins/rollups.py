@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from threading import RLock
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from LevityDash.lib.plugins.columns import TimeSeriesColumns
+
+__all__ = ['RollupTier', 'ObservationRollups']
+
+# min, max, sum, count
+_MIN, _MAX, _SUM, _COUNT = range(4)
+
+
+def _epoch(value: datetime | int | float | None) -> Optional[int]:
+	if value is None:
+		return None
+	if isinstance(value, datetime):
+		return int(value.timestamp())
+	return int(value)
+
+
+class RollupTier:
+	"""Fixed step buckets holding the min, max, sum and count of every value folded into them"""
+
+	__slots__ = ('step', 'keepFor', '__buckets', '__cache')
+
+	step: int
+	keepFor: timedelta
+
+	def __init__(self, step: timedelta, keepFor: timedelta):
+		self.step = max(int(step.total_seconds()), 1)
+		self.keepFor = keepFor
+		self.__buckets: Dict[Hashable, Dict[int, List[float]]] = defaultdict(dict)
+		self.__cache: Dict[Tuple[Hashable, str], TimeSeriesColumns] = {}
+
+	def __repr__(self):
+		return f'RollupTier(step={timedelta(seconds=self.step)}, keepFor={self.keepFor}, keys={len(self.__buckets)})'
+
+	def __contains__(self, key: Hashable) -> bool:
+		return bool(self.__buckets.get(key, None))
+
+	def add(self, key: Hashable, timestamp: datetime | int, value: float):
+		bucket = _epoch(timestamp) // self.step
+		buckets = self.__buckets[key]
+		if (accumulator := buckets.get(bucket, None)) is None:
+			buckets[bucket] = [value, value, value, 1]
+		else:
+			accumulator[_MIN] = min(accumulator[_MIN], value)
+			accumulator[_MAX] = max(accumulator[_MAX], value)
+			accumulator[_SUM] += value
+			accumulator[_COUNT] += 1
+		self.__invalidate(key)
+
+	def merge(self, key: Hashable, bucket: int, minimum: float, maximum: float, total: float, count: int):
+		"""Folds a bucket that was already aggregated elsewhere, e.g. by the archive, into the tier"""
+		buckets = self.__buckets[key]
+		if (accumulator := buckets.get(bucket, None)) is None:
+			buckets[bucket] = [minimum, maximum, total, count]
+		else:
+			accumulator[_MIN] = min(accumulator[_MIN], minimum)
+			accumulator[_MAX] = max(accumulator[_MAX], maximum)
+			accumulator[_SUM] += total
+			accumulator[_COUNT] += count
+		self.__invalidate(key)
+
+	def trim(self, now: datetime | int = None) -> int:
+		"""Drops buckets that are older than keepFor, returns the number of buckets removed"""
+		now = _epoch(now) if now is not None else int(datetime.now(tz=timezone.utc).timestamp())
+		cutoff = (now - int(self.keepFor.total_seconds())) // self.step
+		removed = 0
+		for key, buckets in list(self.__buckets.items()):
+			stale = [bucket for bucket in buckets if bucket < cutoff]
+			for bucket in stale:
+				del buckets[bucket]
+			if stale:
+				removed += len(stale)
+				self.__invalidate(key)
+			if not buckets:
+				del self.__buckets[key]
+		return removed
+
+	def __invalidate(self, key: Hashable):
+		for cached in [k for k in self.__cache if k[0] == key]:
+			del self.__cache[cached]
+
+	def columns(self, key: Hashable, how: str = 'mean') -> TimeSeriesColumns:
+		"""Bucket values of key as columns, timestamps are the bucket midpoints"""
+		if (cached := self.__cache.get((key, how), None)) is not None:
+			return cached
+		buckets = self.__buckets.get(key, None)
+		if not buckets:
+			return TimeSeriesColumns.empty()
+		order = sorted(buckets)
+		accumulators = np.array([buckets[bucket] for bucket in order], dtype=np.float64)
+		timestamps = np.array(order, dtype=np.int64) * self.step + self.step // 2
+		match how:
+			case 'min':
+				values = accumulators[:, _MIN]
+			case 'max':
+				values = accumulators[:, _MAX]
+			case 'sum':
+				values = accumulators[:, _SUM]
+			case 'count':
+				values = accumulators[:, _COUNT]
+			case 'mean':
+				values = accumulators[:, _SUM] / accumulators[:, _COUNT]
+			case _:
+				raise ValueError(f'Unknown rollup method {how!r}, expected one of min, max, mean, sum or count')
+		columns = self.__cache[(key, how)] = TimeSeriesColumns(timestamps, np.ascontiguousarray(values))
+		return columns
+
+
+class ObservationRollups:
+	"""
+	Tiered rollups of values that have aged out of an ObservationLog's raw window.
+	Every value is folded into each tier and each tier only keeps its own time window.
+	"""
+
+	defaultTiers: Tuple[Tuple[timedelta, timedelta], ...] = (
+		(timedelta(minutes=1), timedelta(days=1)),
+		(timedelta(minutes=15), timedelta(days=7)),
+		(timedelta(hours=1), timedelta(days=30)),
+	)
+
+	def __init__(self, tiers: Iterable[Tuple[timedelta, timedelta]] = None):
+		tiers = tiers or self.defaultTiers
+		self.tiers: List[RollupTier] = sorted((RollupTier(step, keepFor) for step, keepFor in tiers), key=lambda tier: tier.step)
+		self.__lock = RLock()
+
+	def __repr__(self):
+		return f'ObservationRollups({", ".join(str(timedelta(seconds=tier.step)) for tier in self.tiers)})'
+
+	@property
+	def retention(self) -> timedelta:
+		return max((tier.keepFor for tier in self.tiers), default=timedelta(0))
+
+	def add(self, key: Hashable, timestamp: datetime | int, value: float):
+		with self.__lock:
+			for tier in self.tiers:
+				tier.add(key, timestamp, value)
+
+	def trim(self, now: datetime | int = None) -> int:
+		with self.__lock:
+			return sum(tier.trim(now) for tier in self.tiers)
+
+	def select(self, secondsPerPixel: float = None, start: datetime | int = None, now: datetime | int = None) -> Optional[RollupTier]:
+		"""
+		The coarsest tier that still provides at least one value per pixel among the tiers whose window reaches
+		back to start.  Falls back to the finest tier that reaches start, or to the longest tier when none does
+		and the archive has to provide what is older.
+		"""
+		if not self.tiers:
+			return None
+		tiers = self.tiers
+		if start is not None:
+			now = _epoch(now) if now is not None else int(datetime.now(tz=timezone.utc).timestamp())
+			tiers = [tier for tier in tiers if now - int(tier.keepFor.total_seconds()) <= _epoch(start)]
+			if not tiers:
+				return max(self.tiers, key=lambda tier: tier.keepFor)
+		if secondsPerPixel is None:
+			return tiers[0]
+		fitting = [tier for tier in tiers if tier.step <= secondsPerPixel]
+		return fitting[-1] if fitting else tiers[0]
+
+	def query(
+		self,
+		key: Hashable,
+		start: datetime | int = None,
+		stop: datetime | int = None,
+		how: str = 'mean',
+		secondsPerPixel: float = None
+	) -> TimeSeriesColumns:
+		with self.__lock:
+			if (tier := self.select(secondsPerPixel, start)) is None:
+				return TimeSeriesColumns.empty()
+			return tier.columns(key, how).span(_epoch(start), _epoch(stop))
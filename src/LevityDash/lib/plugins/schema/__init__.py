@@ -1,17 +1,19 @@
 from collections import ChainMap
 from copy import deepcopy
-from datetime import datetime
+from datetime import datetime, timedelta, timezone, tzinfo
 from difflib import get_close_matches
 from enum import Enum
 from functools import cached_property, lru_cache
-from typing import Dict, Hashable, Iterable, Optional, Set, Union, Sized, List
+from typing import Dict, Hashable, Iterable, Mapping, Optional, Set, Union, Sized, List
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+import numpy as np
 from dateutil import parser as DateParser
 from rich.pretty import pretty_repr
 
 from LevityDash.lib.plugins.utils import unitDict
 from LevityDash.lib.log import LevityPluginLog
-from LevityDash.lib.utils.shared import clearCacheAttr, now, Unset
+from LevityDash.lib.utils.shared import clearCacheAttr, LOCAL_TIMEZONE, now, Unset
 from LevityDash.lib.plugins.categories import CategoryDict, CategoryItem, UnitMetaData, ValueNotFound
 from LevityDash.lib.plugins.errors import InvalidData
 
@@ -47,12 +49,13 @@ class DotStorage(dict):
 class LevityDatagram(dict):
 	sourceData: dict
 	metaData: dict
+	compiled: bool = True
 
 	def __init__(self, data: dict, schema: 'Schema' = None, **kwargs):
+		self.__compiled = kwargs.get('compiled', self.compiled) and schema is not None
 		if type(self) is LevityDatagram:
-			self.__raw = deepcopy(data)
-		else:
-			pass
+			# The compiled mapping never modifies the payload so it does not need to be copied
+			self.__raw = data if self.__compiled else deepcopy(data)
 		self.__creationTime = kwargs.get('creationTime', None) or now()
 		self.__schema = schema
 		self.__sourceData = kwargs.get('sourceData', {})
@@ -60,19 +63,32 @@ class LevityDatagram(dict):
 		self.__static = kwargs.get('static', False)
 		self.__subItems = []
 		self.__dataMap = kwargs.get('dataMap', None)
+		self.__columnar = kwargs.get('columnar', False)
 		super().__init__()
 		self.__init_data__(data)
 		self.mapData()
-		self.validate()
+		if (mapper := self.mapper) is not None:
+			mapper.validate(self)
+		else:
+			self.validate()
 
 	def __init_data__(self, data: dict):
 		data = self.mapArrays(data)
-		data = self.parseData(data=data)
-		data = self.replaceKeys(data)
-		data = self.replaceKeyVars(data)
-		data = self.addDataKeyValues(data)
+		if (mapper := self.mapper) is not None:
+			data = mapper.map(self, data)
+		else:
+			data = self.parseData(data=data)
+			data = self.replaceKeys(data)
+			data = self.replaceKeyVars(data)
+			data = self.addDataKeyValues(data)
 		self.update(data)
 
+	@property
+	def mapper(self) -> Optional['DatagramMapper']:
+		if self.__compiled:
+			return self.schema.mapper
+		return None
+
 	@lru_cache(maxsize=16)
 	def findTimeKey(self, data: dict) -> str:
 		if isinstance(data, frozenset):
@@ -165,6 +181,11 @@ class LevityDatagram(dict):
 	def static(self):
 		return self.__static
 
+	@property
+	def columnar(self) -> bool:
+		"""Records of parallel arrays are kept as DatagramColumns instead of a Subdatagram per row"""
+		return self.__columnar
+
 	def __getitem__(self, item):
 		if item.startswith('@'):
 			if item.startswith('@meta.'):
@@ -183,19 +204,19 @@ class LevityDatagram(dict):
 				data = self.replaceKeyVars({key: value})
 			super().__setitem__(key, value)
 
-	def replaceKeyVars(self, data: dict):
-		def findVar(atom: str, ignore: set = None):
-			if ignore is None:
-				ignore = set()
-			elif atom in ignore:
-				return None
-			ignore.add(atom)
-			main = self.sourceData.get(atom, None) or self.metaData.get(atom, None)
-			return main or findVar(self.schema.properties.get(atom, {}).get('alt', None), ignore) or 'NA'
+	def findVar(self, atom: str, ignore: set = None):
+		if ignore is None:
+			ignore = set()
+		elif atom in ignore:
+			return None
+		ignore.add(atom)
+		main = self.sourceData.get(atom, None) or self.metaData.get(atom, None)
+		return main or self.findVar(self.schema.properties.get(atom, {}).get('alt', None), ignore) or 'NA'
 
+	def replaceKeyVars(self, data: dict):
 		for key, value in dict(data).items():
 			key = CategoryItem(key)
-			keyVars = {f'{i}': findVar(i) for i in key.vars}
+			keyVars = {f'{i}': self.findVar(i) for i in key.vars}
 			if keyVars:
 				data.pop(key)
 				key = key.replaceVar(**keyVars)
@@ -296,6 +317,8 @@ class LevityDatagram(dict):
 	def mapArrays(self, data, keyMap: Optional[str] = None):
 		keyMap = keyMap or self.schema.getKeyMap(data, datagram=self) or {}
 		if isinstance(keyMap, dict):
+			if isinstance(data, dict) and keyMap:
+				data = dict(data)
 			for key, subMap in keyMap.items():
 				if isinstance(data, list) and key == len(data) or (key is iter and len(subMap) == len(data)):
 					data = [self.mapArrays(data=item, keyMap=subMap) for item in data]
@@ -439,6 +462,14 @@ class Subdatagram(LevityDatagram):
 	def dataMap(self):
 		return self.__parent.dataMap
 
+	@property
+	def mapper(self) -> Optional['DatagramMapper']:
+		return self.__parent.mapper
+
+	@property
+	def columnar(self) -> bool:
+		return self.__parent.columnar
+
 	@property
 	def isTimeSeries(self) -> bool:
 		return len(self) and all(isinstance(i, dict) for i in list(self.values())[:min(10, len(self))])
@@ -451,6 +482,277 @@ class Subdatagram(LevityDatagram):
 		return pretty_repr({**self.metaData, **self.sourceData, **self}, indent_size=2, max_width=120, max_depth=1, max_length=maxLen, max_string=200)
 
 
+class DatagramColumns(Subdatagram):
+	"""
+	A record of parallel arrays mapped as typed columns rather than pivoted into a Subdatagram per row.
+	Values are float64 columns, or object columns when they are not numeric, and `timestamps` holds
+	the time column as UTC epoch seconds.
+	"""
+	timestamps: np.ndarray
+
+	def __init__(self, parent: LevityDatagram, data: dict, path: Union[str, tuple], timeKey: str):
+		self.__timeKey = timeKey
+		super(DatagramColumns, self).__init__(parent=parent, data=data, path=path)
+
+	def __init_data__(self, data: dict):
+		self.timestamps, columns = self.mapper.columns(self, data, self.__timeKey)
+		self.update(columns)
+
+	def __str__(self, maxLen: int = None):
+		return f'DatagramColumns({self.path}, rows={len(self.timestamps)}, columns={len(self)})'
+
+
+class KeyPlan:
+	"""The schema lookups of a single source key"""
+
+	__slots__ = ('source', 'meta', 'isTime', 'ignored', 'key', 'allowNull', 'vars')
+
+	def __init__(self, schema: 'Schema', key: Hashable):
+		source = meta = None
+		if key in schema.properties and schema.properties.get(key).get(tsk.sourceData, False):
+			source = f'@{schema.properties.getKey(key)}'
+		if key in schema.metaData and schema.metaData.get(key).get(tsk.metaData, False):
+			meta = f'@{schema.metaData.getKey(key)}'
+		self.source: Optional[str] = source
+		self.meta: Optional[str] = meta
+		self.isTime: bool = any(i in str(key) for i in ('time', 'date'))
+		self.ignored: bool = key in schema._ignored
+		mappedKey = schema.sourceKeyMap.get(key, key)
+		self.allowNull: bool = mappedKey in schema.nullAllowedKeys
+		self.key: CategoryItem = CategoryItem(mappedKey)
+		self.vars: tuple = tuple(self.key.vars)
+
+
+class DatagramMapper:
+	"""
+	Single pass replacement for parseData, replaceKeys, replaceKeyVars, addDataKeyValues and validate.
+
+	A schema never changes once it is loaded so the lookups for each source key, record shape and
+	validated key are resolved the first time they are seen and reused for every datagram after.
+	Payloads are never modified, containers are rebuilt instead.
+	"""
+
+	def __init__(self, schema: 'Schema'):
+		self.schema = schema
+		self.__keys: Dict[Hashable, KeyPlan] = {}
+		self.__shapes: Dict[frozenset, tuple[str, bool]] = {}
+		self.__validators: Dict[Hashable, Optional[UnitMetaData]] = {}
+		self.__dataKeys = tuple((k, v['dataKey']) for k, v in schema.dataKeyItems.items() if v.get('dataKey', None) is not None)
+
+	def __repr__(self):
+		return f'DatagramMapper({self.schema.plugin.name}, keys={len(self.__keys)}, shapes={len(self.__shapes)})'
+
+	def plan(self, key: Hashable) -> KeyPlan:
+		if (plan := self.__keys.get(key, None)) is None:
+			plan = self.__keys[key] = KeyPlan(self.schema, key)
+		return plan
+
+	def shape(self, data: dict) -> tuple[str, bool]:
+		"""The time key of a record and whether it contains any source keys"""
+		keys = frozenset(data)
+		if (shape := self.__shapes.get(keys, None)) is None:
+			sourceKeys = self.schema.sourceKeys
+			timeKey = self.schema['timestamp']['sourceKey'] if 'timestamp' in self.schema else 'timestamp'
+			if isinstance(timeKey, (list, tuple, set, frozenset)):
+				timeKey = next((key for key in timeKey if key in keys), None)
+			if timeKey is None or timeKey not in keys:
+				timeKey = (get_close_matches('timestamp', list(keys), n=1, cutoff=0.5) or ['timestamp'])[0]
+			shape = self.__shapes[keys] = (timeKey, any(key in sourceKeys for key in keys))
+		return shape
+
+	def validator(self, key: Hashable) -> Optional[UnitMetaData]:
+		try:
+			return self.__validators[key]
+		except KeyError:
+			schema = self.schema
+			validator = None
+			if key in schema and (unitMetaData := schema.getExact(key)) and unitMetaData.hasValidation:
+				validator = unitMetaData
+			self.__validators[key] = validator
+			return validator
+
+	def map(self, datagram: LevityDatagram, data: dict) -> dict:
+		return self.__parse(datagram, data, (), True)
+
+	def __parse(self, datagram: LevityDatagram, data: dict, path: tuple, mapKeys: bool) -> dict:
+		plan = self.plan
+		remaining = []
+
+		# Scalars first so the meta and source values are known to nested records and key variables
+		for key, value in data.items():
+			if isinstance(value, (str, int, float, bool)):
+				keyPlan = plan(key)
+				consumed = False
+				if keyPlan.source is not None:
+					datagram.sourceData[keyPlan.source] = value
+					consumed = True
+				if keyPlan.meta is not None:
+					if keyPlan.isTime and isinstance(value, str) and not _isDateString(value):
+						remaining.append((key, value))
+						continue
+					datagram.metaData[keyPlan.meta] = value
+					consumed = True
+				if consumed:
+					continue
+			remaining.append((key, value))
+
+		# The data map can depend on a meta value, e.g. the message type, so the paths are only known now
+		validPaths = tuple(datagram.validPaths)
+		result = {}
+		for key, value in remaining:
+			if isinstance(value, dict):
+				value = self.__parseRecord(datagram, key, value, path, validPaths)
+			elif isinstance(value, list):
+				value = self.__parseList(datagram, key, value, path)
+			if not mapKeys:
+				result[key] = value
+				continue
+			keyPlan = plan(key)
+			if keyPlan.ignored or value is None and not keyPlan.allowNull:
+				continue
+			key = keyPlan.key
+			if keyPlan.vars:
+				key = key.replaceVar(**{i: datagram.findVar(i) for i in keyPlan.vars})
+			result[key] = value
+
+		if not mapKeys:
+			return result
+		for key, dataKey in self.__dataKeys:
+			if dataKey in result:
+				result[key] = result[dataKey]
+		return result
+
+	def __parseRecord(self, datagram: LevityDatagram, key: Hashable, value: dict, path: tuple, validPaths: tuple):
+		itemPath = (*path, key)
+		storagePath = itemPath[0] if len(itemPath) == 1 else itemPath
+		timeKey, isRecord = self.shape(value)
+		if not isRecord or storagePath not in validPaths:
+			return self.__parse(datagram, value, (key,), False)
+		if isinstance(timestamps := value.get(timeKey, None), list):
+			expectedLen = len(timestamps)
+			if any(len(v) != expectedLen for v in value.values()):
+				raise InvalidData
+			if datagram.columnar:
+				return DatagramColumns(parent=datagram, data=value, path=itemPath, timeKey=timeKey)
+			keys = list(value.keys())
+			rows = []
+			for i in range(expectedLen):
+				subdatagram = Subdatagram(parent=datagram, data={k: value[k][i] for k in keys}, path=(*itemPath, i))
+				if len(subdatagram):
+					rows.append(subdatagram)
+			return rows
+		return Subdatagram(parent=datagram, data=value, path=key)
+
+	def columns(self, datagram: LevityDatagram, data: dict, timeKey: str) -> tuple[np.ndarray, Dict[CategoryItem, np.ndarray]]:
+		"""Maps the keys of a record of parallel arrays and converts each array into a typed column"""
+		timestamps = _epochColumn(data[timeKey], _payloadTimezone(datagram))
+		columns = {}
+		for key, values in data.items():
+			if key == timeKey:
+				continue
+			keyPlan = self.plan(key)
+			if keyPlan.ignored:
+				continue
+			column = _typedColumn(values)
+			if column.dtype == np.float64 and not keyPlan.allowNull and np.isnan(column).all():
+				continue
+			key = keyPlan.key
+			if keyPlan.vars:
+				key = key.replaceVar(**{i: datagram.findVar(i) for i in keyPlan.vars})
+			columns[key] = column
+		for key, dataKey in self.__dataKeys:
+			if dataKey in columns:
+				columns[key] = columns[dataKey]
+		return timestamps, columns
+
+	def __parseList(self, datagram: LevityDatagram, key: Hashable, value: list, path: tuple) -> list:
+		sourceKeys = self.schema.sourceKeys
+		items = list(value)
+		for i, item in enumerate(items):
+			if isinstance(item, dict) and any(k in sourceKeys for k in item):
+				if all(v is None for v in item.values()):
+					continue
+				items[i] = Subdatagram(parent=datagram, data=item, path=(*path, key, i))
+		return items
+
+	def validate(self, datagram: LevityDatagram):
+		for key, value in list(datagram.items()):
+			match value:
+				case DatagramColumns():
+					continue
+				case [Subdatagram()]:
+					self.validate(value[0])
+				case Subdatagram():
+					self.validate(value)
+				case _ if (validator := self.validator(key)) is not None:
+					if not validator.validate(datagram, key, value):
+						datagram.pop(key)
+
+
+def _typedColumn(values: list) -> np.ndarray:
+	try:
+		return np.array(values, dtype=np.float64)
+	except (TypeError, ValueError):
+		column = np.empty(len(values), dtype=object)
+		column[:] = values
+		return column
+
+
+def _payloadTimezone(datagram: LevityDatagram) -> Optional[tzinfo]:
+	"""The timezone a payload reports its local times in, either by name or as a fixed UTC offset"""
+	while isinstance(datagram, Subdatagram):
+		datagram = datagram.parent
+	payload = getattr(datagram, 'raw', None)
+	if not isinstance(payload, Mapping):
+		return None
+	if isinstance(name := payload.get('timezone'), str):
+		try:
+			return ZoneInfo(name)
+		except (ZoneInfoNotFoundError, ValueError):
+			pass
+	if isinstance(offset := payload.get('utc_offset_seconds'), (int, float)):
+		return timezone(timedelta(seconds=offset))
+	return None
+
+
+def _configuredTimezone() -> tzinfo:
+	from LevityDash.lib.config import userConfig
+	try:
+		return ZoneInfo(str(userConfig.tz))
+	except (ZoneInfoNotFoundError, ValueError):
+		return LOCAL_TIMEZONE
+
+
+def _epochColumn(values: list, tz: tzinfo = None) -> np.ndarray:
+	"""
+	UTC epoch seconds of a time column of epochs or ISO8601 strings.  Strings without an offset are
+	wall times in tz, or the configured timezone, with the offset looked up for each hour of the column.
+	"""
+	column = _typedColumn(values)
+	if column.dtype == np.float64:
+		if len(column) and np.nanmax(np.abs(column)) > 0xffffffff:
+			column = column / 1000
+		return np.round(column).astype(np.int64)
+	tz = tz or _configuredTimezone()
+	try:
+		naive = column.astype('datetime64[s]').astype(np.int64)
+	except ValueError:
+		times = (DateParser.parse(value) for value in column)
+		return np.array([round((time if time.tzinfo else time.replace(tzinfo=tz)).timestamp()) for time in times], dtype=np.int64)
+	hours, inverse = np.unique(naive // 3600, return_inverse=True)
+	offsets = np.array([datetime.fromtimestamp(int(hour) * 3600, timezone.utc).replace(tzinfo=tz).utcoffset().total_seconds() for hour in hours], dtype=np.int64)
+	return naive - offsets[inverse]
+
+
+@lru_cache(maxsize=256)
+def _isDateString(value: str) -> bool:
+	try:
+		DateParser.parse(value)
+		return True
+	except DateParser.ParserError:
+		return False
+
+
 class Properties(dict):
 
 	def __init__(self, plugin: 'Plugin', source: dict):
@@ -624,6 +926,7 @@ class Schema(CategoryDict):
 		self.dataMaps = source.pop('dataMaps', {})
 		self.calculations = source.pop('calculations', {})
 		self.aliases = source.pop('aliases', {})
+		self.columnar = set(source.pop('columnar', []))
 		super(Schema, self).__init__(None, source, category)
 		if ignored is not None:
 			self._ignored.update(ignored)
@@ -648,7 +951,7 @@ class Schema(CategoryDict):
 		if result is None:
 			if str(key) in self.properties:
 				return self.properties[str(key)]
-			wildcardKeys = [k for k in self._source.keys() if k.hasWildcard and k == key]
+			wildcardKeys = [k for k in self.keyIndex.match(key) if k.hasWildcard]
 			if len(wildcardKeys) == 1:
 				result = self._source[wildcardKeys[0]]
 			elif not silent:
@@ -885,6 +1188,11 @@ class Schema(CategoryDict):
 	def nullAllowedKeys(self) -> Set[CategoryItem]:
 		return {key for key, metadata in self.flatDict.items() if metadata.get('allowNull', False)}
 
+	@cached_property
+	def mapper(self) -> DatagramMapper:
+		"""Schema lookups compiled for mapping datagrams, see DatagramMapper"""
+		return DatagramMapper(self)
+
 	def __parseDateTime(self, measurementData, unitDefinition, value):
 		if isinstance(value, datetime):
 			return value
@@ -0,0 +1,120 @@
+"""
+Compares compiled and interpreted datagram mapping.
+
+	python -m LevityDash.lib.plugins.schema.benchmark [repeat]
+"""
+
+from copy import deepcopy
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Dict, List
+
+from LevityDash.lib.plugins.schema import LevityDatagram, Schema
+
+__all__ = ['benchmark', 'openMeteoFixture', 'weatherFlowFixture']
+
+
+class _FixturePlugin:
+	"""Stand-in for the plugin that owns a schema"""
+
+	def __init__(self, name: str):
+		self.name = name
+
+	def __repr__(self):
+		return f'{self.name}Fixture'
+
+	def __contains__(self, key):
+		# The schema properties hold their plugin and are searched for source keys like any other entry
+		return False
+
+
+def _schema(name: str, source: dict) -> Schema:
+	return Schema(plugin=_FixturePlugin(name), source=deepcopy(source))
+
+
+def openMeteoFixture(days: int = 7) -> tuple[Schema, List[dict], dict]:
+	"""A forecast response with every requested hourly and daily parameter"""
+	from LevityDash.lib.plugins.builtin.OpenMeteo import allParams, dailyParams, schema
+
+	start = datetime.now().replace(minute=0, second=0, microsecond=0)
+	hours = [start + timedelta(hours=i) for i in range(days * 24)]
+	dates = sorted({hour.date() for hour in hours})
+	payload = {
+		'latitude':              0.0,
+		'longitude':             0.0,
+		'generationtime_ms':     1.0,
+		'utc_offset_seconds':    0,
+		'timezone':              'GMT',
+		'timezone_abbreviation': 'GMT',
+		'elevation':             0.0,
+		'hourly':                {
+			'time': [hour.strftime('%Y-%m-%dT%H:%M') for hour in hours],
+			**{param: [round(i * 0.1, 1) for i in range(len(hours))] for param in allParams}
+		},
+		'daily':                 {
+			'time': [date.isoformat() for date in dates],
+			**{param: [float(i) for i in range(len(dates))] for param in dailyParams if param not in ('sunrise', 'sunset')},
+			'sunrise': [f'{date.isoformat()}T06:00' for date in dates],
+			'sunset':  [f'{date.isoformat()}T18:00' for date in dates],
+		},
+	}
+	schema = _schema('OpenMeteo', schema)
+	return schema, [payload], {'dataMap': schema.dataMaps.get('forecast', {}), 'sourceData': {'endpoint': 'forecast'}}
+
+
+def weatherFlowFixture(messages: int = 60) -> tuple[Schema, List[dict], dict]:
+	"""A minute of UDP broadcasts, one observation followed by rapid wind messages"""
+	from LevityDash.lib.plugins.builtin.WeatherFlow import schema
+
+	start = int(datetime.now().timestamp())
+	payloads = [{
+		'serial_number':     'ST-00000512',
+		'type':              'obs_st',
+		'hub_sn':            'HB-00013030',
+		'obs':               [[start, 0.18, 0.22, 0.27, 144, 6, 1017.57, 22.37, 50.26, 328, 0.03, 3, 0.0, 0, 0, 0, 2.41, 1]],
+		'firmware_revision': 129
+	}]
+	payloads.extend({
+		'serial_number': 'ST-00000512',
+		'type':          'rapid_wind',
+		'hub_sn':        'HB-00013030',
+		'ob':            [start + i * 3, 2.3, 128]
+	} for i in range(1, messages))
+	return _schema('WeatherFlow', schema), payloads, {'sourceData': {'socket': None}}
+
+
+def benchmark(schema: Schema, payloads: List[dict], repeat: int = 20, **kwargs) -> Dict[str, float]:
+	"""
+	Seconds per payload for the interpreted and compiled mappings and whether both produced the same datagrams.
+	The interpreted mapping modifies its payload so every run is given its own copy.
+	"""
+	results = {}
+	datagrams = {}
+	for name, compiled in (('interpreted', False), ('compiled', True)):
+		copies = [deepcopy(payload) for _ in range(repeat) for payload in payloads]
+		start = perf_counter()
+		datagrams[name] = [
+			LevityDatagram(payload, schema=schema, compiled=compiled, **{**kwargs, 'sourceData': dict(kwargs.get('sourceData', {}))})
+			for payload in copies
+		]
+		results[name] = (perf_counter() - start) / len(copies)
+	results['speedup'] = results['interpreted'] / results['compiled'] if results['compiled'] else float('inf')
+	results['matches'] = all(
+		dict(a) == dict(b) and a.metaData == b.metaData
+		for a, b in zip(datagrams['interpreted'], datagrams['compiled'])
+	)
+	return results
+
+
+if __name__ == '__main__':
+	import sys
+
+	repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	for fixtureName, fixture in (('OpenMeteo', openMeteoFixture), ('WeatherFlow', weatherFlowFixture)):
+		fixtureSchema, fixturePayloads, fixtureKwargs = fixture()
+		result = benchmark(fixtureSchema, fixturePayloads, repeat, **fixtureKwargs)
+		print(
+			f'{fixtureName:<12} interpreted {result["interpreted"] * 1000:8.3f}ms  '
+			f'compiled {result["compiled"] * 1000:8.3f}ms  '
+			f'{result["speedup"]:5.2f}x  {"identical" if result["matches"] else "MISMATCH"}'
+		)
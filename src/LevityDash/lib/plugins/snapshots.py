@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+from json import dumps, loads
+from math import inf
+from os import replace
+from pathlib import Path
+from threading import RLock
+from time import monotonic
+from typing import Any, Dict, Optional, Tuple
+
+from LevityDash import LevityDashboard
+from LevityDash.lib.log import LevityPluginLog
+
+log = LevityPluginLog.getChild('Snapshots')
+
+__all__ = ['DatagramSnapshots']
+
+
+class DatagramSnapshots:
+	"""
+	The last payload of each endpoint of a plugin that was parsed into a valid datagram, stored as JSON
+	in the data directory.  Replaying them on launch populates the observations before any network request.
+
+	Writes of the same endpoint are limited to one per `minInterval` and snapshots older than `maxAge`
+	are not replayed.
+	"""
+
+	minInterval: timedelta = timedelta(minutes=1)
+	maxAge: timedelta = timedelta(days=2)
+
+	def __init__(self, name: str, path: Path | str = None):
+		if path is None:
+			path = Path(LevityDashboard.paths.data) / 'snapshots' / name
+		self.__path = Path(path)
+		self.__name = name
+		self.__lock = RLock()
+		self.__lastSave: Dict[str, float] = {}
+
+	def __repr__(self):
+		return f'DatagramSnapshots({self.__name})'
+
+	@property
+	def path(self) -> Path:
+		return self.__path
+
+	def __file(self, endpoint: str) -> Path:
+		return self.__path / f'{endpoint}.json'
+
+	def save(self, endpoint: str, payload: Any, force: bool = False) -> bool:
+		"""Writes the payload of endpoint, returns False when skipped or unable to write"""
+		now = monotonic()
+		with self.__lock:
+			if not force and now - self.__lastSave.get(endpoint, -inf) < self.minInterval.total_seconds():
+				return False
+			self.__lastSave[endpoint] = now
+			file = self.__file(endpoint)
+			try:
+				self.__path.mkdir(parents=True, exist_ok=True)
+				text = dumps({'saved': datetime.now(tz=timezone.utc).timestamp(), 'payload': payload}, default=str)
+				# Written beside the snapshot and swapped in so a crash never leaves a partial file
+				temporary = file.with_suffix('.tmp')
+				temporary.write_text(text)
+				replace(temporary, file)
+			except (OSError, TypeError, ValueError) as e:
+				log.error(f'Unable to save {self.__name} {endpoint} snapshot to {file}')
+				log.exception(e)
+				return False
+		log.verbose(f'Saved {self.__name} {endpoint} snapshot', verbosity=4)
+		return True
+
+	def load(self) -> Dict[str, Tuple[datetime, Any]]:
+		"""Saved payloads by endpoint name with the time they were saved, expired and unreadable snapshots are skipped"""
+		snapshots = {}
+		if not self.__path.exists():
+			return snapshots
+		oldest = datetime.now(tz=timezone.utc) - self.maxAge
+		with self.__lock:
+			for file in sorted(self.__path.glob('*.json')):
+				try:
+					snapshot = loads(file.read_text())
+					saved = datetime.fromtimestamp(snapshot['saved'], tz=timezone.utc)
+					payload = snapshot['payload']
+				except (OSError, ValueError, KeyError, TypeError) as e:
+					log.warning(f'Unable to read snapshot {file}: {e}')
+					continue
+				if saved < oldest:
+					log.verbose(f'Skipping {self.__name} {file.stem} snapshot from {saved:%c}', verbosity=2)
+					continue
+				snapshots[file.stem] = saved, payload
+		return snapshots
+
+	def clear(self, endpoint: Optional[str] = None):
+		with self.__lock:
+			files = [self.__file(endpoint)] if endpoint is not None else list(self.__path.glob('*.json'))
+			for file in files:
+				try:
+					file.unlink(missing_ok=True)
+				except OSError as e:
+					log.exception(e)
@@ -11,9 +11,10 @@ from functools import cached_property, partial
 from inspect import Parameter, signature as get_signature
 from pytz import timezone
 from random import random as randomFloat
+from threading import Lock
 from time import process_time
 from typing import (
-	Any, Callable, ClassVar, Coroutine, Dict, Hashable, Mapping, Optional, Set, Type, TYPE_CHECKING,
+	Any, Callable, ClassVar, Coroutine, Dict, Hashable, Iterable, Mapping, Optional, Set, Type, TYPE_CHECKING,
 	Union
 )
 
@@ -159,14 +160,114 @@ class SchemaProperty:
 		return self.get(source=source, *args, **kwargs)
 
 
+class PublishScheduler(QObject):
+	"""
+	Coalesces signal emits into a single flush per tick.
+
+	Signals that publish while a flush is already scheduled are only emitted once with their merged
+	pending values.  The tick runs on the GUI thread and is configured with Display.publishInterval
+	in milliseconds, an interval of 0 disables coalescing.  Channels listed in Display.immediateChannels,
+	comma separated keys that may contain wildcards, publish immediately.  Clock ticks are plain Qt
+	signals and never pass through the scheduler.
+	"""
+
+	__instance: ClassVar[Optional['PublishScheduler']] = None
+	__arm = Signal()
+
+	interval: int
+	immediateChannels: 'CategoryTrie'
+	stats: Dict[str, int]
+
+	def __init__(self, interval: int = 50, immediateChannels: Iterable['CategoryItem'] = ()):
+		from LevityDash.lib.plugins.categories import CategoryTrie
+		super(PublishScheduler, self).__init__()
+		self.interval = interval
+		self.immediateChannels = CategoryTrie(immediateChannels)
+		self.stats = {'scheduled': 0, 'coalesced': 0, 'flushes': 0, 'emits': 0}
+		self.__scheduled: Dict[int, 'MutableSignal'] = {}
+		self.__lock = Lock()
+		self.__armed = False
+		self.__timer: Optional[QTimer] = None
+		self.__arm.connect(self.__start)
+
+	def __repr__(self):
+		return f'PublishScheduler(interval={self.interval}ms, pending={len(self.__scheduled)})'
+
+	@classmethod
+	def instance(cls) -> Optional['PublishScheduler']:
+		if cls.__instance is None:
+			if (app := QApplication.instance()) is None:
+				return None
+			from LevityDash.lib.config import userConfig
+			interval = userConfig.getOrSet('Display', 'publishInterval', 50, userConfig.getint)
+			immediate = userConfig.getOrSet('Display', 'immediateChannels', '')
+			scheduler = cls(interval, [key.strip() for key in immediate.split(',') if key.strip()])
+			scheduler.moveToThread(app.thread())
+			cls.__instance = scheduler
+		return cls.__instance
+
+	@property
+	def enabled(self) -> bool:
+		return self.interval > 0
+
+	def publishesImmediately(self, keys: Iterable['CategoryItem']) -> bool:
+		"""True when any of keys is a channel that opted out of coalescing"""
+		if not len(self.immediateChannels):
+			return False
+		return any(next(self.immediateChannels.subscriptions(key), None) is not None for key in keys)
+
+	def schedule(self, signal: 'MutableSignal'):
+		with self.__lock:
+			self.stats['scheduled'] += 1
+			if id(signal) in self.__scheduled:
+				self.stats['coalesced'] += 1
+				signal.coalescedEmits += 1
+				return
+			self.__scheduled[id(signal)] = signal
+			if self.__armed:
+				return
+			self.__armed = True
+		self.__arm.emit()
+
+	@Slot()
+	def __start(self):
+		if self.__timer is None:
+			self.__timer = QTimer(self)
+			self.__timer.setSingleShot(True)
+			self.__timer.timeout.connect(self.flush)
+		self.__timer.start(self.interval)
+
+	@Slot()
+	def flush(self):
+		with self.__lock:
+			scheduled, self.__scheduled = self.__scheduled, {}
+			self.__armed = False
+		emits = 0
+		for signal in scheduled.values():
+			# Muted signals emit once they are unmuted
+			if signal.muted or not signal._hasPending:
+				continue
+			try:
+				signal._emit()
+				emits += 1
+			except RuntimeError:
+				pass
+		with self.__lock:
+			self.stats['flushes'] += 1
+			self.stats['emits'] += emits
+
+
 class MutableSignal(QObject):
 	_signal = Signal(object)
 	_pending: Set[Hashable]
 	_muteLevel: int
+	coalesce: bool = True
+	coalescedEmits: int
 
 	def __init__(self, *args, **kwargs):
 		self.__muteLevel = 0
 		self._pending = set()
+		self.coalescedEmits = 0
 		super().__init__(*args, **kwargs)
 
 	def __enter__(self):
@@ -196,6 +297,27 @@ class MutableSignal(QObject):
 		self._muteLevel += 1 if value else -1
 		self.blockSignals(bool(self._muteLevel))
 		if not self._muteLevel and self._pending:
+			self._schedule()
+
+	@property
+	def _hasPending(self) -> bool:
+		return bool(self._pending)
+
+	@property
+	def _pendingKeys(self) -> Iterable['CategoryItem']:
+		"""Channels the pending emit publishes, used to find channels that opted out of coalescing"""
+		return ()
+
+	def _schedule(self):
+		"""Emits on the next publish tick, or immediately when the signal or one of its channels opted out of coalescing"""
+		if (
+			self.coalesce
+			and (scheduler := PublishScheduler.instance()) is not None
+			and scheduler.enabled
+			and not scheduler.publishesImmediately(self._pendingKeys)
+		):
+			scheduler.schedule(self)
+		else:
 			self._emit()
 
 	@abstractmethod
@@ -238,7 +360,11 @@ class ChannelSignal(MutableSignal):
 		else:
 			self._pending.add(observations)
 		if not self.muted and self._pending:
-			self._emit()
+			self._schedule()
+
+	@property
+	def _pendingKeys(self) -> Iterable['CategoryItem']:
+		return self._key,
 
 	def _emit(self):
 		self._signal.emit(self._pending)
@@ -293,7 +419,7 @@ class Accumulator(MutableSignal):
 	def publish(self, *keys: 'CategoryItem'):
 		self._pending.update(keys)
 		if not self.muted:
-			self._emit()
+			self._schedule()
 
 	def publishSilently(self, *keys: 'CategoryItem'):
 		self._pendingSilent.update(keys)
@@ -301,7 +427,15 @@ class Accumulator(MutableSignal):
 	def publishKey(self, key: 'CategoryItem'):
 		self._pending.add(key)
 		if not self.muted:
-			self._emit()
+			self._schedule()
+
+	@property
+	def _hasPending(self) -> bool:
+		return bool(self._pending or self._pendingSilent)
+
+	@property
+	def _pendingKeys(self) -> Iterable['CategoryItem']:
+		return self._pending
 
 	def _emit(self):
 		if not self._pending and not self._pendingSilent:
@@ -400,6 +534,10 @@ class Publisher(MutableSignal):
 			return channel.disconnectSlot(slot)
 		return True
 
+	def hasSubscribers(self, channel: 'CategoryItem') -> bool:
+		channel = self.__channels.get(channel, None)
+		return channel is not None and channel.hasConnections
+
 	def __addChannel(self, channel: 'CategoryItem') -> ChannelSignal:
 		self.__channels[channel] = ChannelSignal(self.source, channel)
 		return self.__channels[channel]
@@ -627,7 +765,7 @@ class ScheduledEvent(object):
 
 
 __all__ = ['unitDict', 'Accumulator', 'ChannelSignal', 'SchemaProperty', 'MutableSignal', 'ScheduledEvent',
-					 'Publisher']
+					 'Publisher', 'PublishScheduler']
 
 
 @dataclass(frozen=True, slots=True)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass, field
+from functools import cached_property
 
 from enum import Enum
 
@@ -7,10 +8,11 @@ from rich import repr
 
 from LevityDash.lib.config import PluginConfig
 from LevityDash.lib.plugins import Plugin
+from LevityDash.lib.plugins.snapshots import DatagramSnapshots
 from datetime import timedelta
 from typing import Any, ClassVar, Dict, Optional, Union
 
-__all__ = ["AuthType", "Auth", "URLs", "Endpoint", "Web", "REST"]
+__all__ = ["AuthType", "Auth", "URLs", "Endpoint", "Web", "REST", "RefreshSchedule", "RefreshScheduler", "ResponseCache", "SessionPool", "SessionStats"]
 
 
 @repr.auto
@@ -382,9 +384,54 @@ class Web(Plugin, prototype=True):
 
 	def __init__(self, *args, **kwargs):
 		super().__init__()
+		self.__staleEndpoints = set()
 
 	def normalizeData(self, rawData):
 		return rawData
 
-
+	@property
+	def stale(self) -> bool:
+		"""True while any of the plugin's data was replayed from a snapshot and has not been refreshed"""
+		return bool(self.__staleEndpoints)
+
+	def markStale(self, endpoint: str):
+		self.__staleEndpoints.add(endpoint)
+
+	def markFresh(self, endpoint: str):
+		if endpoint in self.__staleEndpoints:
+			self.__staleEndpoints.discard(endpoint)
+			self.pluginLog.verbose(f'{self.name}: {endpoint} replaced its snapshot with fresh data', verbosity=2)
+
+	@cached_property
+	def snapshots(self) -> Optional[DatagramSnapshots]:
+		"""Last good payload of each endpoint used to warm start the plugin, None when disabled in the plugin's config"""
+		config = self.config
+		if config is not None and not config.getOrSet(config.default_section, 'warmStart', True, config.getboolean):
+			return None
+		return DatagramSnapshots(self.name)
+
+	@cached_property
+	def sessionPool(self) -> 'SessionPool':
+		"""Pooled HTTP session shared by every request of the plugin"""
+		config = self.config
+		limitPerHost = config.getOrSet(config.default_section, 'connectionsPerHost', 4, config.getint) if config is not None else None
+		return SessionPool(self, limitPerHost=limitPerHost)
+
+	@cached_property
+	def responseCache(self) -> Optional['ResponseCache']:
+		"""Validators of previous responses used for conditional requests, None when disabled in the plugin's config"""
+		config = self.config
+		if config is not None and not config.getOrSet(config.default_section, 'cacheResponses', True, config.getboolean):
+			return None
+		return ResponseCache(self.name)
+
+	async def asyncStop(self):
+		await self.sessionPool.close()
+		if (cache := self.__dict__.get('responseCache', None)) is not None:
+			cache.close()
+
+
+from .cache import *
+from .session import *
+from .scheduler import *
 from .rest import *
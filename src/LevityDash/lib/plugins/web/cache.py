@@ -0,0 +1,191 @@
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from pathlib import Path
+from threading import RLock
+from typing import Any, Dict, Mapping, Optional, Set
+
+from LevityDash import LevityDashboard
+from LevityDash.lib.log import LevityPluginLog
+
+log = LevityPluginLog.getChild('ResponseCache')
+
+__all__ = ['CachedResponse', 'ResponseCache']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+	key TEXT PRIMARY KEY NOT NULL,
+	url TEXT NOT NULL,
+	etag TEXT,
+	lastModified TEXT,
+	digest TEXT NOT NULL,
+	fetched REAL NOT NULL,
+	expires REAL
+) WITHOUT ROWID;
+"""
+
+
+def _now() -> float:
+	return datetime.now(tz=timezone.utc).timestamp()
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+	"""Validators and the payload hash of the last response received for a request"""
+	url: str
+	etag: Optional[str] = None
+	lastModified: Optional[str] = None
+	digest: str = ''
+	fetched: float = 0.0
+	expires: Optional[float] = None
+
+	@property
+	def fresh(self) -> bool:
+		"""True while the provider's Cache-Control or Expires header says the response can be reused without asking"""
+		return self.expires is not None and _now() < self.expires
+
+	@property
+	def conditionalHeaders(self) -> Dict[str, str]:
+		headers = {}
+		if self.etag:
+			headers['If-None-Match'] = self.etag
+		if self.lastModified:
+			headers['If-Modified-Since'] = self.lastModified
+		return headers
+
+
+class ResponseCache:
+	"""
+	On-disk cache of HTTP response validators for REST endpoints, keyed by URL and parameters.
+
+	Only the ETag, Last-Modified, expiry and a hash of the payload are kept.  The REST plugin uses them to
+	send conditional requests and to skip parsing when the provider returns 304 or an identical payload.
+	Parameters are hashed into the key so credentials passed as parameters are never written to disk.
+	Validators persisted by a previous launch describe a payload that is not in memory yet, so they are only
+	returned once the key has been confirmed as ingested in the current session.
+	"""
+
+	retention: timedelta = timedelta(days=7)
+
+	def __init__(self, name: str, path: Path | str = None):
+		if path is None:
+			path = Path(LevityDashboard.paths.cache) / 'responses' / f'{name}.sqlite'
+		self.__path = Path(path)
+		self.__name = name
+		self.__lock = RLock()
+		self.__connection: Optional[sqlite3.Connection] = None
+		self.__confirmed: Set[str] = set()
+		self.hits = 0
+		self.misses = 0
+
+	def __repr__(self):
+		return f'ResponseCache({self.__name}, hits={self.hits}, misses={self.misses})'
+
+	@property
+	def path(self) -> Path:
+		return self.__path
+
+	@property
+	def connection(self) -> sqlite3.Connection:
+		if self.__connection is None:
+			self.__path.parent.mkdir(parents=True, exist_ok=True)
+			connection = sqlite3.connect(self.__path, check_same_thread=False)
+			connection.execute('PRAGMA journal_mode=WAL')
+			connection.executescript(_SCHEMA)
+			with connection:
+				connection.execute('DELETE FROM responses WHERE fetched < ?', (_now() - self.retention.total_seconds(),))
+			self.__connection = connection
+			log.verbose(f'Opened response cache {self.__path}', verbosity=2)
+		return self.__connection
+
+	@staticmethod
+	def key(url: str, params: Mapping[str, Any] = None) -> str:
+		params = '&'.join(f'{k}={",".join(map(str, v)) if isinstance(v, (list, tuple)) else v}' for k, v in sorted((params or {}).items()))
+		return sha256(f'{url}?{params}'.encode()).hexdigest()
+
+	@staticmethod
+	def digest(body: bytes) -> str:
+		return sha256(body).hexdigest()
+
+	def confirm(self, key: str):
+		"""Marks the payload of key as ingested in this session so its validators can be sent"""
+		self.__confirmed.add(key)
+
+	def get(self, key: str) -> Optional[CachedResponse]:
+		if key not in self.__confirmed:
+			return None
+		with self.__lock:
+			try:
+				row = self.connection.execute(
+					'SELECT url, etag, lastModified, digest, fetched, expires FROM responses WHERE key = ?', (key,)
+				).fetchone()
+			except sqlite3.Error as e:
+				log.exception(e)
+				return None
+		return CachedResponse(*row) if row is not None else None
+
+	def store(self, key: str, url: str, headers: Mapping[str, str], digest: str) -> CachedResponse:
+		"""Records the validators of a response, headers are the response headers"""
+		entry = CachedResponse(url, headers.get('ETag', None), headers.get('Last-Modified', None), digest, _now(), self.expiry(headers))
+		self.misses += 1
+		with self.__lock:
+			try:
+				with self.connection as connection:
+					connection.execute(
+						'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)',
+						(key, entry.url, entry.etag, entry.lastModified, entry.digest, entry.fetched, entry.expires)
+					)
+			except sqlite3.Error as e:
+				log.error(f'Unable to write to response cache {self.__path}')
+				log.exception(e)
+		return entry
+
+	def refresh(self, key: str, entry: CachedResponse, headers: Mapping[str, str]) -> CachedResponse:
+		"""Records a response that did not change the payload, validators sent with it replace the stored ones"""
+		etag = headers.get('ETag', None) or entry.etag
+		lastModified = headers.get('Last-Modified', None) or entry.lastModified
+		entry = CachedResponse(entry.url, etag, lastModified, entry.digest, _now(), self.expiry(headers))
+		self.hits += 1
+		with self.__lock:
+			try:
+				with self.connection as connection:
+					connection.execute(
+						'UPDATE responses SET etag = ?, lastModified = ?, fetched = ?, expires = ? WHERE key = ?',
+						(entry.etag, entry.lastModified, entry.fetched, entry.expires, key)
+					)
+			except sqlite3.Error as e:
+				log.exception(e)
+		return entry
+
+	def forget(self, key: str):
+		self.__confirmed.discard(key)
+		with self.__lock:
+			try:
+				with self.connection as connection:
+					connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+			except sqlite3.Error as e:
+				log.exception(e)
+
+	@staticmethod
+	def expiry(headers: Mapping[str, str]) -> Optional[float]:
+		cacheControl = headers.get('Cache-Control', '') or ''
+		directives = {i.strip().split('=')[0].lower(): i.strip().partition('=')[2] for i in cacheControl.split(',') if i.strip()}
+		if 'no-store' in directives or 'no-cache' in directives:
+			return None
+		if (maxAge := directives.get('max-age', '')).isdigit():
+			age = headers.get('Age', '') or ''
+			return _now() + int(maxAge) - (int(age) if age.isdigit() else 0)
+		if expires := headers.get('Expires', None):
+			try:
+				return parsedate_to_datetime(expires).timestamp()
+			except (TypeError, ValueError):
+				return None
+		return None
+
+	def close(self):
+		with self.__lock:
+			if self.__connection is not None:
+				self.__connection.close()
+				self.__connection = None
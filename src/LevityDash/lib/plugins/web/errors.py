@@ -5,7 +5,9 @@ class APIError(Exception):
 
 
 class RateLimitExceeded(APIError):
-	pass
+	def __init__(self, *args, retryAfter: float = None, **kwargs):
+		self.retryAfter = retryAfter
+		super(RateLimitExceeded, self).__init__(*args, **kwargs)
 
 
 class RequestTimeout(APIError, TimeoutError):
@@ -30,3 +32,12 @@ class Forbidden(APIError):
 
 class TooManyRequests(APIError):
 	pass
+
+
+class NotModified(Exception):
+	"""The endpoint returned the same payload as the last request, there is nothing to ingest"""
+
+	def __init__(self, url: str = None, reason: str = 'not modified'):
+		self.url = url
+		self.reason = reason
+		super(NotModified, self).__init__(f'{url}: {reason}')
@@ -1,81 +1,217 @@
 import errno
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from functools import cached_property
+from json import loads
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
 
-import aiohttp
 from aiohttp import ClientOSError
 from rich.pretty import pretty_repr
 
 from LevityDash.lib.plugins.schema import LevityDatagram
 from LevityDash.lib.plugins.web import Endpoint, Web
-from LevityDash.lib.plugins.web.errors import APIError, InvalidCredentials, RateLimitExceeded, RequestTimeout
+from LevityDash.lib.plugins.web.errors import APIError, InvalidCredentials, NotModified, RateLimitExceeded, RequestTimeout
+from LevityDash.lib.plugins.web.scheduler import RefreshSchedule, RefreshScheduler
 
 __all__ = ["REST"]
 
 from LevityDash.lib.plugins.errors import InvalidData
 
 
+def _httpDate(value: Optional[str]) -> Optional[datetime]:
+	if not value:
+		return None
+	try:
+		return parsedate_to_datetime(value)
+	except (TypeError, ValueError):
+		return None
+
+
 class REST(Web, prototype=True):
 
-	async def __getData(self, url: str = None, params: dict = None, headers=None) -> dict | APIError | TimeoutError:
-		async with aiohttp.ClientSession() as session:
-			async with session.get(url, params=params, headers=headers) as response:
-				if response.status == 200:
-					data = await response.json()
-					self.pluginLog.verbose(pretty_repr(data, indent_size=2, max_width=120, max_depth=5, max_length=10, max_string=600), verbosity=5)
-					return await response.json()
-				elif response.status == 429:
-					self.pluginLog.error('Rate limit exceeded', response.content)
-					raise RateLimitExceeded
-				elif response.status == 401:
-					self.pluginLog.error('Invalid credentials', response.content)
-					raise InvalidCredentials
-				elif response.status == 404:
-					self.pluginLog.error(f'404: Invalid URL: {url}')
+	async def __getData(self, url: str = None, params: dict = None, headers=None, cacheKey: str = None) -> Tuple[dict, Optional[datetime]]:
+		"""The decoded payload and the time the provider says it was last modified"""
+		cache = self.responseCache if cacheKey is not None else None
+		cached = None
+		if cache is not None and (cached := cache.get(cacheKey)) is not None:
+			if cached.fresh:
+				cache.hits += 1
+				raise NotModified(url, 'cached response has not expired')
+			headers = {**(headers or {}), **cached.conditionalHeaders}
+
+		async with self.sessionPool.session.get(url, params=params, headers=headers) as response:
+			if response.status == 200:
+				body = await response.read()
+				if cache is not None:
+					digest = cache.digest(body)
+					if cached is not None and cached.digest == digest:
+						cache.refresh(cacheKey, cached, response.headers)
+						raise NotModified(url, 'payload is unchanged')
+					cache.store(cacheKey, url, response.headers, digest)
+				data = loads(body)
+				self.pluginLog.verbose(pretty_repr(data, indent_size=2, max_width=120, max_depth=5, max_length=10, max_string=600), verbosity=5)
+				return data, _httpDate(response.headers.get('Last-Modified', None))
+			elif response.status == 304 and cached is not None:
+				cache.refresh(cacheKey, cached, response.headers)
+				raise NotModified(url)
+			elif response.status == 429:
+				self.pluginLog.error('Rate limit exceeded', response.content)
+				retryAfter = response.headers.get('Retry-After', '')
+				if retryAfter.isdigit():
+					retryAfter = float(retryAfter)
+				elif (retryAt := _httpDate(retryAfter)) is not None:
+					retryAfter = (retryAt - datetime.now(tz=timezone.utc)).total_seconds()
 				else:
-					error = await response.text()
-					reason = await response.reason()
-					self.pluginLog.error('API Error', reason, error)
-					raise APIError(response)
+					retryAfter = None
+				raise RateLimitExceeded(url, retryAfter=retryAfter)
+			elif response.status == 401:
+				self.pluginLog.error('Invalid credentials', response.content)
+				raise InvalidCredentials
+			elif response.status == 404:
+				self.pluginLog.error(f'404: Invalid URL: {url}')
+				raise APIError(f'404: Invalid URL: {url}')
+			else:
+				error = await response.text()
+				self.pluginLog.error('API Error', response.reason, error)
+				raise APIError(response)
 
-	async def getData(self, endpoint: Endpoint, **kwargs) -> LevityDatagram:
+	def buildDatagram(self, endpoint: Endpoint, data: dict, **sourceData) -> LevityDatagram:
+		return LevityDatagram(
+			self.normalizeData(data),
+			schema=self.schema,
+			sourceData={'endpoint': endpoint, **sourceData},
+			dataMap=self.schema.dataMaps.get(endpoint.name, {}),
+			columnar=endpoint.name in self.schema.columnar
+		)
+
+	@staticmethod
+	def requestArguments(endpoint: Endpoint | str, **kwargs) -> Tuple[str, dict, dict]:
+		"""The url, parameters and headers of a request to endpoint, the url, params and headers in kwargs override the endpoint's"""
 		if isinstance(endpoint, str):
-			url = kwargs.get('url', endpoint)
-			params = kwargs.get('params', {})
-			headers = kwargs.get('headers', {})
+			return kwargs.get('url', endpoint), {**kwargs.get('params', {})}, {**kwargs.get('headers', {})}
+		url = kwargs.get('url', endpoint.url)
+		params = {**endpoint.params, **kwargs.get('params', {})}
+		headers = {**(endpoint.headers or {}), **kwargs.get('headers', {})}
+		return url, params, headers
+
+	def responseCacheKey(self, endpoint: Endpoint | str, **kwargs) -> Optional[str]:
+		"""Key of the cached response to a request, the same for a request and the replay of its snapshot"""
+		if (cache := self.responseCache) is None:
+			return None
+		url, params, _ = self.requestArguments(endpoint, **kwargs)
+		return cache.key(url, params)
 
-		else:
-			url = kwargs.get('url', endpoint.url)
-			params = endpoint.params
-			params.update(kwargs.get('params', {}))
-			headers = endpoint.headers
-			headers.update(kwargs.get('headers', {}))
+	async def getData(self, endpoint: Endpoint, **kwargs) -> LevityDatagram:
+		url, params, headers = self.requestArguments(endpoint, **kwargs)
+		cacheKey = self.responseCacheKey(endpoint, **kwargs)
 
+		# Only the endpoint's regular request drives its refresh schedule
+		schedule = self.refreshSchedules.get(getattr(endpoint, 'name', None), None) if not kwargs else None
 		try:
-			data = await self.__getData(url, params, headers)
-			datagram = LevityDatagram(
-				self.normalizeData(data),
-				schema=self.schema,
-				sourceData={'endpoint': endpoint},
-				dataMap=self.schema.dataMaps.get(endpoint.name, {})
-			)
+			data, published = await self.__getData(url, params, headers, cacheKey)
+			datagram = self.buildDatagram(endpoint, data)
 
 			if not len(datagram):
 				raise InvalidData(f'{self.name}\'s data {endpoint.name} request returned invalid data', endpoint, datagram)
 			self.pluginLog.verbose(f'{self.name}\'s {endpoint.name} request was successful', verbosity=0)
 			self.pluginLog.verbose(f'and received parsed data: {datagram}', verbosity=5)
+			if cacheKey is not None:
+				self.responseCache.confirm(cacheKey)
+			self.markFresh(endpoint.name)
+			# Requests for a custom range are not what the endpoint normally provides and are not replayed
+			if (snapshots := self.snapshots) is not None and not kwargs:
+				snapshots.save(endpoint.name, data)
+			if schedule is not None:
+				schedule.succeeded(changed=True, published=published)
 			return datagram
+		except NotModified as e:
+			self.markFresh(endpoint.name)
+			if schedule is not None:
+				schedule.succeeded(changed=False)
+			self.pluginLog.verbose(f'{self.name}\'s {endpoint.name} request skipped, {e.reason}', verbosity=2)
+			raise
 		except ClientOSError as e:
 			if e.errno == errno.ETIMEDOUT:
 				self.pluginLog.error(f'{self.name}: {endpoint.name} request timed out for {url}')
 				self.pluginLog.exception(e)
-				raise RequestTimeout(f'{self.name}: {endpoint.name} request timed out')
-			raise APIError(f'{self.name} {endpoint.name} request failed for {url}')
+				error = RequestTimeout(f'{self.name}: {endpoint.name} request timed out')
+			else:
+				error = APIError(f'{self.name} {endpoint.name} request failed for {url}')
+			if schedule is not None:
+				schedule.failed(error)
+			raise error
+		except APIError as e:
+			if schedule is not None:
+				schedule.failed(e)
+			raise
 		except Exception as e:
+			# A payload that could not be ingested must not be skipped as unchanged on the next request
+			if cacheKey is not None:
+				self.responseCache.forget(cacheKey)
 			self.pluginLog.error(f'{self.name} {endpoint.name} request failed for {url}')
 			self.pluginLog.exception(e)
-			raise APIError(f'{self.name} {endpoint.name} request failed for {url}')
+			error = APIError(f'{self.name} {endpoint.name} request failed for {url}')
+			if schedule is not None:
+				schedule.failed(error)
+			raise error
+
+	def replayDatagram(self, name: str, payload: Any) -> Optional[LevityDatagram]:
+		"""Rebuilds the datagram of a snapshot, plugins with snapshots that are not endpoints override this"""
+		if not isinstance(endpoint := getattr(self.urls, name, None), Endpoint):
+			return None
+		datagram = self.buildDatagram(endpoint, payload, replayed=True)
+		if (cacheKey := self.responseCacheKey(endpoint)) is not None:
+			self.responseCache.confirm(cacheKey)
+		return datagram
+
+	async def replaySnapshots(self) -> int:
+		"""
+		Feeds the last good payload of every endpoint into the observations before any request is made.
+		Replayed endpoints are marked stale until a request returns fresh data, returns the number replayed.
+		"""
+		if (snapshots := self.snapshots) is None:
+			return 0
+		replayed = 0
+		for name, (saved, payload) in snapshots.load().items():
+			try:
+				datagram = self.replayDatagram(name, payload)
+			except Exception as e:
+				self.pluginLog.warning(f'{self.name}: unable to replay {name} snapshot from {saved:%c}')
+				self.pluginLog.exception(e)
+				snapshots.clear(name)
+				continue
+			if datagram is None or not len(datagram):
+				continue
+			self.markStale(name)
+			for observation in self.observations:
+				if observation.dataName in datagram:
+					await observation.asyncUpdate(datagram)
+			replayed += 1
+			self.pluginLog.verbose(f'{self.name}: replayed {name} snapshot from {saved.astimezone():%c}', verbosity=1)
+		return replayed
+
+	@cached_property
+	def refreshSchedules(self) -> Dict[str, RefreshSchedule]:
+		return {}
+
+	def scheduleRefresh(self, endpoint: Endpoint, func: Callable[[], Awaitable[Any]], interval: timedelta = None) -> RefreshSchedule:
+		"""
+		Calls func every interval, or the endpoint's refreshInterval, adapting to the outcome of the endpoint's
+		requests.  The schedule has to be started.
+		"""
+		interval = interval or endpoint.refreshInterval or timedelta(minutes=15)
+		if (existing := self.refreshSchedules.get(endpoint.name, None)) is not None:
+			existing.stop()
+			RefreshScheduler.unregister(existing)
+		schedule = self.refreshSchedules[endpoint.name] = RefreshSchedule(self, endpoint.name, func, interval, loop=self.loop)
+		return schedule
+
+	async def asyncStop(self):
+		RefreshScheduler.stopAll(self)
+		await super(REST, self).asyncStop()
 
 	@property
 	def running(self):
 		from LevityDash.lib.plugins.utils import ScheduledEvent
 		tasks = ScheduledEvent.instances.get(self, [])
-		return any(task.running for task in tasks)
+		return any(task.running for task in tasks) or any(schedule.running for schedule in self.refreshSchedules.values())
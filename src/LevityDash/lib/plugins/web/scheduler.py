@@ -0,0 +1,364 @@
+from asyncio import AbstractEventLoop, TimerHandle
+from collections import deque
+from datetime import datetime, timedelta
+from enum import Enum
+from random import random as randomFloat
+from statistics import median
+from threading import RLock
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, ClassVar, Dict, List, Optional, TYPE_CHECKING
+
+from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.web.errors import RateLimitExceeded
+
+if TYPE_CHECKING:
+	from LevityDash.lib.plugins import Plugin
+
+log = LevityPluginLog.getChild('Scheduler')
+
+__all__ = ['BreakerState', 'CircuitBreaker', 'Backoff', 'CadenceEstimator', 'RefreshSchedule', 'RefreshScheduler']
+
+
+def _seconds(value: timedelta | float | int) -> float:
+	return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+def _wallTime(monotonicTime: float) -> datetime:
+	return datetime.now() + timedelta(seconds=monotonicTime - monotonic())
+
+
+class BreakerState(Enum):
+	Closed = 'closed'
+	Open = 'open'
+	HalfOpen = 'half-open'
+
+
+class CircuitBreaker:
+	"""
+	Stops requests to an endpoint that keeps failing.  A rate limit opens the breaker immediately,
+	other API errors open it after `threshold` consecutive failures.  Once the cooldown passes a single
+	trial request is allowed, the cooldown doubles every time the breaker trips without a success.
+	"""
+
+	threshold: int = 3
+	cooldown: timedelta = timedelta(minutes=5)
+	maxCooldown: timedelta = timedelta(hours=1)
+
+	def __init__(self, threshold: int = None, cooldown: timedelta = None):
+		self.threshold = threshold or self.threshold
+		self.cooldown = cooldown or self.cooldown
+		self.failures = 0
+		self.trips = 0
+		self.openUntil: Optional[float] = None
+
+	def __repr__(self):
+		return f'CircuitBreaker({self.state.value}, failures={self.failures}, trips={self.trips})'
+
+	@property
+	def state(self) -> BreakerState:
+		if self.openUntil is None:
+			return BreakerState.Closed
+		if monotonic() < self.openUntil:
+			return BreakerState.Open
+		return BreakerState.HalfOpen
+
+	@property
+	def remaining(self) -> float:
+		"""Seconds until the breaker allows a trial request"""
+		return max(self.openUntil - monotonic(), 0.0) if self.openUntil is not None else 0.0
+
+	def allow(self) -> bool:
+		return self.state is not BreakerState.Open
+
+	def success(self):
+		self.failures = 0
+		self.trips = 0
+		self.openUntil = None
+
+	def failure(self, error: BaseException = None, retryAfter: float = None):
+		self.failures += 1
+		if isinstance(error, RateLimitExceeded) or self.failures >= self.threshold or self.state is BreakerState.HalfOpen:
+			self.trip(retryAfter)
+
+	def trip(self, retryAfter: float = None):
+		self.trips += 1
+		cooldown = min(_seconds(self.cooldown) * 2 ** (self.trips - 1), _seconds(self.maxCooldown))
+		self.openUntil = monotonic() + max(cooldown, retryAfter or 0.0)
+
+
+class Backoff:
+	"""Exponential backoff with equal jitter, each delay is between half and all of `base * 2^attempt`"""
+
+	base: timedelta = timedelta(seconds=15)
+	cap: timedelta = timedelta(minutes=30)
+
+	def __init__(self, base: timedelta = None, cap: timedelta = None):
+		self.base = base or self.base
+		self.cap = cap or self.cap
+		self.attempt = 0
+
+	def next(self) -> float:
+		delay = min(_seconds(self.base) * 2 ** self.attempt, _seconds(self.cap))
+		self.attempt += 1
+		return delay / 2 + randomFloat() * delay / 2
+
+	def reset(self):
+		self.attempt = 0
+
+
+class CadenceEstimator:
+	"""
+	Learns how often a provider publishes new data from the times its responses changed.
+	The publish times are taken from Last-Modified when the provider sends it, otherwise the
+	time the changed response was received.
+	"""
+
+	samples: int = 8
+
+	def __init__(self, samples: int = None):
+		self.__published: deque[float] = deque(maxlen=(samples or self.samples) + 1)
+
+	def __repr__(self):
+		cadence = self.cadence
+		return f'CadenceEstimator({timedelta(seconds=round(cadence)) if cadence else "learning"})'
+
+	def record(self, published: datetime | float = None):
+		published = published.timestamp() if isinstance(published, datetime) else (published or time())
+		if self.__published and published <= self.__published[-1]:
+			return
+		self.__published.append(published)
+
+	@property
+	def lastPublished(self) -> Optional[float]:
+		return self.__published[-1] if self.__published else None
+
+	@property
+	def cadence(self) -> Optional[float]:
+		"""Median seconds between publishes once at least two intervals have been observed"""
+		if len(self.__published) < 3:
+			return None
+		published = list(self.__published)
+		return median(b - a for a, b in zip(published, published[1:]))
+
+	def nextPublish(self, after: float = None) -> Optional[float]:
+		"""Epoch time of the first expected publish after `after`"""
+		if (cadence := self.cadence) is None or not cadence:
+			return None
+		after = after if after is not None else time()
+		last = self.__published[-1]
+		if last > after:
+			return last
+		return last + cadence * (int((after - last) // cadence) + 1)
+
+
+class RefreshScheduler:
+	"""
+	Registry of every RefreshSchedule.  Schedules of all plugins are spaced so they do not fire at the
+	same moment and the registry provides the combined upcoming schedule for the debug view.
+	"""
+
+	spacing: ClassVar[float] = 2.0
+	__schedules: ClassVar[List['RefreshSchedule']] = []
+	__lock: ClassVar[RLock] = RLock()
+
+	@classmethod
+	def register(cls, schedule: 'RefreshSchedule'):
+		with cls.__lock:
+			cls.__schedules.append(schedule)
+
+	@classmethod
+	def unregister(cls, schedule: 'RefreshSchedule'):
+		with cls.__lock:
+			if schedule in cls.__schedules:
+				cls.__schedules.remove(schedule)
+
+	@classmethod
+	def schedules(cls, owner: 'Plugin' = None) -> List['RefreshSchedule']:
+		with cls.__lock:
+			return [i for i in cls.__schedules if owner is None or i.owner is owner]
+
+	@classmethod
+	def claim(cls, schedule: 'RefreshSchedule', when: float) -> float:
+		"""Moves a monotonic fire time later until it is at least `spacing` from every other schedule"""
+		with cls.__lock:
+			others = sorted(i.nextFire for i in cls.__schedules if i is not schedule and i.nextFire is not None)
+			for other in others:
+				if abs(other - when) < cls.spacing:
+					when = other + cls.spacing
+			return when
+
+	@classmethod
+	def stopAll(cls, owner: 'Plugin' = None):
+		for schedule in cls.schedules(owner):
+			schedule.stop()
+
+	@classmethod
+	def table(cls) -> List[Dict[str, Any]]:
+		"""The upcoming schedule, soonest first"""
+		rows = [schedule.describe() for schedule in cls.schedules()]
+		return sorted(rows, key=lambda row: row['next'] or datetime.max)
+
+
+class RefreshSchedule:
+	"""
+	Recurring request of a plugin endpoint that adapts to how its requests went.
+
+	The request function is expected to report its outcome through `succeeded` and `failed`, which
+	REST.getData does for scheduled endpoints.  Failures are retried with exponential backoff until the
+	circuit breaker opens, successes wait for the interval, or for the provider's next expected publish
+	once its cadence has been learned and is slower than the interval.  While the network is offline
+	requests are paused and the network is checked every `offlineRecheck`.
+	"""
+
+	offlineRecheck: timedelta = timedelta(seconds=30)
+	alignmentLag: timedelta = timedelta(seconds=45)
+	jitter: float = 0.05
+
+	def __init__(
+		self,
+		owner: 'Plugin',
+		name: str,
+		func: Callable[[], Awaitable[Any]],
+		interval: timedelta,
+		loop: AbstractEventLoop,
+		breaker: CircuitBreaker = None,
+		backoff: Backoff = None,
+	):
+		self.owner = owner
+		self.name = name
+		self.func = func
+		self.interval = interval
+		self.loop = loop
+		self.breaker = breaker or CircuitBreaker()
+		self.backoff = backoff or Backoff()
+		self.cadence = CadenceEstimator()
+		self.nextFire: Optional[float] = None
+		self.lastRun: Optional[datetime] = None
+		self.lastError: Optional[BaseException] = None
+		self.state = 'idle'
+		self.__timer: Optional[TimerHandle] = None
+		self.__outcome: Optional[bool] = None
+		self.__stopped = True
+		RefreshScheduler.register(self)
+
+	def __repr__(self):
+		return f'RefreshSchedule({getattr(self.owner, "name", self.owner)}.{self.name}, {self.state})'
+
+	@property
+	def running(self) -> bool:
+		return not self.__stopped
+
+	def start(self, immediately: bool = True) -> 'RefreshSchedule':
+		self.__stopped = False
+		self.__schedule(0.0 if immediately else self.__intervalDelay())
+		return self
+
+	def stop(self):
+		self.__stopped = True
+		self.state = 'stopped'
+		self.nextFire = None
+		if self.__timer is not None:
+			self.__timer.cancel()
+			self.__timer = None
+
+	# Section Outcomes
+
+	def succeeded(self, changed: bool = True, published: datetime | float = None):
+		self.__outcome = True
+		self.lastError = None
+		self.breaker.success()
+		self.backoff.reset()
+		if changed:
+			self.cadence.record(published)
+
+	def failed(self, error: BaseException = None):
+		self.__outcome = False
+		self.lastError = error
+		self.breaker.failure(error, getattr(error, 'retryAfter', None))
+		state = self.breaker.state
+		if state is BreakerState.Open:
+			log.warning(f'{self.owner.name}: {self.name} circuit opened for {timedelta(seconds=round(self.breaker.remaining))} after {error!r}')
+
+	# Section Timing
+
+	def __intervalDelay(self) -> float:
+		interval = _seconds(self.interval)
+		delay = interval * (1 + self.jitter * (randomFloat() * 2 - 1))
+		cadence = self.cadence.cadence
+		# Providers that publish slower than the interval are only polled shortly after they are expected to publish
+		if cadence is not None and cadence > interval and (nextPublish := self.cadence.nextPublish()) is not None:
+			delay = max(nextPublish + _seconds(self.alignmentLag) - time(), interval * self.jitter)
+		return delay
+
+	def __nextDelay(self) -> float:
+		if self.__outcome is False:
+			if not self.breaker.allow():
+				return self.breaker.remaining
+			return self.backoff.next()
+		return self.__intervalDelay()
+
+	def __schedule(self, delay: float):
+		if self.__stopped:
+			return
+		if self.__timer is not None:
+			self.__timer.cancel()
+		when = RefreshScheduler.claim(self, monotonic() + delay)
+		self.nextFire = when
+		self.__timer = self.loop.call_later(max(when - monotonic(), 0.0), self.__fire)
+		if delay >= 60:
+			log.verbose(f'{self.owner.name}: {self.name} refresh in {timedelta(seconds=round(delay))}', verbosity=2)
+
+	@property
+	def networkAvailable(self) -> bool:
+		manager = getattr(self.owner, 'manager', None)
+		try:
+			return manager is None or bool(manager.network_available)
+		except Exception:
+			return True
+
+	def __fire(self):
+		self.__timer = None
+		if self.__stopped:
+			return
+		if not self.networkAvailable:
+			if self.state != 'offline':
+				log.info(f'{self.owner.name}: network unavailable, pausing {self.name} refresh')
+			self.state = 'offline'
+			self.__schedule(_seconds(self.offlineRecheck))
+			return
+		if not self.breaker.allow():
+			self.state = 'circuit open'
+			self.__schedule(self.breaker.remaining)
+			return
+		self.state = 'running'
+		self.nextFire = None
+		self.loop.create_task(self.__run())
+
+	async def __run(self):
+		self.__outcome = None
+		self.lastRun = datetime.now()
+		try:
+			await self.func()
+		except Exception as e:
+			log.exception(e)
+			if self.__outcome is None:
+				self.failed(e)
+		self.state = {False: 'backing off', True: 'waiting'}.get(self.__outcome, 'waiting')
+		if self.__outcome is False and not self.breaker.allow():
+			self.state = 'circuit open'
+		self.__schedule(self.__nextDelay())
+
+	def describe(self) -> Dict[str, Any]:
+		cadence = self.cadence.cadence
+		return {
+			'plugin':   getattr(self.owner, 'name', str(self.owner)),
+			'endpoint': self.name,
+			'state':    self.state,
+			'next':     _wallTime(self.nextFire) if self.nextFire is not None else None,
+			'interval': self.interval,
+			'cadence':  timedelta(seconds=round(cadence)) if cadence else None,
+			'breaker':  self.breaker.state.value,
+			'failures': self.breaker.failures,
+			'lastRun':  self.lastRun,
+			'error':    repr(self.lastError) if self.lastError is not None else None,
+		}
@@ -0,0 +1,163 @@
+from dataclasses import dataclass
+from time import monotonic
+from types import SimpleNamespace
+from typing import Optional, Tuple, TYPE_CHECKING
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, TraceConfig
+
+from LevityDash.lib.log import LevityPluginLog
+
+if TYPE_CHECKING:
+	from LevityDash.lib.plugins import Plugin
+
+__all__ = ['SessionStats', 'SessionPool']
+
+
+@dataclass(frozen=True)
+class SessionStats:
+	"""Snapshot of the connection usage of a SessionPool, open and idle are None when aiohttp does not expose its pool"""
+	requests: int = 0
+	created: int = 0
+	reused: int = 0
+	handshakeSeconds: float = 0.0
+	open: Optional[int] = 0
+	idle: Optional[int] = 0
+
+	@property
+	def reuseRatio(self) -> float:
+		"""Fraction of requests that were sent over an already open connection"""
+		connections = self.created + self.reused
+		return self.reused / connections if connections else 0.0
+
+	@property
+	def averageHandshake(self) -> float:
+		"""Average seconds spent on DNS, TCP and TLS setup for each new connection"""
+		return self.handshakeSeconds / self.created if self.created else 0.0
+
+	def __str__(self):
+		pool = f'{self.open} open ({self.idle} idle), ' if self.open is not None else ''
+		return f'{self.requests} requests, {pool}{self.reuseRatio:.0%} reused, {self.averageHandshake * 1000:.1f}ms handshake'
+
+
+class SessionPool:
+	"""
+	A pooled ClientSession shared by every request of a plugin.
+
+	The session is created on first use from within the plugin's event loop and keeps connections
+	alive between requests, limits the connections to a single host and caches DNS lookups.
+	It must be closed from the same loop, usually in the plugin's asyncStop.
+	"""
+
+	limit: int = 20
+	limitPerHost: int = 4
+	keepAlive: float = 60.0
+	dnsCacheTTL: int = 300
+	timeout: ClientTimeout = ClientTimeout(total=60, sock_connect=15)
+
+	def __init__(
+		self,
+		owner: 'Plugin' = None,
+		limit: int = None,
+		limitPerHost: int = None,
+		keepAlive: float = None,
+		dnsCacheTTL: int = None,
+		timeout: ClientTimeout = None,
+	):
+		self.owner = owner
+		self.log = getattr(owner, 'pluginLog', LevityPluginLog).getChild(self.__class__.__name__)
+		self.limit = limit if limit is not None else self.limit
+		self.limitPerHost = limitPerHost if limitPerHost is not None else self.limitPerHost
+		self.keepAlive = keepAlive if keepAlive is not None else self.keepAlive
+		self.dnsCacheTTL = dnsCacheTTL if dnsCacheTTL is not None else self.dnsCacheTTL
+		self.timeout = timeout or self.timeout
+		self.__session: Optional[ClientSession] = None
+		self.__connector: Optional[TCPConnector] = None
+		self.__requests = 0
+		self.__created = 0
+		self.__reused = 0
+		self.__handshakeSeconds = 0.0
+
+	def __repr__(self):
+		return f'SessionPool({getattr(self.owner, "name", None)}, {self.stats})'
+
+	@property
+	def session(self) -> ClientSession:
+		"""The shared session, created or recreated when closed.  Only access from within the owner's event loop."""
+		session = self.__session
+		if session is None or session.closed:
+			self.__connector = TCPConnector(
+				limit=self.limit,
+				limit_per_host=self.limitPerHost,
+				keepalive_timeout=self.keepAlive,
+				use_dns_cache=True,
+				ttl_dns_cache=self.dnsCacheTTL,
+			)
+			session = self.__session = ClientSession(
+				connector=self.__connector,
+				timeout=self.timeout,
+				trace_configs=[self.__traceConfig()],
+			)
+			self.log.verbose(f'Opened session with {self.limitPerHost} connections per host', verbosity=3)
+		return session
+
+	@property
+	def closed(self) -> bool:
+		return self.__session is None or self.__session.closed
+
+	async def close(self):
+		session, self.__session = self.__session, None
+		if session is None or session.closed:
+			return
+		self.log.verbose(f'Closing session after {self.stats}', verbosity=1)
+		await session.close()
+		self.__connector = None
+
+	@property
+	def stats(self) -> SessionStats:
+		idle, acquired = self.__poolSizes()
+		return SessionStats(
+			requests=self.__requests,
+			created=self.__created,
+			reused=self.__reused,
+			handshakeSeconds=self.__handshakeSeconds,
+			open=idle + acquired if idle is not None else None,
+			idle=idle,
+		)
+
+	def __poolSizes(self) -> Tuple[Optional[int], Optional[int]]:
+		"""
+		Idle and acquired connections of the connector.  aiohttp has no public API for its pool sizes and the trace
+		callbacks do not report connections being released or closed, so its private attributes are read when
+		present and both are None when they are not.
+		"""
+		connector = self.__connector
+		if connector is None or connector.closed:
+			return 0, 0
+		conns, acquired = getattr(connector, '_conns', None), getattr(connector, '_acquired', None)
+		try:
+			return sum(len(i) for i in conns.values()), len(acquired)
+		except (AttributeError, TypeError):
+			return None, None
+
+	def __traceConfig(self) -> TraceConfig:
+		trace = TraceConfig()
+
+		async def requestStart(session: ClientSession, context: SimpleNamespace, params):
+			self.__requests += 1
+
+		async def connectionStart(session: ClientSession, context: SimpleNamespace, params):
+			context.connectStart = monotonic()
+
+		async def connectionEnd(session: ClientSession, context: SimpleNamespace, params):
+			self.__created += 1
+			if (start := getattr(context, 'connectStart', None)) is not None:
+				self.__handshakeSeconds += monotonic() - start
+
+		async def connectionReused(session: ClientSession, context: SimpleNamespace, params):
+			self.__reused += 1
+
+		trace.on_request_start.append(requestStart)
+		trace.on_connection_create_start.append(connectionStart)
+		trace.on_connection_create_end.append(connectionEnd)
+		trace.on_connection_reuseconn.append(connectionReused)
+		return trace
@@ -1,4 +1,6 @@
 import platform
+from collections import deque
+from datetime import timedelta
 from json import JSONDecodeError, loads
 
 import asyncio
@@ -7,7 +9,7 @@ from abc import ABC, abstractmethod
 
 from aiohttp import ClientSession
 from PySide2.QtCore import QObject, Signal
-from typing import Optional
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional
 
 from LevityDash.lib.plugins.web import Endpoint
 
@@ -21,6 +23,7 @@ class SocketMessageHandler(ABC):
 
 class LevityQtSocketMessageHandler(QObject):
 	signal = Signal(dict)
+	batchSignal = Signal(list)
 
 	def __init__(self, parent=None):
 		super().__init__(parent)
@@ -28,6 +31,9 @@ class LevityQtSocketMessageHandler(QObject):
 	def publish(self, message):
 		self.signal.emit(message)
 
+	def publishBatch(self, messages: List[dict]):
+		self.batchSignal.emit(messages)
+
 	def connectSlot(self, slot):
 		self.signal.connect(slot)
 
@@ -39,6 +45,17 @@ class LevityQtSocketMessageHandler(QObject):
 		except RuntimeError:
 			pass
 
+	def connectBatchSlot(self, slot):
+		self.batchSignal.connect(slot)
+
+	def disconnectBatchSlot(self, slot):
+		try:
+			self.batchSignal.disconnect(slot)
+		except TypeError:
+			pass
+		except RuntimeError:
+			pass
+
 
 # class SocketIO(QThread):
 # 	url: str
@@ -131,27 +148,89 @@ class LevityQtSocketMessageHandler(QObject):
 # 		self.socket.close()
 
 
+MessageRoute = Callable[[dict], Optional[dict]]
+
+
 class BaseSocketProtocol(asyncio.DatagramProtocol):
+	"""
+	Receives JSON datagrams and publishes them through the handler.
+
+	Without routes every datagram is published on its own.  Given a dispatch table of message types,
+	datagrams are routed by their type and collected in a ring buffer that is published as a single
+	batch once per flush window.  A route returns the message to buffer or None to filter it out, types
+	missing from the table are unrouted.  When the buffer fills before a flush the oldest messages are
+	dropped.
+	"""
+
 	api: 'REST'
 	handler: 'SockeMessageHandler'
 
-	def __init__(self, api: 'REST'):
+	flushWindow: timedelta = timedelta(milliseconds=250)
+	bufferSize: int = 256
+
+	def __init__(self, api: 'REST', routes: Mapping[str, Optional[MessageRoute]] = None, flushWindow: timedelta = None, bufferSize: int = None):
 		self._plugin = api
 		self.handler = LevityQtSocketMessageHandler()
 		self.log = api.pluginLog.getChild(self.__class__.__name__)
+		self.routes: Optional[Dict[str, Optional[MessageRoute]]] = dict(routes) if routes is not None else None
+		self.flushWindow = flushWindow or self.flushWindow
+		self.bufferSize = bufferSize or self.bufferSize
+		self.__buffer: Deque[dict] = deque(maxlen=self.bufferSize)
+		self.__flushTimer: Optional[asyncio.TimerHandle] = None
+		self.stats: Dict[str, int] = {'received': 0, 'invalid': 0, 'unrouted': 0, 'filtered': 0, 'dropped': 0, 'batches': 0}
+
+	@property
+	def batched(self) -> bool:
+		return self.routes is not None
 
 	def datagram_received(self, data, addr):
+		self.stats['received'] += 1
 		try:
-			message = loads(data.decode('utf-8'))
-			self.handler.publish(message)
-		except JSONDecodeError as e:
+			# json decodes the utf-8 bytes directly, skipping an intermediate str copy
+			message = loads(data)
+		except (JSONDecodeError, UnicodeDecodeError) as e:
+			self.stats['invalid'] += 1
 			self.log.error(f'Received invalid JSON from {addr}')
 			self.log.error(e)
+			return
+		if not self.batched:
+			self.handler.publish(message)
+			return
+		self.route(message)
+
+	def route(self, message: Any):
+		try:
+			route = self.routes[message['type']]
+		except (KeyError, TypeError):
+			self.stats['unrouted'] += 1
+			return
+		if route is not None and (message := route(message)) is None:
+			self.stats['filtered'] += 1
+			return
+		buffer = self.__buffer
+		if len(buffer) == buffer.maxlen:
+			self.stats['dropped'] += 1
+		buffer.append(message)
+		if self.__flushTimer is None:
+			self.__flushTimer = asyncio.get_event_loop().call_later(self.flushWindow.total_seconds(), self.flush)
+
+	def flush(self):
+		if self.__flushTimer is not None:
+			self.__flushTimer.cancel()
+			self.__flushTimer = None
+		if not self.__buffer:
+			return
+		messages = list(self.__buffer)
+		self.__buffer.clear()
+		self.stats['batches'] += 1
+		self.handler.publishBatch(messages)
+		self.log.verbose(f'Published {len(messages)} messages, {self.stats}', verbosity=5)
 
 	def connection_made(self, transport):
 		self.log.debug('Connection made')
 
 	def connection_lost(self, exc):
+		self.flush()
 		self.log.warning('Connection lost: %s', exc)
 
 	def error_received(self, exc):
@@ -170,6 +249,7 @@ class BaseSocketProtocol(asyncio.DatagramProtocol):
 		self.log.error('Not implemented')
 
 	def close(self):
+		self.flush()
 		self.log.info('Closing')
 
 	def abort(self):
@@ -217,12 +297,20 @@ class UDPSocket(Socket):
 	last: dict
 	port: int
 
-	def __init__(self, api: 'REST', address: Optional[str] = None, port: Optional[int] = None, *args, **kwargs):
+	def __init__(
+		self,
+		api: 'REST',
+		address: Optional[str] = None,
+		port: Optional[int] = None,
+		routes: Mapping[str, Optional[MessageRoute]] = None,
+		flushWindow: timedelta = None,
+		*args, **kwargs
+	):
 		super(UDPSocket, self).__init__(api=api, *args, **kwargs)
 		self._address = address
 		if port is not None:
 			self.port = port
-		self.protocol = BaseSocketProtocol(self.api)
+		self.protocol = BaseSocketProtocol(self.api, routes=routes, flushWindow=flushWindow)
 
 	@property
 	def handler(self):
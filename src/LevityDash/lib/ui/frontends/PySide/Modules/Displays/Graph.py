@@ -24,7 +24,7 @@ from datetime import datetime, timedelta
 from difflib import get_close_matches
 from enum import Enum
 from functools import cached_property, partial, reduce
-from itertools import zip_longest
+from itertools import takewhile, zip_longest
 from math import inf, prod, sqrt
 from rich.repr import auto
 from scipy.constants import golden
@@ -41,8 +41,9 @@ from uuid import uuid4
 from LevityDash import LevityDashboard
 from LevityDash.lib.plugins import Container, Plugin
 from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.columns import TimeSeriesColumns
 from LevityDash.lib.plugins.dispatcher import MultiSourceContainer
-from LevityDash.lib.plugins.observation import MeasurementTimeSeries, TimeAwareValue, TimeSeriesItem
+from LevityDash.lib.plugins.observation import HashSlice, MeasurementTimeSeries, TimeAwareValue, TimeSeriesItem
 from LevityDash.lib.plugins.plugin import AnySource, SomePlugin
 from LevityDash.lib.stateful import DefaultGroup, Stateful, StateProperty
 from LevityDash.lib.ui.Geometry import (
@@ -360,7 +361,7 @@ class GraphItemData(Stateful, tag=...):
 			self.normalizeData()
 
 	def __clearCache(self):
-		clearCacheAttr(self, 'data', 'list', 'smoothed', 'dataTransform')
+		clearCacheAttr(self, 'data', 'list', 'columns', 'smoothed', 'dataTransform')
 
 	def refresh(self):
 		if self.container is None:
@@ -922,17 +923,49 @@ class GraphItemData(Stateful, tag=...):
 		if self.useTestData:
 			return TestData.generate_random_rainstorm_rate()
 		end = self.graph.timeframe.end + timedelta(hours=1) if not self.graph.scrollable else None
-		if self.hasDataAvalible and len(sliced := self.timeseries[self.graph.timeframe.historicalStart:end]):
+		if not self.hasDataAvalible:
+			return []
+		# Ranges that have aged out of memory are drawn from the rollup tier matching the current zoom
+		timeseries = self.timeseries
+		if len(timeseries) == 0:
+			timeseries.update()
+		if not len(timeseries):
+			return []
+		key = HashSlice(self.graph.timeframe.historicalStart, end)
+		if len(sliced := timeseries.getSlice(key, secondsPerPixel=round(self.graph.secondsPerPixel) or None)):
 			return sliced
 		return []
 
+	@cached_property
+	def columns(self) -> TimeSeriesColumns:
+		if self.useTestData:
+			return TimeSeriesColumns.fromItems(self.list)
+		if not self.list:
+			return TimeSeriesColumns.empty()
+		first, last = self.list[0].timestamp, self.list[-1].timestamp
+		columns = self.timeseries.columns
+		if not len(columns):
+			return TimeSeriesColumns.fromItems(self.list)
+		# Values from before the in-memory columns come from the rollups or the archive and only exist as items
+		memoryStart = int(columns.timestamps[0])
+		if round(first.timestamp()) < memoryStart:
+			archived = list(takewhile(lambda item: round(item.timestamp.timestamp()) < memoryStart, self.list))
+			return TimeSeriesColumns.concat(TimeSeriesColumns.fromItems(archived), columns.span(first, last))
+		return columns.span(first, last)
+
 	@cached_property
 	def data(self) -> np.array:
-		# TODO: Add try/except for when the data is not sorted
-		arr = np.array([(i.timestamp.timestamp(), float(i.value)) for i in self.list])
+		# Views into the timeseries columns, only copied when rows need to be dropped
+		columns = self.columns
+		x, y = columns.timestamps, columns.values
+
+		if len(x) > 1 and not (np.diff(x) > 0).all():
+			x, unique = np.unique(x, return_index=True)
+			y = y[unique]
 
-		# remove duplicates x values
-		x, y = np.unique(arr, axis=0).T
+		if np.isnan(y).any():
+			valid = ~np.isnan(y)
+			x, y = x[valid], y[valid]
 
 		if len(x) == 1:
 			return x, y
@@ -947,7 +980,7 @@ class GraphItemData(Stateful, tag=...):
 
 			newPeriod = int(round(self.graph.secondsPerPixel * resolution))
 
-			x_interp = np.arange(arr[0][0], arr[-1][0], newPeriod)
+			x_interp = np.arange(x[0], x[-1], newPeriod)
 			interp_type = self._interpolation_type
 
 			match interp_type:
@@ -519,7 +519,11 @@ class Realtime(Panel, tag='realtime'):
 
 	@Slot(object)
 	def updateSlot(self, *args):
-		self.setOpacity(1)
+		# Values replayed from a plugin's snapshot are shown dimmed until the plugin receives fresh data
+		if getattr(self.currentSource, 'stale', False):
+			self.contentStaled()
+		else:
+			self.setOpacity(1)
 		self.display.refresh()
 		self.updateToolTip()
 		# loop.call_soon_threadsafe(self.adjustContentStaleTimer)
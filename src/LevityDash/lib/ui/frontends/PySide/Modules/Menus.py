@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from functools import cached_property, partial
 from os import environ
@@ -13,6 +14,7 @@ from rich.highlighter import RegexHighlighter
 from rich.panel import Panel as RichPanel
 from rich.pretty import Pretty
 from rich.syntax import Syntax
+from rich.table import Table
 from rich.theme import Theme
 
 from LevityDash import LevityDashboard
@@ -509,6 +511,7 @@ class CentralPanelContextMenu(BaseContextMenu):
 		self.saveLoadMenu()
 		self.addSeparator()
 		self.addAction('Fullscreen', self.fullsceen)
+		self.debugActions.addAction(self.addAction('Print Refresh Schedule', self.printRefreshSchedule))
 		self.addAction('Quit', self.app.quit)
 
 	def fullsceen(self):
@@ -519,7 +522,26 @@ class CentralPanelContextMenu(BaseContextMenu):
 			w.showFullScreen()
 
 	def updateItems(self):
-		pass
+		self.debugActions.setVisible(QApplication.queryKeyboardModifiers() & Qt.KeyboardModifier.AltModifier or debug)
+
+	def printRefreshSchedule(self):
+		from LevityDash.lib.plugins.web import RefreshScheduler
+
+		def cell(value) -> str:
+			if value is None:
+				return ''
+			if isinstance(value, datetime):
+				return f'{value:%I:%M:%S%p}'.lstrip('0')
+			return str(value)
+
+		table = Table(box=SIMPLE_HEAVY, title='Refresh Schedule')
+		columns = ('plugin', 'endpoint', 'state', 'next', 'interval', 'cadence', 'breaker', 'failures', 'lastRun', 'error')
+		for column in columns:
+			table.add_column(column)
+		for row in RefreshScheduler.table():
+			table.add_row(*(cell(row[column]) for column in columns))
+		console = Console(soft_wrap=True, force_terminal=True, width=get_terminal_size((100, 20)).columns - 5)
+		console.print(table)
 
 	def saveLoadMenu(self):
 		self.addAction('Load Panal', self.parent.loadPanel)
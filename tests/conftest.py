@@ -0,0 +1,39 @@
+import asyncio
+import os
+
+import pytest
+
+# LevityDash builds its Qt application on import, tests run without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Installs the datetime shim before any test module imports datetime, as the app does at startup
+import LevityDash  # noqa: E402, F401
+
+
+@pytest.fixture
+def loop():
+	previous = asyncio.get_event_loop_policy().get_event_loop()
+	loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(loop)
+	yield loop
+	loop.close()
+	asyncio.set_event_loop(previous)
+
+
+class Clock:
+	"""Monotonic clock that only moves when a test advances it"""
+
+	def __init__(self, now: float = 1000.0):
+		self.now = now
+
+	def __call__(self) -> float:
+		return self.now
+
+	def advance(self, seconds: float):
+		self.now += seconds
+
+
+@pytest.fixture
+def clock():
+	"""A Clock, modules override the fixture to patch it in as the monotonic of the module under test"""
+	return Clock()
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from time import time
+from types import SimpleNamespace
+
+import pytest
+
+from LevityDash.lib.plugins.archive import ObservationArchive
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.observation import ObservationLog
+from LevityDash.lib.plugins.schema import LevityDatagram
+from LevityDash.lib.plugins.schema.benchmark import openMeteoFixture
+
+TEMPERATURE = CategoryItem('environment.temperature.temperature')
+
+
+class SynchronousPool:
+
+	def run_threaded_process(self, func, *args, on_result=None, on_error=None, **kwargs):
+		result = func(*args)
+		if on_result is not None:
+			on_result(result)
+
+
+class Log(ObservationLog, published=False, recorded=False):
+	_period = timedelta(hours=1)
+
+
+@pytest.fixture
+def path(tmp_path):
+	return tmp_path / 'archive.sqlite'
+
+
+@pytest.fixture
+def now():
+	return int(time()) // 60 * 60
+
+
+def archive(path, **kwargs) -> ObservationArchive:
+	return ObservationArchive('test', path, **kwargs)
+
+
+def test_rows_are_buffered_until_flush(path, now):
+	first = archive(path)
+	first.batchSize = 10
+	first.write([ObservationArchive.toRow('a', now, 1.0)])
+	assert archive(path).query() == []
+	first.write(ObservationArchive.toRow('a', now + i, float(i)) for i in range(1, 10))
+	assert len(archive(path).query()) == 10
+	first.close()
+
+
+def test_flush_and_reopen_round_trip(path, now):
+	first = archive(path)
+	rows = [
+		ObservationArchive.toRow('a', now, 1.5),
+		ObservationArchive.toRow('a', now + 60, True),
+		ObservationArchive.toRow('b', now, 'rain'),
+		ObservationArchive.toRow('b', now + 60, None),
+	]
+	first.write(rows)
+	first.close()
+	second = archive(path)
+	assert second.records() == {now: {repr('a'): 1.5, repr('b'): 'rain'}, now + 60: {repr('a'): 1.0}}
+	assert second.query(start=now + 1) == [(repr('a'), now + 60, 1.0, None)]
+	second.close()
+
+
+def test_rows_with_the_same_key_and_time_are_replaced(path, now):
+	first = archive(path)
+	first.write([ObservationArchive.toRow('a', now, 1.0), ObservationArchive.toRow('a', now, 2.0)])
+	assert first.query() == [(repr('a'), now, 2.0, None)]
+	first.close()
+
+
+def test_prune_removes_rows_past_retention(path, now):
+	first = archive(path, retention=timedelta(days=1))
+	first.write([ObservationArchive.toRow('a', now - 2 * 86400, 1.0), ObservationArchive.toRow('a', now - 3600, 2.0)])
+	first.flush()
+	first.prune()
+	assert [row[1] for row in first.query()] == [now - 3600]
+	first.close()
+
+
+def test_flush_prunes_once_per_interval(path, now):
+	first = archive(path, retention=timedelta(days=1))
+	first.pruneInterval = timedelta(0)
+	first.write([ObservationArchive.toRow('a', now - 2 * 86400, 1.0)])
+	first.flush()
+	assert first.query() == []
+	first.pruneInterval = timedelta(hours=1)
+	first.write([ObservationArchive.toRow('a', now - 2 * 86400, 1.0)])
+	first.flush()
+	assert len(first.query()) == 1
+	first.close()
+
+
+@pytest.mark.parametrize('key', [
+	'environment.temperature.temperature',
+	'environment.wind.speed.gust',
+	'device.ST-00000512.battery',
+	'environment.soil.moisture.1-3cm',
+])
+def test_keys_round_trip_through_repr(path, now, key):
+	key = CategoryItem(key)
+	first = archive(path)
+	first.write([ObservationArchive.toRow(key, now, 1.0)])
+	(stored, *_), = first.query(keys=[key])
+	assert CategoryItem(stored) is key
+	first.close()
+
+
+def logFor(path) -> Log:
+	schema, _, _ = openMeteoFixture(days=1)
+	log = Log(SimpleNamespace(name='fixture', thread_pool=SynchronousPool(), schema=schema))
+	log.dataName = 'hourly'
+	log.archive = archive(path)
+	return log
+
+
+def test_log_restores_archived_observations(path):
+	schema, payloads, kwargs = openMeteoFixture(days=1)
+	first = logFor(path)
+	first.update(LevityDatagram(payloads[0], schema=schema, **kwargs))
+	first.close()
+	expected = {key.value: row[TEMPERATURE].rawValue for key, row in first.timeseries.items()}
+
+	second = logFor(path)
+	second.restore()
+	restored = {key.value: row[TEMPERATURE].rawValue for key, row in second.timeseries.items()}
+	assert restored == pytest.approx(expected)
+	assert len(restored) == 24
+	second.close()
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from PySide2.QtWidgets import QApplication
+
+from LevityDash.lib.plugins.builtin.WeatherFlow.capture import bench, readCapture, replay, ReplayReport, synthesize
+
+
+@pytest.fixture
+def capture(tmp_path):
+	path = tmp_path / 'capture.udp'
+	synthesize(path, stations=2, minutes=1)
+	return path
+
+
+def test_synthesized_capture_is_readable(capture):
+	packets = list(readCapture(capture))
+	offsets = [offset for offset, _ in packets]
+	assert offsets == sorted(offsets)
+	# Rapid wind every 3 seconds, one observation and device status each and hub status every 10 seconds
+	assert len(packets) == 2 * (20 + 1 + 1) + 6
+
+
+@pytest.mark.parametrize('window', [0.05, 0], ids=['batched', 'unbatched'])
+def test_bench_measures_latency_to_realtime_publish(loop, capture, window):
+	QApplication.instance() or QApplication([])
+	report = loop.run_until_complete(bench(capture, speed=0, window=window, drain=0.2))
+	assert report.measured
+	assert report.protocol['received'] == len(list(readCapture(capture)))
+	assert report.sent == report.received
+	assert report.dropped == 0
+	assert report.unmatched == 0
+	assert len(report.latencies) == report.received
+	assert 0 < report.publishes <= report.batches
+	assert 'latency to publish' in str(report)
+
+
+def test_route_drops_are_not_losses(loop, tmp_path):
+	path = tmp_path / 'capture.udp'
+	synthesize(path, stations=1, minutes=0.1)
+	with path.open('ab') as file:
+		from LevityDash.lib.plugins.builtin.WeatherFlow.capture import _RECORD
+		data = b'{"serial_number":"ST-00000001","type":"obs_st","obs":[]}'
+		file.write(_RECORD.pack(10.0, len(data)) + data)
+	report = loop.run_until_complete(bench(path, speed=0, window=0.05, drain=0.2))
+	assert report.protocol['filtered'] == 1
+	assert report.dropped == 0
+
+
+def test_replay_reports_what_was_sent(loop, capture):
+	report = loop.run_until_complete(replay(capture, port=9, speed=0))
+	assert isinstance(report, ReplayReport)
+	assert report.sent == len(list(readCapture(capture)))
+	assert not report.measured
+	assert str(report).startswith(f'sent {report.sent} packets')
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from LevityDash.lib.config import userConfig
+from LevityDash.lib.plugins.categories import ArrayConverter, CategoryDict, CategoryItem, CategoryTrie, UnitMetaData, VersionedDict
+from LevityDash.lib.plugins.utils import unitDict
+
+KEYS = [
+	'environment.temperature.temperature',
+	'environment.temperature.dewpoint',
+	'environment.wind.speed.speed',
+	'environment.wind.speed.gust',
+	'indoor.temperature.temperature',
+	'indoor.*.temperature',
+]
+
+RAW = np.array([-40.0, -3.5, 0.0, 12.25, 37.0, 101.3])
+
+
+@pytest.fixture
+def limit(monkeypatch):
+	monkeypatch.setattr(CategoryItem, 'internLimit', len(CategoryItem.__existing__) + 4)
+	return CategoryItem.internLimit
+
+
+def test_items_are_interned():
+	item = CategoryItem('environment.temperature.temperature')
+	assert CategoryItem('environment.temperature.temperature') is item
+	assert CategoryItem('environment', 'temperature', 'temperature') is item
+	assert CategoryItem(item) is item
+
+
+def test_source_is_part_of_identity():
+	anonymous = CategoryItem('environment.wind.speed.speed')
+	sourced = CategoryItem('environment.wind.speed.speed', source='hourly')
+	assert sourced is not anonymous
+	assert CategoryItem('environment.wind.speed.speed', source='hourly') is sourced
+
+
+def test_parsing():
+	assert tuple(CategoryItem('device.ST-00000512.battery')) == ('device', 'ST-00000512', 'battery')
+
+
+def test_interning_is_bounded(limit):
+	for i in range(limit * 2):
+		CategoryItem(f'test.bounded.item{i}')
+	assert len(CategoryItem.__existing__) <= limit
+	assert CategoryItem.internStats()['evictions'] >= limit
+
+
+def test_evicted_items_are_rebuilt(limit):
+	first = CategoryItem('test.evicted.first')
+	expected = hash(first)
+	del first
+	for i in range(limit * 2):
+		CategoryItem(f'test.evicted.item{i}')
+	assert all(str(item) != 'test.evicted.first' for item in CategoryItem.__existing__.values())
+	rebuilt = CategoryItem('test.evicted.first')
+	assert str(rebuilt) == 'test.evicted.first'
+	assert hash(rebuilt) == expected
+
+
+def test_referenced_items_are_never_evicted(limit):
+	held = [CategoryItem(f'test.held.item{i}') for i in range(limit)]
+	anonymous = CategoryItem('test.held.anonymous')
+	assert anonymous.anonymous is anonymous
+	for i in range(limit * 4):
+		CategoryItem(f'test.referenced.item{i}')
+	assert all(CategoryItem(f'test.held.item{i}') is item for i, item in enumerate(held))
+	assert CategoryItem('test.held.anonymous') is anonymous
+
+
+def test_recently_used_items_are_kept(limit):
+	kept = CategoryItem('test.recent.kept')
+	for i in range(limit * 2):
+		assert CategoryItem('test.recent.kept') is kept
+		CategoryItem(f'test.recent.item{i}')
+
+
+def test_intern_stats():
+	before = CategoryItem.internStats()
+	CategoryItem('test.stats.item')
+	CategoryItem('test.stats.item')
+	after = CategoryItem.internStats()
+	assert after['misses'] == before['misses'] + 1
+	assert after['hits'] == before['hits'] + 1
+	assert after['size'] <= after['limit']
+
+
+@pytest.fixture
+def trie():
+	trie = CategoryTrie()
+	for key in KEYS:
+		trie.insert(CategoryItem(key), key)
+	return trie
+
+
+@pytest.mark.parametrize('pattern, expected', [
+	('environment.temperature.temperature', {'environment.temperature.temperature'}),
+	('environment.temperature.*', {'environment.temperature.temperature', 'environment.temperature.dewpoint'}),
+	('*.temperature.temperature', {'environment.temperature.temperature', 'indoor.temperature.temperature', 'indoor.*.temperature'}),
+	('indoor.humidity.temperature', {'indoor.*.temperature'}),
+	('environment.wind.*.gust', {'environment.wind.speed.gust'}),
+	('environment.wind.speed', set()),
+])
+def test_trie_wildcard_matching(trie, pattern, expected):
+	assert set(map(str, trie.match(CategoryItem(pattern)))) == expected
+
+
+def test_trie_prefix_matching(trie):
+	assert set(map(str, trie.match(CategoryItem('environment.wind'), prefix=True))) == {'environment.wind.speed.speed', 'environment.wind.speed.gust'}
+	assert set(map(str, trie.match(CategoryItem('environment.*'), prefix=True))) == {key for key in KEYS if key.startswith('environment')}
+
+
+def test_trie_subscribers_include_wildcard_keys(trie):
+	assert trie.subscribers(CategoryItem('indoor.temperature.temperature')) == {'indoor.temperature.temperature', 'indoor.*.temperature'}
+	assert trie.subscribers(CategoryItem('indoor.sensor.temperature')) == {'indoor.*.temperature'}
+	trie.remove(CategoryItem('indoor.*.temperature'))
+	assert trie.subscribers(CategoryItem('indoor.sensor.temperature')) == set()
+
+
+def test_key_index_notices_same_size_changes():
+	source = VersionedDict({CategoryItem(key): key for key in KEYS[:3]})
+	categories = CategoryDict(None, source, None)
+	assert CategoryItem(KEYS[0]) in set(categories.keyIndex)
+	del source[CategoryItem(KEYS[0])]
+	source[CategoryItem(KEYS[3])] = KEYS[3]
+	assert set(categories.keyIndex) == {CategoryItem(key) for key in KEYS[1:4]}
+	categories[KEYS[4]] = KEYS[4]
+	assert CategoryItem(KEYS[4]) in set(categories.keyIndex)
+
+
+def metadata(kind: str, sourceUnit) -> UnitMetaData:
+	return UnitMetaData(key=f'environment.{kind}.{kind}', value={'type': kind, 'sourceUnit': sourceUnit})
+
+
+@pytest.mark.parametrize('kind, sourceUnit, unit', [
+	('temperature', 'c', 'f'),
+	('temperature', 'f', 'c'),
+	('temperature', 'c', None),
+	('pressure', 'mb', 'inHg'),
+	('wind', ['km', 'hr'], 'mph'),
+	('precipitation', 'mm', 'inch'),
+])
+def test_array_converter_matches_scalar_conversion(kind, sourceUnit, unit):
+	meta = metadata(kind, sourceUnit)
+	converter = meta.getArrayConverter(None, unit)
+	assert converter is not None
+	construct = meta.getConvertFunc(None)
+	scalar = [float(getattr(value, unit) if unit else value.localize) for value in map(construct, RAW)]
+	np.testing.assert_allclose(converter(RAW), scalar, rtol=1e-9, atol=1e-9)
+
+
+def test_non_affine_conversions_fall_back():
+	assert metadata('direction', 'º').getArrayConverter(None, 'cardinal') is None
+	assert ArrayConverter.derive(unitDict['c'], lambda value: value.f ** 2) is None
+
+
+def test_array_converters_are_cleared_on_config_read():
+	meta = metadata('temperature', 'c')
+	meta.getArrayConverter(None, 'f')
+	assert UnitMetaData.getArrayConverter.cache_info().currsize
+	userConfig.read_dict({})
+	assert UnitMetaData.getArrayConverter.cache_info().currsize == 0
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from LevityDash.lib.plugins.columns import TimeSeriesColumns
+
+
+def item(timestamp: int, value):
+	return SimpleNamespace(timestamp=datetime.fromtimestamp(timestamp, tz=timezone.utc), value=value)
+
+
+@pytest.fixture
+def columns():
+	return TimeSeriesColumns.fromItems([item(t, float(t)) for t in (0, 60, 120, 180, 240)])
+
+
+def test_fromItems_sorts_rows():
+	columns = TimeSeriesColumns.fromItems([item(120, 3.0), item(0, 1.0), item(60, 2.0)])
+	assert columns.timestamps.tolist() == [0, 60, 120]
+	assert columns.values.tolist() == [1.0, 2.0, 3.0]
+	assert [i.value for i in columns] == [1.0, 2.0, 3.0]
+
+
+def test_fromItems_encodes_strings():
+	columns = TimeSeriesColumns.fromItems([item(0, 'rain'), item(60, 'snow'), item(120, 'rain'), item(180, None)])
+	assert columns.vocabulary == ['rain', 'snow']
+	assert columns.labels.tolist() == [0, 1, 0, -1]
+	assert columns.text.tolist() == ['rain', 'snow', 'rain', None]
+	assert not columns.isNumeric
+
+
+@pytest.mark.parametrize('timestamp, floor, ceil, nearest', [
+	(-10, -1, 0, 0),
+	(0, 0, 0, 0),
+	(30, 0, 1, 0),
+	(31, 0, 1, 1),
+	(60, 1, 1, 1),
+	(250, 4, 5, 4),
+])
+def test_lookups(columns, timestamp, floor, ceil, nearest):
+	assert columns.floor(timestamp) == floor
+	assert columns.ceil(timestamp) == ceil
+	assert columns.nearest(timestamp) == nearest
+
+
+def test_lookups_accept_datetimes(columns):
+	assert columns.floor(datetime.fromtimestamp(90, tz=timezone.utc)) == 1
+
+
+def test_nearest_on_empty_raises():
+	with pytest.raises(IndexError):
+		TimeSeriesColumns.empty().nearest(0)
+
+
+def test_span_is_inclusive_view(columns):
+	span = columns.span(60, 180)
+	assert span.timestamps.tolist() == [60, 120, 180]
+	assert np.shares_memory(span.values, columns.values)
+	assert len(columns.span(61, 119)) == 0
+	assert columns.range(None, 60) == slice(0, 2)
+
+
+def test_items_materialize_with_factory():
+	columns = TimeSeriesColumns(np.array([0, 60], dtype=np.int64), np.array([1.0, 2.0]), factory=lambda t, v: (t, v))
+	assert columns.item(1) == (60, 2.0)
+	assert columns.item(1) is columns.item(1)
+	with pytest.raises(ValueError):
+		TimeSeriesColumns(np.array([0], dtype=np.int64), np.array([1.0])).item(0)
+
+
+@pytest.mark.parametrize('how, expected', [
+	('mean', [10.0, 70.0]),
+	('min', [0.0, 60.0]),
+	('max', [20.0, 80.0]),
+	('sum', [30.0, 210.0]),
+	('first', [0.0, 60.0]),
+	('last', [20.0, 80.0]),
+	('count', [3.0, 3.0]),
+])
+def test_resample_reducers(how, expected):
+	timestamps = np.array([0, 10, 20, 60, 70, 80], dtype=np.int64)
+	columns = TimeSeriesColumns(timestamps, timestamps.astype(np.float64))
+	assert columns.resample(60, how).values.tolist() == expected
+
+
+def test_resample_buckets_are_centered():
+	columns = TimeSeriesColumns(np.array([0, 29, 30, 89, 90], dtype=np.int64), np.ones(5))
+	assert columns.resample(60, 'count').values.tolist() == [2.0, 2.0, 1.0]
+
+
+def test_resample_ignores_nan():
+	columns = TimeSeriesColumns(np.array([0, 10, 20], dtype=np.int64), np.array([1.0, np.nan, 3.0]))
+	assert columns.resample(60).values.tolist() == [2.0]
+	assert columns.resample(60, 'count').values.tolist() == [2.0]
+
+
+def test_resample_strings_use_mode():
+	columns = TimeSeriesColumns.fromItems([item(0, 'rain'), item(10, 'snow'), item(20, 'snow'), item(60, 'rain')])
+	assert columns.resample(60).text.tolist() == ['snow', 'rain']
+
+
+def test_resample_rejects_unknown_reducer(columns):
+	with pytest.raises(ValueError):
+		columns.resample(60, 'median')
+
+
+def test_aggregate(columns):
+	factory = lambda t, v: v
+	columns = TimeSeriesColumns(columns.timestamps, columns.values, factory=factory)
+	assert columns.aggregate('max') == 240.0
+	assert TimeSeriesColumns.empty(factory).aggregate() is None
+
+
+def test_concat_merges_vocabularies():
+	a = TimeSeriesColumns.fromItems([item(0, 'rain'), item(120, 'snow')])
+	b = TimeSeriesColumns.fromItems([item(60, 'snow'), item(180, 1.0)])
+	joined = TimeSeriesColumns.concat(a, b)
+	assert joined.timestamps.tolist() == [0, 60, 120, 180]
+	assert joined.text.tolist() == ['rain', 'snow', 'snow', None]
+	assert joined.values[-1] == 1.0
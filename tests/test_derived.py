@@ -0,0 +1,148 @@
+from copy import deepcopy
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from LevityDash.lib.plugins.builtin import OpenMeteo
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.derived import derivedMetrics, dewpoint, feelsLike, heatIndex, precipitationAccumulation, precipitationRolling, rollingSum, windChill
+from LevityDash.lib.plugins.observation import ObservationTimeSeries
+from LevityDash.lib.plugins.schema import LevityDatagram, Schema
+from LevityDash.lib.plugins.schema.benchmark import openMeteoFixture
+
+HOURS = np.arange(6, dtype=np.int64) * 3600
+
+DERIVED = {
+	'environment.temperature.heatIndex':      {'type': 'temperature', 'sourceUnit': 'c', 'title': 'Heat Index', 'sourceKey': 'heat_index'},
+	'environment.temperature.windChill':      {'type': 'temperature', 'sourceUnit': 'c', 'title': 'Wind Chill', 'sourceKey': 'wind_chill'},
+	'environment.precipitation.accumulation': {'type': 'precipitation', 'sourceUnit': 'mm', 'title': 'Accumulation', 'sourceKey': 'accumulation', 'timeseriesOnly': True},
+	'environment.precipitation.rolling24h':   {'type': 'precipitation', 'sourceUnit': 'mm', 'title': 'Rolling 24h', 'sourceKey': 'rolling24h', 'timeseriesOnly': True},
+}
+
+
+def array(*values) -> np.ndarray:
+	return np.array(values, dtype=np.float64)
+
+
+def test_dewpoint():
+	result = dewpoint(HOURS[:3], array(20, 30, 15), array(50, 70, 100))
+	assert result == pytest.approx([9.26, 23.93, 15.0], abs=0.01)
+
+
+def test_heat_index():
+	# 90ºF at 70% is 106ºF, below 80ºF or 13% the temperature is returned
+	result = heatIndex(HOURS[:3], array(32.22, 20, 32.22), array(70, 70, 10))
+	assert result == pytest.approx([41.1, 20, 32.22], abs=0.1)
+
+
+def test_wind_chill():
+	# Wind chill is only defined above 3 mph
+	result = windChill(HOURS[:3], array(-10, -10, 0), array(30, 4, 20))
+	assert result.tolist() == [-19.5, -10.0, -5.2]
+
+
+def test_feels_like_selects_index():
+	temperature, humidity = array(30, 30, 5, 15), array(60, 30, 50, 50)
+	heat, chill = array(33, 29, 5, 15), array(30, 30, 1, 15)
+	assert feelsLike(HOURS[:4], temperature, humidity, heat, chill).tolist() == [33, 30, 1, 15]
+
+
+def test_accumulation():
+	assert precipitationAccumulation(HOURS[:4], array(1, 0.5, 0, 2)).tolist() == [1, 1.5, 1.5, 3.5]
+
+
+def test_rolling_24h():
+	hours = np.arange(30, dtype=np.int64) * 3600
+	result = precipitationRolling(hours, np.ones(30))
+	assert result.tolist() == [min(i + 1, 24) for i in range(30)]
+
+
+def test_rolling_sum_uses_timestamps_not_rows():
+	# A gap in the rows leaves only the rows inside the window
+	timestamps = np.array([0, 3600, 30 * 3600, 31 * 3600], dtype=np.int64)
+	assert rollingSum(timestamps, array(1, 2, 3, 4), timedelta(hours=24)).tolist() == [1, 3, 3, 7]
+
+
+def test_nan_inputs_give_nan():
+	temperature, humidity, wind = array(np.nan, 20), array(50, np.nan), array(30, np.nan)
+	assert np.isnan(dewpoint(HOURS[:2], temperature, humidity)).all()
+	assert np.isnan(windChill(HOURS[:2], temperature, wind)).all()
+
+
+def test_nan_precipitation_counts_as_none():
+	precipitation = array(1, np.nan, 2)
+	assert precipitationAccumulation(HOURS[:3], precipitation).tolist() == [1, 1, 3]
+	assert precipitationRolling(HOURS[:3], precipitation).tolist() == [1, 1, 3]
+
+
+class Hourly(ObservationTimeSeries, published=False, recorded=False):
+	_period = timedelta(hours=1)
+
+
+class SynchronousPool:
+
+	def run_threaded_process(self, func, *args, on_result=None, on_error=None, **kwargs):
+		on_result(func(*args))
+
+
+class FixturePlugin:
+	name = 'OpenMeteo'
+
+	def __contains__(self, key):
+		return False
+
+
+@pytest.fixture(scope='module')
+def source():
+	_, payloads, kwargs = openMeteoFixture(days=2)
+	schema = Schema(plugin=FixturePlugin(), source={**deepcopy(OpenMeteo.schema), **deepcopy(DERIVED)})
+	payload = deepcopy(payloads[0])
+	hourly = payload['hourly']
+	hours = len(hourly['time'])
+	for key in ('dewpoint_2m', 'apparent_temperature'):
+		hourly.pop(key)
+	# Alternating hot and humid, cold and windy and mild rows with a gap in the precipitation
+	hourly['temperature_2m'] = [(32.0, -10.0, 15.0)[i % 3] for i in range(hours)]
+	hourly['relativehumidity_2m'] = [(70.0, 50.0, 50.0)[i % 3] for i in range(hours)]
+	hourly['windspeed_10m'] = [(5.0, 30.0, 10.0)[i % 3] for i in range(hours)]
+	hourly['precipitation'] = [None if i == 5 else round(i * 0.1, 1) for i in range(hours)]
+	return schema, payload, kwargs
+
+
+def ingest(source, columnar: bool) -> Hourly:
+	schema, payload, kwargs = source
+	hourly = Hourly(SimpleNamespace(name='fixture', thread_pool=SynchronousPool(), schema=schema))
+	hourly.dataName = 'hourly'
+	hourly.update(LevityDatagram(deepcopy(payload), schema=schema, columnar=columnar, **kwargs))
+	return hourly
+
+
+def rowValues(hourly: Hourly, key: CategoryItem) -> dict:
+	return {int(timestamp.value.timestamp()): row[key].rawValue for timestamp, row in hourly.timeseries.items() if row.get(key, None) is not None}
+
+
+def columnValues(hourly: Hourly, key: CategoryItem) -> dict:
+	return {int(timestamp.timestamp()): value.rawValue for timestamp, value in hourly.columnItems(key).items()}
+
+
+@pytest.mark.parametrize('key', [str(metric.key) for metric in derivedMetrics if not str(metric.key).startswith('indoor')])
+def test_rows_and_columns_derive_the_same_values(source, key):
+	key = CategoryItem(key)
+	rows, columns = ingest(source, columnar=False), ingest(source, columnar=True)
+	expected = rowValues(rows, key)
+	assert len(expected) == 48
+	assert columnValues(columns, key) == pytest.approx(expected)
+
+
+def test_rows_with_missing_inputs_are_not_derived(source):
+	schema, payload, kwargs = source
+	payload = deepcopy(payload)
+	payload['hourly']['relativehumidity_2m'][0] = None
+	dewpoint = CategoryItem('environment.temperature.dewpoint')
+	rows, columns = ingest((schema, payload, kwargs), columnar=False), ingest((schema, payload, kwargs), columnar=True)
+	first = min(rowValues(rows, CategoryItem('environment.temperature.temperature')))
+	assert first not in rowValues(rows, dewpoint)
+	assert first not in columnValues(columns, dewpoint)
+	assert columnValues(columns, dewpoint) == pytest.approx(rowValues(rows, dewpoint))
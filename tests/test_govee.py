@@ -0,0 +1,128 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from LevityDash.lib.plugins.builtin import Govee
+from LevityDash.lib.plugins.builtin.Govee import AdvertFilter, BLEPayloadParser, compileDecoder, parseMathString
+from LevityDash.lib.plugins.categories import CategoryItem
+
+# The default fields of a GVH5102
+FIELDS = (
+	('temperature', 4, 10, 'val / 10000', 16),
+	('humidity', 4, 10, 'payload % 1000 / 1000', 16),
+	('battery', 10, 12, None, 16),
+)
+
+
+def sliceDecode(payload: bytes, field: str, start: int, end: int, expression, base: int) -> dict:
+	"""The original decoder, every field is parsed from a slice of the payload's hex string"""
+	value = int(payload.hex().upper()[start:end], base)
+	if isinstance(expression, str):
+		expression = parseMathString(expression)
+	return {field: expression(value) if expression is not None else value}
+
+
+def reference(payload: bytes, fields) -> dict:
+	return {key: value for spec in fields for key, value in sliceDecode(payload, *spec).items()}
+
+
+@pytest.fixture
+def payloads():
+	rng = random.Random(0)
+	return [bytes(rng.getrandbits(8) for _ in range(6)) for _ in range(200)] + [bytes(6), b'\xff' * 6]
+
+
+def test_compiled_matches_slices(payloads):
+	decode = compileDecoder('GVH5102', FIELDS)
+	for payload in payloads:
+		assert decode(payload) == reference(payload, FIELDS)
+
+
+def test_memoryview_payloads(payloads):
+	decode = compileDecoder('GVH5102', FIELDS)
+	for payload in payloads:
+		assert decode(memoryview(payload)) == decode(payload)
+
+
+@pytest.mark.parametrize('spec', [
+	('battery', 10, 12, None, 16),
+	('temperature', 0, 4, 'val / 100 - 40', 16),
+	('flags', 1, 3, None, 16),
+	('counter', 2, 6, lambda value: value * 2, 16),
+	('decimal', 0, 4, None, 10),
+])
+def test_single_field_parser(payloads, spec):
+	parser = BLEPayloadParser(*spec)
+	for payload in payloads:
+		try:
+			expected = sliceDecode(payload, *spec)
+		except ValueError:
+			# Hex digits are not valid in base 10
+			with pytest.raises(ValueError):
+				parser(payload)
+			continue
+		assert parser(payload) == expected
+
+
+def test_short_payload_raises():
+	with pytest.raises(ValueError):
+		compileDecoder('GVH5102', FIELDS)(b'\x00\x01\x02')
+
+
+def test_unsafe_expressions_are_rejected():
+	with pytest.raises(RuntimeError):
+		compileDecoder(None, (('value', 0, 2, '__import__("os")', 16),))
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+	monkeypatch.setattr(Govee, 'monotonic', clock)
+	return clock
+
+
+@pytest.fixture
+def advertFilter(clock):
+	return AdvertFilter(timedelta(seconds=15), maxRate=1.0)
+
+
+def test_duplicates_are_dropped_within_window(advertFilter, clock):
+	assert advertFilter.accept('A', b'\x01', -60)
+	clock.advance(5)
+	assert not advertFilter.accept('A', b'\x01', -60)
+	clock.advance(11)
+	assert advertFilter.accept('A', b'\x01', -60)
+	assert advertFilter.counts['A'] == {'received': 3, 'forwarded': 2, 'duplicates': 1, 'rateLimited': 0}
+
+
+def test_changes_are_rate_limited(advertFilter, clock):
+	assert advertFilter.accept('A', b'\x01', -60)
+	clock.advance(0.5)
+	assert not advertFilter.accept('A', b'\x02', -60)
+	clock.advance(0.5)
+	assert advertFilter.accept('A', b'\x02', -60)
+	assert advertFilter.counts['A']['rateLimited'] == 1
+
+
+def test_devices_are_filtered_independently(advertFilter):
+	assert advertFilter.accept('A', b'\x01', -60)
+	assert advertFilter.accept('B', b'\x01', -60)
+	assert not advertFilter.accept('A', b'\x01', -60)
+
+
+def test_rssi_change_passes_when_subscribed(clock):
+	subscribed = set()
+	advertFilter = AdvertFilter(timedelta(seconds=15), maxRate=1.0, rssiSubscribed=subscribed.__contains__)
+	rssiKey = CategoryItem('indoor.sensor.rssi')
+	advertFilter.accept('A', b'\x01', -60)
+	advertFilter.device('A').rssiKey = rssiKey
+	clock.advance(2)
+	assert not advertFilter.accept('A', b'\x01', -70)
+	subscribed.add(rssiKey)
+	assert advertFilter.accept('A', b'\x01', -75)
+
+
+def test_memoryview_payloads_are_compared_by_value(advertFilter, clock):
+	assert advertFilter.accept('A', memoryview(b'\x01\x02'), -60)
+	clock.advance(2)
+	assert not advertFilter.accept('A', memoryview(bytearray(b'\x01\x02')), -60)
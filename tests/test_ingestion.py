@@ -0,0 +1,238 @@
+from copy import deepcopy
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.derived import DerivedMetricEngine, DerivedMetrics
+from LevityDash.lib.plugins.observation import MeasurementTimeSeries, ObservationLog, ObservationTimeSeries
+from LevityDash.lib.plugins.schema import LevityDatagram
+from LevityDash.lib.plugins.schema.benchmark import openMeteoFixture
+
+TEMPERATURE = CategoryItem('environment.temperature.temperature')
+SHOWERS = CategoryItem('environment.precipitation.showers')
+
+
+class DeferredPool:
+	"""Thread pool stand-in that runs each job only when asked, so every ingestion step can be inspected"""
+
+	def __init__(self):
+		self.pending = []
+
+	def run_threaded_process(self, func, *args, on_result=None, on_error=None, **kwargs):
+		self.pending.append((func, args, on_result, on_error))
+
+	def work(self):
+		"""Runs the next job without handing its result back, i.e. the parse on the worker thread"""
+		func, args, on_result, _ = self.pending.pop(0)
+		return func(*args), on_result
+
+	def run(self):
+		while self.pending:
+			func, args, on_result, on_error = self.pending.pop(0)
+			try:
+				result = func(*args)
+			except Exception as e:
+				on_error(e)
+			else:
+				on_result(result)
+
+
+class Hourly(ObservationTimeSeries, published=False, recorded=False):
+	_period = timedelta(hours=1)
+
+	def __init__(self, *args, **kwargs):
+		super(Hourly, self).__init__(*args, **kwargs)
+		self.updates = []
+
+	def afterUpdate(self, rows, **options):
+		self.updates.append((rows, options))
+
+
+class Log(ObservationLog, published=False, recorded=False):
+	_period = timedelta(hours=1)
+
+
+@pytest.fixture(scope='module')
+def fixture():
+	return openMeteoFixture(days=1)
+
+
+@pytest.fixture
+def pool():
+	return DeferredPool()
+
+
+@pytest.fixture
+def hourly(fixture, pool):
+	schema, _, _ = fixture
+	hourly = Hourly(SimpleNamespace(name='fixture', thread_pool=pool, schema=schema))
+	hourly.dataName = 'hourly'
+	return hourly
+
+
+def temperatures(hourly: Hourly) -> set:
+	return {row[TEMPERATURE].rawValue for row in hourly.timeseriesValues()}
+
+
+def datagram(fixture, temperature: float = None, hours: slice = slice(None), omit: tuple = (), **kwargs) -> LevityDatagram:
+	schema, payloads, fixtureKwargs = fixture
+	payload = deepcopy(payloads[0])
+	if temperature is not None:
+		payload['hourly']['temperature_2m'] = [temperature] * len(payload['hourly']['time'])
+	payload['hourly'] = {key: values[hours] for key, values in payload['hourly'].items() if key not in omit}
+	return LevityDatagram(payload, schema=schema, **{**fixtureKwargs, **kwargs})
+
+
+def test_staged_rows_are_hidden_until_commit(fixture, pool, hourly):
+	hourly.submit(datagram(fixture))
+	result, commit = pool.work()
+	assert len(hourly) == 0
+	assert TEMPERATURE not in hourly
+	commit(result)
+	assert len(hourly) == 24
+	assert TEMPERATURE in hourly
+	assert hourly.ingestStats['committed'] == 1
+
+
+def test_queued_update_is_superseded(fixture, pool, hourly):
+	hourly.submit(datagram(fixture), attempt=1)
+	hourly.submit(datagram(fixture), attempt=2)
+	pool.run()
+	assert hourly.ingestStats == {'submitted': 2, 'superseded': 1, 'committed': 1, 'failed': 0}
+	assert [options for _, options in hourly.updates] == [{'attempt': 2}]
+
+
+def test_update_submitted_during_commit_is_ingested(fixture, pool, hourly):
+	hourly.submit(datagram(fixture))
+	result, commit = pool.work()
+	hourly.submit(datagram(fixture, temperature=5.0))
+	commit(result)
+	pool.run()
+	assert hourly.ingestStats['committed'] == 2
+	assert temperatures(hourly) == {5.0}
+
+
+def test_visible_rows_are_updated_on_commit(fixture, pool, hourly):
+	hourly.submit(datagram(fixture, temperature=1.0))
+	pool.run()
+	hourly.submit(datagram(fixture, temperature=2.0))
+	result, commit = pool.work()
+	assert temperatures(hourly) == {1.0}
+	commit(result)
+	assert temperatures(hourly) == {2.0}
+	rows, _ = hourly.updates[-1]
+	assert len(rows) == 24
+
+
+def test_failed_update_does_not_stall_ingestion(fixture, pool, hourly):
+	hourly.submit({'hourly': {'data': 'not a list of observations'}})
+	pool.run()
+	assert hourly.ingestStats['failed'] == 1
+	hourly.submit(datagram(fixture, temperature=3.0))
+	pool.run()
+	assert hourly.ingestStats['committed'] == 1
+	assert temperatures(hourly) == {3.0}
+
+
+def test_derived_writes_to_visible_rows_are_deferred(fixture, pool, hourly):
+	metrics = DerivedMetrics()
+
+	@metrics.register(str(SHOWERS), (str(TEMPERATURE),), output=float, cumulative=True)
+	def runningTotal(timestamps, temperature):
+		return np.cumsum(temperature)
+
+	hourly.derived = DerivedMetricEngine(hourly, metrics)
+	hourly.submit(datagram(fixture, temperature=1.0, hours=slice(0, 6), omit=('showers',)))
+	pool.run()
+	hourly.submit(datagram(fixture, temperature=1.0, hours=slice(12, None), omit=('showers',)))
+	pool.run()
+
+	def totals():
+		return [row[SHOWERS].rawValue for _, row in sorted(hourly.timeseries.items())]
+
+	assert totals() == [float(i) for i in range(1, 19)]
+	hourly.submit(datagram(fixture, temperature=1.0, hours=slice(6, 12), omit=('showers',)))
+	result, commit = pool.work()
+	assert totals() == [float(i) for i in range(1, 19)]
+	commit(result)
+	assert totals() == [float(i) for i in range(1, 25)]
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+	rebuilds = []
+	rebuild = MeasurementTimeSeries._MeasurementTimeSeries__rebuild
+
+	def counted(series):
+		rebuilds.append(series)
+		return rebuild(series)
+
+	monkeypatch.setattr(MeasurementTimeSeries, '_MeasurementTimeSeries__rebuild', counted)
+	return rebuilds
+
+
+def subscribe(hourly: Hourly) -> MeasurementTimeSeries:
+	series = hourly[TEMPERATURE]
+	series.addReference('test')
+	hourly.add_subscribed_item(TEMPERATURE)
+	series.signals._pendingDelta = None
+	return series
+
+
+def test_subscribed_series_are_updated_incrementally(fixture, pool, hourly, rebuilds):
+	hourly.submit(datagram(fixture, temperature=1.0, hours=slice(0, 12)))
+	pool.run()
+	series = subscribe(hourly)
+	assert len(series) == 12
+	rebuilds.clear()
+
+	hourly.submit(datagram(fixture, temperature=1.0, hours=slice(12, None)))
+	pool.run()
+	assert rebuilds == []
+	assert len(series) == 24
+	assert series.signals._pendingDelta.count == 12
+
+	series.signals._pendingDelta = None
+	hourly.submit(datagram(fixture, temperature=2.0, hours=slice(0, 6)))
+	pool.run()
+	assert rebuilds == []
+	assert [item.rawValue for item in series][:7] == [2.0] * 6 + [1.0]
+
+
+def test_columns_are_staged(fixture, pool, hourly):
+	hourly.submit(datagram(fixture, columnar=True)['hourly'], restored=True)
+	result, commit = pool.work()
+	assert hourly.columnsFor(TEMPERATURE) is None
+	commit(result)
+	assert len(hourly.columnsFor(TEMPERATURE)) == 24
+	assert hourly.updates == [([], {'restored': True})]
+
+
+def test_ingest_options_outside_staging(hourly):
+	assert hourly.ingestOptions == {}
+
+
+@pytest.fixture
+def observationLog(fixture, pool):
+	schema, _, _ = fixture
+	observationLog = Log(SimpleNamespace(name='fixture', thread_pool=pool, schema=schema))
+	observationLog.dataName = 'hourly'
+	return observationLog
+
+
+def test_backfill_only_fills_the_gap(fixture, pool, observationLog):
+	observationLog.submit(datagram(fixture, temperature=1.0, hours=slice(0, 6)))
+	observationLog.submit(datagram(fixture, temperature=1.0, hours=slice(18, None)))
+	pool.run()
+	logged = sorted(key.value for key in observationLog.timeseries)
+	start, end = logged[5], logged[6]
+	observationLog.backfill(datagram(fixture, temperature=2.0), start, end)
+	pool.run()
+	assert observationLog.backfillStats == {'merged': 12, 'skipped': 12}
+	assert len(observationLog) == 24
+	backfilled = [row for key, row in observationLog.timeseries.items() if start < key.value < end]
+	assert {row[TEMPERATURE].rawValue for row in backfilled} == {2.0}
+	assert temperatures(observationLog) == {1.0, 2.0}
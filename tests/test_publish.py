@@ -0,0 +1,77 @@
+from time import monotonic
+from types import SimpleNamespace
+
+import pytest
+from PySide2.QtWidgets import QApplication
+
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.observation import RealtimeSource
+from LevityDash.lib.plugins.utils import Accumulator, ChannelSignal, PublishScheduler
+
+WIND = CategoryItem('environment.wind.speed.speed')
+TEMPERATURE = CategoryItem('environment.temperature.temperature')
+
+
+@RealtimeSource.register
+class Realtime:
+	"""Stand-in for a realtime observation, e.g. the one rapid_wind, obs_st and summary messages update"""
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+	QApplication.instance() or QApplication([])
+	scheduler = PublishScheduler(interval=20, immediateChannels=[CategoryItem('indoor.*.*')])
+	monkeypatch.setattr(PublishScheduler, '_PublishScheduler__instance', scheduler)
+	return scheduler
+
+
+def tick(milliseconds: int = 100):
+	deadline = monotonic() + milliseconds / 1000
+	while monotonic() < deadline:
+		QApplication.processEvents()
+
+
+def channel(key: CategoryItem) -> ChannelSignal:
+	signal = ChannelSignal(SimpleNamespace(name='plugin'), key)
+	signal.emits = []
+	signal._signal.connect(lambda observations: signal.emits.append(set(observations)))
+	return signal
+
+
+def test_realtime_publishes_are_coalesced(scheduler):
+	realtime = Realtime()
+	signal = channel(WIND)
+	for _ in range(10):
+		signal.publish(realtime)
+	assert signal.emits == []
+	tick()
+	assert signal.emits == [{realtime}]
+	assert signal.coalescedEmits == 9
+	assert scheduler.stats['emits'] == 1
+
+
+def test_realtime_accumulator_is_coalesced(scheduler):
+	accumulator = Accumulator(Realtime())
+	emits = []
+	accumulator.connectSlot(lambda data: emits.append(set(data.keys)))
+	accumulator.publish(WIND)
+	accumulator.publish(TEMPERATURE)
+	accumulator.publish(WIND)
+	tick()
+	assert emits == [{WIND, TEMPERATURE}]
+
+
+def test_immediate_channels_are_not_coalesced(scheduler):
+	realtime = Realtime()
+	signal = channel(CategoryItem('indoor.temperature.temperature'))
+	for _ in range(3):
+		signal.publish(realtime)
+	assert len(signal.emits) == 3
+	assert scheduler.stats['scheduled'] == 0
+
+
+def test_disabled_scheduler_emits_immediately(scheduler):
+	scheduler.interval = 0
+	signal = channel(WIND)
+	signal.publish(Realtime())
+	assert len(signal.emits) == 1
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from types import SimpleNamespace
+
+import pytest
+
+from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.builtin.OpenMeteo import OpenMeteo
+from LevityDash.lib.plugins.schema.benchmark import openMeteoFixture
+from LevityDash.lib.plugins.snapshots import DatagramSnapshots
+from LevityDash.lib.plugins.web import ResponseCache
+from LevityDash.lib.plugins.web.errors import NotModified
+
+SCHEMA, PAYLOADS, _ = openMeteoFixture(days=1)
+BODY = dumps(PAYLOADS[0]).encode()
+
+
+class Response:
+
+	def __init__(self, status: int = 200, body: bytes = BODY, headers: dict = None):
+		self.status = status
+		self.body = body
+		self.headers = headers or {}
+		self.reason = ''
+		self.content = b''
+
+	async def read(self) -> bytes:
+		return self.body
+
+	async def text(self) -> str:
+		return self.body.decode()
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc):
+		return False
+
+
+class Session:
+	"""Stand-in for the session pool's session that answers each request with the next scripted response"""
+
+	def __init__(self, *responses: Response):
+		self.responses = list(responses)
+		self.requests = []
+
+	def get(self, url, params=None, headers=None):
+		self.requests.append(SimpleNamespace(url=url, params=params, headers=headers or {}))
+		return self.responses.pop(0)
+
+
+def plugin(tmp_path, *responses: Response) -> OpenMeteo:
+	"""A REST plugin without its config, every store it writes to is in tmp_path"""
+	rest = OpenMeteo.__new__(OpenMeteo)
+	rest._Web__staleEndpoints = set()
+	rest.pluginLog = LevityPluginLog
+	rest.schema = SCHEMA
+	rest.observations = []
+	rest.responseCache = ResponseCache(OpenMeteo.name, tmp_path / 'responses.sqlite')
+	rest.snapshots = DatagramSnapshots(OpenMeteo.name, tmp_path / 'snapshots')
+	rest.sessionPool = SimpleNamespace(session=Session(*responses))
+	return rest
+
+
+def restart(rest: OpenMeteo, tmp_path, *responses: Response) -> OpenMeteo:
+	"""The same plugin launched again with the persisted cache and snapshots"""
+	rest.responseCache.close()
+	return plugin(tmp_path, *responses)
+
+
+def test_not_modified_response(loop, tmp_path):
+	rest = plugin(tmp_path, Response(headers={'ETag': '"a"'}), Response(304))
+	endpoint = rest.urls.forecast
+	assert len(loop.run_until_complete(rest.getData(endpoint)))
+	with pytest.raises(NotModified):
+		loop.run_until_complete(rest.getData(endpoint))
+	assert rest.sessionPool.session.requests[1].headers['If-None-Match'] == '"a"'
+	assert rest.responseCache.hits == 1
+
+
+def test_identical_payload_is_not_parsed(loop, tmp_path):
+	rest = plugin(tmp_path, Response(), Response())
+	endpoint = rest.urls.forecast
+	loop.run_until_complete(rest.getData(endpoint))
+	with pytest.raises(NotModified) as e:
+		loop.run_until_complete(rest.getData(endpoint))
+	assert e.value.reason == 'payload is unchanged'
+
+
+def test_changed_payload_is_parsed(loop, tmp_path):
+	rest = plugin(tmp_path, Response(), Response(body=BODY.replace(b'"elevation": 0.0', b'"elevation": 1.0')))
+	endpoint = rest.urls.forecast
+	loop.run_until_complete(rest.getData(endpoint))
+	assert len(loop.run_until_complete(rest.getData(endpoint)))
+
+
+def test_unconfirmed_persisted_entry_is_not_sent(loop, tmp_path):
+	rest = plugin(tmp_path, Response(headers={'ETag': '"a"'}))
+	loop.run_until_complete(rest.getData(rest.urls.forecast))
+	rest.snapshots.clear()
+
+	# Nothing was replayed, so the payload the validators describe is not in memory
+	rest = restart(rest, tmp_path, Response(headers={'ETag': '"a"'}))
+	assert len(loop.run_until_complete(rest.getData(rest.urls.forecast)))
+	assert 'If-None-Match' not in rest.sessionPool.session.requests[0].headers
+
+
+def test_replayed_snapshot_is_stale_until_refreshed(loop, tmp_path):
+	rest = plugin(tmp_path, Response(headers={'ETag': '"a"'}))
+	loop.run_until_complete(rest.getData(rest.urls.forecast))
+
+	rest = restart(rest, tmp_path, Response(304))
+	assert loop.run_until_complete(rest.replaySnapshots()) == 1
+	assert rest.stale
+	# The replay confirms the same key the request uses
+	with pytest.raises(NotModified):
+		loop.run_until_complete(rest.getData(rest.urls.forecast))
+	assert rest.sessionPool.session.requests[0].headers['If-None-Match'] == '"a"'
+	assert not rest.stale
+
+
+def test_expired_snapshot_is_not_replayed(loop, tmp_path, monkeypatch):
+	rest = plugin(tmp_path, Response(headers={'ETag': '"a"'}))
+	loop.run_until_complete(rest.getData(rest.urls.forecast))
+
+	rest = restart(rest, tmp_path, Response(headers={'ETag': '"a"'}))
+	monkeypatch.setattr(DatagramSnapshots, 'maxAge', timedelta(0))
+	assert loop.run_until_complete(rest.replaySnapshots()) == 0
+	assert not rest.stale
+	assert len(loop.run_until_complete(rest.getData(rest.urls.forecast)))
+	assert 'If-None-Match' not in rest.sessionPool.session.requests[0].headers
+
+
+def test_request_overrides_have_their_own_key(tmp_path):
+	rest = plugin(tmp_path)
+	endpoint = rest.urls.forecast
+	assert rest.responseCacheKey(endpoint) == rest.responseCache.key(endpoint.url, endpoint.params)
+	assert rest.responseCacheKey(endpoint, params={'past_days': 2}) != rest.responseCacheKey(endpoint)
+	assert endpoint.params['past_days'] != 2
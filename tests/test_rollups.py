@@ -0,0 +1,106 @@
+from datetime import timedelta
+from time import time
+
+import numpy as np
+import pytest
+
+from LevityDash.lib.plugins.archive import ObservationArchive
+from LevityDash.lib.plugins.rollups import ObservationRollups, RollupTier
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+@pytest.fixture
+def rollups():
+	return ObservationRollups()
+
+
+def test_tier_folds_buckets():
+	tier = RollupTier(timedelta(minutes=1), timedelta(days=1))
+	for timestamp, value in ((0, 1.0), (30, 3.0), (59, 2.0), (60, 10.0)):
+		tier.add('temperature', timestamp, value)
+	assert tier.columns('temperature').timestamps.tolist() == [30, 90]
+	assert tier.columns('temperature', 'mean').values.tolist() == [2.0, 10.0]
+	assert tier.columns('temperature', 'min').values.tolist() == [1.0, 10.0]
+	assert tier.columns('temperature', 'max').values.tolist() == [3.0, 10.0]
+	assert tier.columns('temperature', 'count').values.tolist() == [3.0, 1.0]
+	with pytest.raises(ValueError):
+		tier.columns('temperature', 'median')
+
+
+def test_tier_merge_matches_add():
+	added, merged = RollupTier(timedelta(minutes=1), timedelta(days=1)), RollupTier(timedelta(minutes=1), timedelta(days=1))
+	for value in (1.0, 5.0, 3.0):
+		added.add('temperature', 0, value)
+	merged.merge('temperature', 0, 1.0, 1.0, 1.0, 1)
+	merged.merge('temperature', 0, 3.0, 5.0, 8.0, 2)
+	for how in ('min', 'max', 'sum', 'count', 'mean'):
+		assert merged.columns('temperature', how).values.tolist() == added.columns('temperature', how).values.tolist()
+
+
+def test_columns_cache_is_invalidated():
+	tier = RollupTier(timedelta(minutes=1), timedelta(days=1))
+	tier.add('temperature', 0, 1.0)
+	assert len(tier.columns('temperature')) == 1
+	tier.add('temperature', 60, 1.0)
+	assert len(tier.columns('temperature')) == 2
+
+
+def test_trim_drops_stale_buckets():
+	tier = RollupTier(timedelta(hours=1), timedelta(days=1))
+	tier.add('temperature', NOW - 2 * DAY, 1.0)
+	tier.add('temperature', NOW - 3600, 2.0)
+	assert tier.trim(NOW) == 1
+	assert tier.columns('temperature').values.tolist() == [2.0]
+	tier.trim(NOW + 2 * DAY)
+	assert 'temperature' not in tier
+
+
+@pytest.mark.parametrize('secondsPerPixel, start, step', [
+	(None, None, 60),
+	(30, None, 60),
+	(120, None, 60),
+	(900, None, 900),
+	(7200, None, 3600),
+	(60, NOW - 3 * DAY, 900),
+	(60, NOW - 10 * DAY, 3600),
+	(60, NOW - 60 * DAY, 3600),
+	(3600, NOW - 3600, 3600),
+	(900, NOW - 3600, 900),
+])
+def test_select(rollups, secondsPerPixel, start, step):
+	assert rollups.select(secondsPerPixel, start, now=NOW).step == step
+
+
+def test_query_spans_selected_tier(rollups):
+	now = int(time()) // 60 * 60
+	for minute in range(120):
+		rollups.add('temperature', now - minute * 60, float(minute))
+	columns = rollups.query('temperature', start=now - 1800, stop=now, secondsPerPixel=60)
+	assert len(columns) == 30
+	assert columns.timestamps[0] >= now - 1800
+
+
+def test_archive_aggregate_matches_fold(tmp_path):
+	archive = ObservationArchive('test', tmp_path / 'archive.sqlite', retention=timedelta(days=60))
+	rng = np.random.default_rng(0)
+	# Relative to the current time since the archive prunes rows older than its retention
+	now = int(time())
+	rows = [(key, timestamp, float(rng.random())) for key in ('a', 'b') for timestamp in range(now - 40 * DAY, now, 97)]
+	archive.write(ObservationArchive.toRow(*row) for row in rows)
+
+	folded, aggregated = ObservationRollups(), ObservationRollups()
+	for key, timestamp, value in rows:
+		folded.add(repr(key), timestamp, value)
+	for tier in aggregated.tiers:
+		for row in archive.aggregate(tier.step):
+			tier.merge(*row)
+	archive.close()
+
+	for expected, actual in zip(folded.tiers, aggregated.tiers):
+		for key in (repr('a'), repr('b')):
+			for how in ('min', 'max', 'mean', 'count'):
+				a, b = expected.columns(key, how), actual.columns(key, how)
+				assert np.array_equal(a.timestamps, b.timestamps)
+				assert np.allclose(a.values, b.values)
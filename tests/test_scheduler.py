@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+import pytest
+
+from LevityDash.lib.plugins.web import scheduler
+from LevityDash.lib.plugins.web.errors import APIError, RateLimitExceeded
+from LevityDash.lib.plugins.web.scheduler import Backoff, BreakerState, CadenceEstimator, CircuitBreaker
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+	monkeypatch.setattr(scheduler, 'monotonic', clock)
+	return clock
+
+
+@pytest.fixture
+def breaker(clock):
+	return CircuitBreaker(threshold=3, cooldown=timedelta(seconds=60))
+
+
+def test_breaker_opens_after_threshold(breaker):
+	for _ in range(2):
+		breaker.failure(APIError())
+		assert breaker.state is BreakerState.Closed
+		assert breaker.allow()
+	breaker.failure(APIError())
+	assert breaker.state is BreakerState.Open
+	assert not breaker.allow()
+	assert breaker.remaining == 60
+
+
+def test_rate_limit_opens_immediately(breaker):
+	breaker.failure(RateLimitExceeded(), retryAfter=120)
+	assert breaker.state is BreakerState.Open
+	assert breaker.remaining == 120
+
+
+def test_breaker_half_opens_after_cooldown(breaker, clock):
+	breaker.trip()
+	clock.advance(59)
+	assert breaker.state is BreakerState.Open
+	clock.advance(1)
+	assert breaker.state is BreakerState.HalfOpen
+	assert breaker.allow()
+
+
+def test_failed_trial_doubles_cooldown(breaker, clock):
+	breaker.trip()
+	clock.advance(60)
+	breaker.failure(APIError())
+	assert breaker.state is BreakerState.Open
+	assert breaker.remaining == 120
+	assert breaker.trips == 2
+
+
+def test_cooldown_is_capped(breaker, clock):
+	for _ in range(10):
+		breaker.trip()
+	assert breaker.remaining == CircuitBreaker.maxCooldown.total_seconds()
+
+
+def test_success_closes_breaker(breaker, clock):
+	breaker.trip()
+	clock.advance(60)
+	breaker.success()
+	assert breaker.state is BreakerState.Closed
+	assert (breaker.failures, breaker.trips, breaker.remaining) == (0, 0, 0.0)
+
+
+def test_backoff_grows_with_jitter_and_cap(monkeypatch):
+	backoff = Backoff(base=timedelta(seconds=10), cap=timedelta(seconds=60))
+	monkeypatch.setattr(scheduler, 'randomFloat', lambda: 1.0)
+	assert [backoff.next() for _ in range(5)] == [10, 20, 40, 60, 60]
+	backoff.reset()
+	monkeypatch.setattr(scheduler, 'randomFloat', lambda: 0.0)
+	assert [backoff.next() for _ in range(3)] == [5, 10, 20]
+
+
+def test_backoff_delays_stay_within_jitter_bounds():
+	backoff = Backoff(base=timedelta(seconds=8), cap=timedelta(minutes=5))
+	for attempt in range(8):
+		delay = min(8 * 2 ** attempt, 300)
+		assert delay / 2 <= backoff.next() <= delay
+
+
+def test_cadence_is_learned():
+	cadence = CadenceEstimator(samples=4)
+	assert cadence.cadence is None
+	start = 1_700_000_000
+	for published in (0, 600, 1200, 1800):
+		cadence.record(start + published)
+	cadence.record(start + 1700)
+	assert cadence.cadence == 600
+	assert cadence.nextPublish(after=start + 1900) == start + 2400
+	assert cadence.nextPublish(after=start + 1800) == start + 2400
@@ -0,0 +1,101 @@
+from copy import deepcopy
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from LevityDash.lib.plugins.schema import DatagramColumns, LevityDatagram
+from LevityDash.lib.plugins.schema.benchmark import benchmark, openMeteoFixture, weatherFlowFixture
+
+
+@pytest.fixture(scope='module', params=[openMeteoFixture, weatherFlowFixture], ids=['OpenMeteo', 'WeatherFlow'])
+def fixture(request):
+	return request.param()
+
+
+def datagram(schema, payload, compiled: bool, **kwargs) -> LevityDatagram:
+	return LevityDatagram(deepcopy(payload), schema=schema, compiled=compiled, **{**kwargs, 'sourceData': dict(kwargs.get('sourceData', {}))})
+
+
+def test_compiled_matches_interpreted(fixture):
+	schema, payloads, kwargs = fixture
+	for payload in payloads[:5]:
+		interpreted = datagram(schema, payload, False, **kwargs)
+		compiled = datagram(schema, payload, True, **kwargs)
+		assert dict(compiled) == dict(interpreted)
+		assert compiled.metaData == interpreted.metaData
+		assert dict(compiled.sourceData) == dict(interpreted.sourceData)
+
+
+def test_benchmark_reports_match(fixture):
+	schema, payloads, kwargs = fixture
+	assert benchmark(schema, payloads[:5], repeat=1, **kwargs)['matches']
+
+
+def test_data_map_selected_by_message_type():
+	schema, payloads, kwargs = weatherFlowFixture(2)
+	wind = datagram(schema, payloads[1], True, **kwargs)
+	assert wind.metaData['@type'] == 'rapid_wind'
+	assert set(wind.keys()) == {'realtime'}
+	assert len(wind['realtime'])
+
+
+def test_compiled_does_not_modify_payload(fixture):
+	schema, payloads, kwargs = fixture
+	payload = deepcopy(payloads[0])
+	LevityDatagram(payload, schema=schema, compiled=True, **{**kwargs, 'sourceData': dict(kwargs.get('sourceData', {}))})
+	assert payload == payloads[0]
+
+
+def test_columnar_matches_rows():
+	schema, payloads, kwargs = openMeteoFixture(days=2)
+	rows = datagram(schema, payloads[0], True, **kwargs)
+	columns = datagram(schema, payloads[0], True, columnar=True, **kwargs)
+	hourly = columns['hourly']
+	assert isinstance(hourly, DatagramColumns)
+	assert len(hourly.timestamps) == len(rows['hourly'])
+
+
+def dstPayload(payload: dict, start: datetime, hours: int = 8, **location) -> dict:
+	payload = deepcopy(payload)
+	hourly = payload['hourly']
+	times = [start + timedelta(hours=i) for i in range(hours)]
+	hourly['time'] = [time.strftime('%Y-%m-%dT%H:%M') for time in times]
+	for key, values in hourly.items():
+		if key != 'time':
+			hourly[key] = values[:hours]
+	payload.update(location)
+	return payload
+
+
+def epochs(start: datetime, hours: int, tz) -> list:
+	return [int((start + timedelta(hours=i)).replace(tzinfo=tz).timestamp()) for i in range(hours)]
+
+
+@pytest.mark.parametrize('start', [datetime(2024, 3, 9, 22), datetime(2024, 11, 2, 22)], ids=['spring', 'fall'])
+def test_columnar_times_across_dst(start):
+	schema, payloads, kwargs = openMeteoFixture(days=1)
+	denver = ZoneInfo('America/Denver')
+	payload = dstPayload(payloads[0], start, timezone='America/Denver', utc_offset_seconds=-25200)
+	hourly = datagram(schema, payload, True, columnar=True, **kwargs)['hourly']
+	assert hourly.timestamps.tolist() == epochs(start, 8, denver)
+
+
+def test_columnar_times_use_utc_offset_without_zone_name():
+	schema, payloads, kwargs = openMeteoFixture(days=1)
+	start = datetime(2024, 3, 9, 22)
+	payload = dstPayload(payloads[0], start, timezone='Not/AZone', utc_offset_seconds=-25200)
+	hourly = datagram(schema, payload, True, columnar=True, **kwargs)['hourly']
+	assert hourly.timestamps.tolist() == [epoch + 25200 for epoch in epochs(start, 8, ZoneInfo('UTC'))]
+
+
+def test_columnar_times_fall_back_to_configured_timezone(monkeypatch):
+	from LevityDash.lib.config import userConfig
+	schema, payloads, kwargs = openMeteoFixture(days=1)
+	start = datetime(2024, 11, 2, 22)
+	payload = dstPayload(payloads[0], start)
+	payload.pop('timezone')
+	payload.pop('utc_offset_seconds')
+	monkeypatch.setattr(type(userConfig), 'tz', property(lambda self: ZoneInfo('America/Denver')))
+	hourly = datagram(schema, payload, True, columnar=True, **kwargs)['hourly']
+	assert hourly.timestamps.tolist() == epochs(start, 8, ZoneInfo('America/Denver'))
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from LevityDash.lib.plugins.web import SessionPool
+
+
+def serve(loop) -> TestServer:
+	async def handler(request):
+		return web.json_response({'ok': True})
+
+	app = web.Application()
+	app.router.add_get('/', handler)
+	server = TestServer(app)
+	loop.run_until_complete(server.start_server())
+	return server
+
+
+def test_connections_are_reused(loop):
+	server = serve(loop)
+	pool = SessionPool()
+
+	async def main():
+		for _ in range(3):
+			async with pool.session.get(str(server.make_url('/'))) as response:
+				await response.read()
+		stats = pool.stats
+		await pool.close()
+		return stats
+
+	stats = loop.run_until_complete(main())
+	loop.run_until_complete(server.close())
+	assert stats.requests == 3
+	assert stats.created == 1
+	assert stats.reused == 2
+	assert stats.open == stats.idle == 1
+
+
+def test_stats_without_pool_internals():
+	pool = SessionPool()
+	pool._SessionPool__connector = SimpleNamespace(closed=False)
+	stats = pool.stats
+	assert stats.open is None and stats.idle is None
+	assert 'open' not in str(stats)
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import timedelta
+from json import dumps
+from types import SimpleNamespace
+
+import pytest
+
+from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.builtin.WeatherFlow import mergeSocketMessages, socketRoutes, WeatherFlow
+from LevityDash.lib.plugins.schema.benchmark import weatherFlowFixture
+from LevityDash.lib.plugins.web.socket_ import BaseSocketProtocol
+
+ADDRESS = ('192.168.1.2', 50222)
+
+
+def message(messageType: str, **data) -> bytes:
+	return dumps({'serial_number': 'ST-00000512', 'type': messageType, **data}).encode()
+
+
+@pytest.fixture
+def protocol(loop):
+	protocol = BaseSocketProtocol(SimpleNamespace(pluginLog=LevityPluginLog), routes=socketRoutes, flushWindow=timedelta(milliseconds=50), bufferSize=4)
+	protocol.batches = []
+	protocol.handler.batchSignal.connect(protocol.batches.append)
+	return protocol
+
+
+def test_messages_are_published_once_per_window(loop, protocol):
+	for i in range(3):
+		protocol.datagram_received(message('rapid_wind', ob=[i, 2.3, 128]), ADDRESS)
+	assert protocol.batches == []
+	loop.run_until_complete(asyncio.sleep(0.1))
+	assert len(protocol.batches) == 1
+	assert [m['ob'][0] for m in protocol.batches[0]] == [0, 1, 2]
+	assert protocol.stats['batches'] == 1
+
+
+def test_routes_drop_unknown_and_empty_messages(protocol):
+	protocol.datagram_received(message('not_a_type'), ADDRESS)
+	protocol.datagram_received(message('obs_st', obs=[]), ADDRESS)
+	protocol.datagram_received(b'{"type": ', ADDRESS)
+	protocol.flush()
+	assert protocol.batches == []
+	assert protocol.stats == {'received': 3, 'invalid': 1, 'unrouted': 1, 'filtered': 1, 'dropped': 0, 'batches': 0}
+
+
+def test_full_buffer_drops_oldest(protocol):
+	for i in range(6):
+		protocol.datagram_received(message('rapid_wind', ob=[i, 2.3, 128]), ADDRESS)
+	protocol.flush()
+	assert [m['ob'][0] for m in protocol.batches[0]] == [2, 3, 4, 5]
+	assert protocol.stats['dropped'] == 2
+
+
+def test_unbatched_messages_are_published_directly(loop):
+	protocol = BaseSocketProtocol(SimpleNamespace(pluginLog=LevityPluginLog))
+	published = []
+	protocol.handler.signal.connect(published.append)
+	protocol.datagram_received(message('rapid_wind', ob=[0, 2.3, 128]), ADDRESS)
+	assert [m['type'] for m in published] == ['rapid_wind']
+
+
+def test_window_is_merged_per_message_type_and_device():
+	messages = [
+		{'type': 'rapid_wind', 'serial_number': 'ST-1', 'ob': [0, 2.3, 128]},
+		{'type': 'obs_st', 'serial_number': 'ST-1', 'obs': [[0]]},
+		{'type': 'rapid_wind', 'serial_number': 'ST-2', 'ob': [1, 1.0, 90]},
+		{'type': 'evt_strike', 'serial_number': 'ST-1', 'evt': [1, 10, 100]},
+		{'type': 'rapid_wind', 'serial_number': 'ST-1', 'ob': [2, 3.1, 140]},
+		{'type': 'evt_strike', 'serial_number': 'ST-1', 'evt': [2, 12, 120]},
+	]
+	assert mergeSocketMessages(messages) == [messages[1], messages[2], messages[3], messages[4], messages[5]]
+
+
+def test_socket_batch_updates_once_per_message_type():
+	updates = []
+	observation = SimpleNamespace(dataName='realtime', update=updates.append)
+	plugin = SimpleNamespace(
+		name='WeatherFlow',
+		schema=weatherFlowFixture(1)[0],
+		udp=None,
+		observations=[observation],
+		pluginLog=LevityPluginLog,
+		snapshots=None,
+		markFresh=lambda name: None,
+		_WeatherFlow__logItem=lambda message: None,
+	)
+	WeatherFlow.socketBatch(plugin, [{'serial_number': 'ST-00000512', 'type': 'rapid_wind', 'ob': [1700000000 + i, 2.3 + i, 128]} for i in range(5)])
+	assert len(updates) == 1
+	assert updates[0]['realtime']['environment.wind.speed.speed'] == 6.3
+
+
+def test_default_window_is_sub_second():
+	from LevityDash.lib.config import LevityConfig
+	assert LevityConfig.configToTimeDelta('250 ms') == timedelta(milliseconds=250)
+	assert BaseSocketProtocol.flushWindow < timedelta(seconds=1)
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.observation import MeasurementTimeSeries, TimeSeriesDelta
+
+KEY = CategoryItem('environment.temperature.temperature')
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def at(seconds: int) -> datetime:
+	return T0 + timedelta(seconds=seconds)
+
+
+class Value:
+	"""Single observation value, each source observation provides one"""
+
+	def __init__(self, source: 'Source', seconds: int, value: float):
+		self.source = source
+		self.timestamp = at(seconds)
+		self.value = value
+
+	@property
+	def period(self) -> timedelta:
+		return self.source.period
+
+	def __len__(self):
+		return 1
+
+	def __repr__(self):
+		return f'Value({self.source.dataName}, {self.timestamp:%X}, {self.value})'
+
+
+class Source:
+	"""Observation of a plugin that holds at most one value for KEY"""
+
+	def __init__(self, name: str, period: timedelta = timedelta(0)):
+		self.dataName = name
+		self.period = period
+		self.value = None
+
+	def set(self, seconds: int, value: float) -> Value:
+		self.value = Value(self, seconds, value)
+		return self.value
+
+	def __contains__(self, key):
+		return self.value is not None
+
+	def __getitem__(self, key):
+		return self.value
+
+	def __len__(self):
+		return int(self.value is not None)
+
+	def __repr__(self):
+		return self.dataName
+
+
+def plugin(*sources: Source):
+	return SimpleNamespace(
+		name='plugin',
+		config=None,
+		publisher=SimpleNamespace(connectChannel=lambda *args: None),
+		observations=set(sources),
+	)
+
+
+def delta(series: MeasurementTimeSeries) -> TimeSeriesDelta:
+	pending, series.signals._pendingDelta = series.signals._pendingDelta, None
+	return pending or TimeSeriesDelta()
+
+
+@pytest.fixture
+def sources():
+	a, b = Source('a'), Source('b')
+	a.set(0, 1.0)
+	b.set(60, 2.0)
+	return a, b
+
+
+@pytest.fixture
+def series(sources):
+	series = MeasurementTimeSeries(plugin(*sources), KEY)
+	series.update()
+	delta(series)
+	return series
+
+
+def test_rebuild_reports_added(sources):
+	series = MeasurementTimeSeries(plugin(*sources), KEY)
+	series.update()
+	assert list(series.keys()) == [at(0), at(60)]
+	assert delta(series) == TimeSeriesDelta(added=(at(0), at(60)), count=2)
+
+
+def test_replaced_object_is_in_delta(series, sources):
+	a, _ = sources
+	value = a.set(0, 1.0)
+	series.update({a})
+	assert series[at(0)] is value
+	assert delta(series) == TimeSeriesDelta(replaced=(at(0), at(0)), count=1)
+
+
+def test_moved_value_is_added_and_removed(series, sources):
+	a, _ = sources
+	a.set(120, 3.0)
+	series.update({a})
+	assert list(series.keys()) == [at(60), at(120)]
+	assert delta(series) == TimeSeriesDelta(added=(at(120), at(120)), removed=(at(0), at(0)), count=2)
+
+
+def test_incremental_matches_rebuild(series, sources):
+	a, b = sources
+	a.set(180, 4.0)
+	series.update({a})
+	b.set(30, 5.0)
+	series.update({b})
+
+	rebuilt = MeasurementTimeSeries(plugin(a, b), KEY)
+	rebuilt.update()
+	assert list(series.items()) == list(rebuilt.items())
+
+
+def test_tail_only_ignores_older_values(series, sources):
+	a, _ = sources
+	a.set(0, 9.0)
+	series.update({a}, tailOnly=True)
+	assert series[at(0)].value == 1.0
+	assert not delta(series)
+
+
+def test_delta_merge():
+	first = TimeSeriesDelta.fromKeys(added=[at(60), at(0)])
+	second = TimeSeriesDelta.fromKeys(added=[at(120)], replaced=[at(30)])
+	assert first.merge(second) == TimeSeriesDelta(added=(at(0), at(120)), replaced=(at(30), at(30)), count=4)
+	assert not TimeSeriesDelta.fromKeys()
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from LevityDash.lib.plugins.builtin.WeatherFlow import WeatherFlow
+from LevityDash.lib.plugins.categories import CategoryItem
+from LevityDash.lib.plugins.observation import ObservationTimeSeries, ObservationTimestamp, sampleSize, TimeSeriesItem
+from LevityDash.lib.plugins.schema import LevityDatagram
+from LevityDash.lib.plugins.schema.benchmark import openMeteoFixture
+
+TEMPERATURE = CategoryItem('environment.temperature.temperature')
+
+
+class Hourly(ObservationTimeSeries, published=False, recorded=False):
+	_period = timedelta(hours=1)
+
+
+@pytest.fixture(scope='module')
+def hourly():
+	schema, payloads, kwargs = openMeteoFixture(days=1)
+	hourly = Hourly(SimpleNamespace(name='fixture', schema=schema))
+	hourly.dataName = 'hourly'
+	hourly.update(LevityDatagram(payloads[0], schema=schema, **kwargs))
+	return hourly
+
+
+@pytest.mark.parametrize('name', ['ValueClass', 'RecordedValueClass', 'FrozenValueClass'])
+def test_plugin_value_classes_are_slotted(name):
+	assert WeatherFlow.classes[name].__dictoffset__ == 0
+
+
+@pytest.mark.parametrize('name', ['ValueClass', 'RecordedValueClass'])
+def test_plugin_values_have_no_dict(hourly, name):
+	value = WeatherFlow.classes[name](TimeSeriesItem(21.5, datetime.now(tz=timezone.utc)), TEMPERATURE, source=hourly, container=hourly)
+	assert not hasattr(value, '__dict__')
+	assert value.rawValue == 21.5
+
+
+def test_ingested_values_have_no_dict(hourly):
+	timestamp, row = next(iter(hourly.timeseries.items()))
+	assert isinstance(timestamp, ObservationTimestamp)
+	assert not hasattr(timestamp, '__dict__')
+	assert all(not hasattr(value, '__dict__') for value in row.values())
+
+
+def test_bytes_per_sample_measures_ingested_values(hourly):
+	series = hourly[TEMPERATURE]
+	series.update()
+	values = tuple(series.values())
+	assert len(values) == 24
+	assert series.bytesPerSample == sum(sampleSize(value) for value in values) / len(values)
+	# A value with an instance __dict__ would add the dict on top of the object itself
+	assert series.bytesPerSample < 3 * type(values[0]).__basicsize__
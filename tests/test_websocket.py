@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from types import SimpleNamespace
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from LevityDash.lib.log import LevityPluginLog
+from LevityDash.lib.plugins.builtin.WeatherFlow import WFWebsocket
+from LevityDash.lib.plugins.web.scheduler import Backoff
+
+
+class StandIn:
+	"""Local websocket server that closes each connection after a few messages, or goes quiet when silent"""
+
+	def __init__(self, silent: bool = False):
+		self.silent = silent
+		self.connections = 0
+		self.received = []
+		app = web.Application()
+		app.router.add_get('/ws', self.handler)
+		self.server = TestServer(app)
+
+	async def handler(self, request):
+		ws = web.WebSocketResponse()
+		await ws.prepare(request)
+		self.connections += 1
+		self.received.append([(await ws.receive_json())['type'] for _ in range(2)])
+		if self.silent:
+			await asyncio.sleep(10)
+		else:
+			await ws.send_str(dumps({'type': 'connection_opened'}))
+		await ws.close()
+		return ws
+
+	@property
+	def url(self):
+		return str(self.server.make_url('/ws'))
+
+
+class Plugin(SimpleNamespace):
+
+	def __init__(self, loop, session, latest: datetime = None):
+		super(Plugin, self).__init__(
+			loop=loop,
+			pluginLog=LevityPluginLog,
+			sessionPool=SimpleNamespace(session=session),
+			config={'deviceID': '1234'},
+			log=SimpleNamespace(latest=latest),
+			backfills=[],
+		)
+
+	async def backfill(self, start: datetime, end: datetime):
+		self.backfills.append((start, end))
+
+
+def websocket(plugin, standIn: StandIn) -> WFWebsocket:
+	ws = WFWebsocket(plugin, url=standIn.url, params={}, backoff=Backoff(base=timedelta(milliseconds=20), cap=timedelta(milliseconds=50)))
+	ws.minimumGap = timedelta(0)
+	return ws
+
+
+def run(loop, standIn: StandIn, until, latest: datetime = None, **attributes):
+	"""Runs a websocket against the stand-in until the condition is met or a second has passed"""
+
+	async def main():
+		await standIn.server.start_server()
+		async with ClientSession() as session:
+			plugin = Plugin(loop, session, latest)
+			ws = websocket(plugin, standIn)
+			for key, value in attributes.items():
+				setattr(ws, key, value)
+			ws.start()
+			for _ in range(100):
+				if until(ws, plugin):
+					break
+				await asyncio.sleep(0.01)
+			await ws.astop()
+		await standIn.server.close()
+		return ws, plugin
+
+	return loop.run_until_complete(main())
+
+
+def test_reconnects_after_close(loop):
+	standIn = StandIn()
+	ws, plugin = run(loop, standIn, lambda ws, plugin: ws.connects >= 3)
+	assert ws.connects >= 3
+	assert standIn.received[0] == ['listen_start', 'listen_rapid_start']
+	assert ws.state == 'stopped'
+	assert not ws.running
+
+
+def test_reconnect_backfills_gap(loop):
+	latest = datetime.now(tz=timezone.utc) - timedelta(minutes=10)
+	standIn = StandIn()
+	ws, plugin = run(loop, standIn, lambda ws, plugin: plugin.backfills, latest=latest)
+	start, end = plugin.backfills[0]
+	assert start == latest
+	assert end > start
+
+
+def test_idle_connection_is_reopened(loop):
+	standIn = StandIn(silent=True)
+	ws, plugin = run(loop, standIn, lambda ws, plugin: standIn.connections >= 2, idleTimeout=timedelta(milliseconds=50))
+	assert standIn.connections >= 2
+
+
+def test_short_gaps_are_not_backfilled(loop):
+	plugin = Plugin(loop, session=None)
+	ws = WFWebsocket(plugin)
+	now = datetime.now(tz=timezone.utc)
+	loop.run_until_complete(ws.backfill(now - timedelta(seconds=30)))
+	assert plugin.backfills == []
+	loop.run_until_complete(ws.backfill(now - timedelta(minutes=5)))
+	start, _ = plugin.backfills[0]
+	assert start == now - timedelta(minutes=5)